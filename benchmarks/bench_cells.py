@@ -0,0 +1,107 @@
+"""
+单元格创建微基准：对比每个单元格新建 ParagraphStyle + Paragraph 的旧实现
+与共享样式池 + 轻量单行单元格的新实现，统计每 1 万个单元格的耗时和内存分配
+
+用法：
+    python benchmarks/bench_cells.py --cells 10000 --long-ratio 0.1
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.enums import TA_CENTER  # noqa: E402
+from reportlab.lib.styles import ParagraphStyle  # noqa: E402
+from reportlab.platypus import Paragraph  # noqa: E402
+
+from main import FONT_NAME, register_chinese_fonts, wrap_text_in_cell  # noqa: E402
+
+COL_WIDTH = 120
+FONT_SIZE = 9
+
+
+def legacy_wrap_text_in_cell(text, max_width, font_name, font_size):
+    """改动前的实现：每个单元格新建一个 ParagraphStyle"""
+    if not text:
+        return Paragraph("", ParagraphStyle(
+            'cell_style', fontName=font_name, fontSize=font_size,
+            alignment=TA_CENTER, wordWrap='LTR', leading=font_size * 1.1
+        ))
+    style = ParagraphStyle(
+        'cell_style', fontName=font_name, fontSize=font_size, alignment=TA_CENTER,
+        wordWrap='LTR', leading=font_size * 1.2, leftIndent=2, rightIndent=2,
+        spaceAfter=0, spaceBefore=0
+    )
+    return Paragraph(str(text), style)
+
+
+def make_cells(count: int, long_ratio: float, seed: int = 42):
+    """生成单元格文本：大部分是短文本，少量需要换行的长文本和空单元格"""
+    rng = random.Random(seed)
+    short = ["张三", "李四", "技术部", "进行中", "2023-01-01", "15,000", "alpha", "完成"]
+    cells = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < long_ratio:
+            cells.append("这是一段需要自动换行的较长描述文本，" * rng.randint(2, 4))
+        elif roll < long_ratio + 0.05:
+            cells.append("")
+        else:
+            cells.append(rng.choice(short))
+    return cells
+
+
+def build(func, cells):
+    """创建并 wrap 全部单元格（与 Table 计算行高时的调用一致）"""
+    objects = []
+    for text in cells:
+        cell = func(text, COL_WIDTH, FONT_NAME, FONT_SIZE)
+        cell.wrap(COL_WIDTH - 8, 1e6)
+        objects.append(cell)
+    return objects
+
+
+def run(func, cells):
+    """返回 (耗时, 峰值内存, 存活分配块数)；耗时单独测量，不受 tracemalloc 开销影响"""
+    start = time.perf_counter()
+    build(func, cells)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = build(func, cells)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return elapsed, peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单元格创建微基准")
+    parser.add_argument("--cells", type=int, default=10000)
+    parser.add_argument("--long-ratio", type=float, default=0.1, help="需要换行的长文本比例")
+    args = parser.parse_args()
+
+    register_chinese_fonts()
+    cells = make_cells(args.cells, args.long_ratio)
+    # 预热字体宽度表和样式池，避免把一次性初始化算进结果
+    run(wrap_text_in_cell, cells[:100])
+
+    per = 10000 / args.cells
+    print(f"{'实现':<8} {'耗时(ms/万格)':>14} {'峰值内存(KB/万格)':>18} {'存活分配块(/万格)':>18}")
+    results = {}
+    for name, func in (("旧实现", legacy_wrap_text_in_cell), ("新实现", wrap_text_in_cell)):
+        elapsed, peak, blocks = run(func, cells)
+        results[name] = elapsed
+        print(f"{name:<8} {elapsed * 1000 * per:>14.1f} {peak / 1024 * per:>18.1f} {blocks * per:>18.0f}")
+    print(f"加速比: {results['旧实现'] / results['新实现']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+增量重排基准：模拟在编辑器里反复修改同一个表格的一个单元格后重新生成 PDF，
+对比关闭行级布局备忘（每次全部测量、创建单元格）与开启备忘（只处理变化的行）的耗时
+
+用法：
+    python benchmarks/bench_incremental.py --rows 1000 --long-ratio 0.3 --edits 5
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as app  # noqa: E402
+
+
+def make_table(rows: int, long_ratio: float, seed: int = 42):
+    """生成表头加 rows 行数据，long_ratio 比例的描述单元格需要换行"""
+    rng = random.Random(seed)
+    data = [["编号", "姓名", "部门", "描述", "金额", "日期", "状态"]]
+    for i in range(rows):
+        if rng.random() < long_ratio:
+            description = "这是一段需要自动换行的较长描述文本，" * rng.randint(2, 4)
+        else:
+            description = rng.choice(["正常", "待审核", "已归档"])
+        data.append([
+            str(i + 1), f"员工{i}", rng.choice(["技术部", "市场部", "财务部"]), description,
+            f"{rng.randint(1000, 99999):,}", f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            rng.choice(["完成", "进行中"]),
+        ])
+    return data
+
+
+def edit_times(data, edits: int, memo_tables: int):
+    """依次修改中间一行的一个单元格并重新渲染，返回每次渲染的耗时"""
+    app.layout_memo.max_tables = memo_tables
+    app.create_pdf(data, "landscape")  # 第一次渲染：预热字体缓存，开启时填充备忘
+    times = []
+    for edit in range(edits):
+        edited = [list(row) for row in data]
+        edited[len(data) // 2][3] = f"修改后的内容 {edit}"
+        start = time.perf_counter()
+        app.create_pdf(edited, "landscape")
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量重排基准")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--long-ratio", type=float, default=0.3, help="需要换行的描述单元格比例")
+    parser.add_argument("--edits", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    app.register_chinese_fonts()
+    data = make_table(args.rows, args.long_ratio)
+
+    results = {}
+    for name, memo_tables in (("全量", 0), ("增量", 16)):
+        times = edit_times(data, args.edits, memo_tables)
+        results[name] = statistics.median(times)
+        print(f"{name}: 中位数 {results[name] * 1000:.0f}ms, 最快 {min(times) * 1000:.0f}ms")
+    print(f"加速比: {results['全量'] / results['增量']:.2f}x")
+    print(f"备忘统计: {app.layout_memo.stats()}")
+
+
+if __name__ == "__main__":
+    main()
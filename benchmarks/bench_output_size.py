@@ -0,0 +1,67 @@
+"""
+输出体积基准：对比默认输出(optimize=none)与体积优化输出(optimize=size)的PDF大小和生成耗时
+
+使用 corpus.py 的确定性语料，每个用例分别以 fit 和 paginated 布局生成；
+耗时为多次生成中的最小值。实际的字体子集大小取决于选中的字体（中文字体的差别更明显）。
+
+用法：
+    python benchmarks/bench_output_size.py --rows 10 1000 --filter cjk
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import logging  # noqa: E402
+
+logging.disable(logging.INFO)
+
+from mdt2pdf import converter  # noqa: E402
+
+from corpus import cases  # noqa: E402
+
+
+def render(table_data, orientation: str, layout: str, optimize: str, repeats: int):
+    """返回 (PDF字节数, 最短耗时)"""
+    best = float("inf")
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = len(converter.create_pdf(table_data, orientation, layout, optimize).getvalue())
+        best = min(best, time.perf_counter() - start)
+    return size, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF输出体积基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    converter.register_chinese_fonts()
+    print(f"{'用例':<28} {'布局':>10} {'默认(KB)':>10} {'优化(KB)':>10} {'减少':>7} {'默认(ms)':>10} {'优化(ms)':>10}")
+    total_before = total_after = 0
+    for case in cases(args.rows):
+        if args.filter not in case.name:
+            continue
+        table_data = converter.parse_markdown_table(case.markdown())
+        orientation = converter.determine_orientation(table_data, "auto")
+        for layout in ("fit", "paginated"):
+            before, before_s = render(table_data, orientation, layout, "none", args.repeats)
+            after, after_s = render(table_data, orientation, layout, "size", args.repeats)
+            total_before += before
+            total_after += after
+            print(
+                f"{case.name:<28} {layout:>10} {before / 1024:>10.1f} {after / 1024:>10.1f} "
+                f"{1 - after / before:>7.0%} {before_s * 1000:>10.1f} {after_s * 1000:>10.1f}"
+            )
+    if total_before:
+        print(f"\n合计 {total_before / 1024:.0f}KB -> {total_after / 1024:.0f}KB，减少 {1 - total_after / total_before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+分页模式基准：对比单页适配(fit)与分页(paginated)两种布局的峰值内存和耗时
+
+每个用例在独立子进程中运行，峰值内存取子进程的 ru_maxrss。
+“首页排版”为第一页表格片段排版完成的时间（仅分页模式可测），不是首字节时间：PdfSink 在 canvas.save()
+时才收到整个PDF，“首字节”为第一次写出PDF字节的时间，与总耗时基本相同。“总耗时”为完整PDF生成时间。
+
+用法：
+    python benchmarks/bench_paginated.py --rows 1000 10000 100000 --fit-max-rows 10000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_table(rows: int, cols: int = 6):
+    """生成确定性的中英文混合表格"""
+    header = [f"列{i}" for i in range(cols)]
+    body = [
+        [f"{r}", f"项目{r % 97}", "进行中" if r % 3 else "已完成", f"{r * 37 % 100000:,}", f"2023-{r % 12 + 1:02d}-{r % 28 + 1:02d}", "备注" * (r % 5)]
+        [:cols]
+        for r in range(rows)
+    ]
+    return [header] + body
+
+
+def run_child(rows: int, layout: str):
+    sys.path.insert(0, ROOT)
+    import main
+    from mdt2pdf.output import PdfSink
+
+    table_data = make_table(rows)
+    first_page = {}
+    original_split = main.PaginatedTable.split
+
+    def timed_split(self, availWidth, availHeight):
+        result = original_split(self, availWidth, availHeight)
+        if result and "at" not in first_page:
+            first_page["at"] = time.perf_counter()
+        return result
+
+    main.PaginatedTable.split = timed_split
+
+    first_byte = {}
+    original_write = PdfSink.write
+
+    def timed_write(self, data):
+        if data and "at" not in first_byte:
+            first_byte["at"] = time.perf_counter()
+        return original_write(self, data)
+
+    PdfSink.write = timed_write
+
+    start = time.perf_counter()
+    pdf = main.create_pdf(table_data, "portrait", layout).getvalue()
+    total = time.perf_counter() - start
+
+    print(json.dumps({
+        "rows": rows,
+        "layout": layout,
+        "total_s": round(total, 3),
+        "first_page_layout_s": round(first_page["at"] - start, 3) if "at" in first_page else None,
+        "first_byte_s": round(first_byte["at"] - start, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pdf_kb": round(len(pdf) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分页布局峰值内存与耗时基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--fit-max-rows", type=int, default=10000, help="fit 模式只测到该行数")
+    parser.add_argument("--child", nargs=2, metavar=("ROWS", "LAYOUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(int(args.child[0]), args.child[1])
+        return
+
+    print(
+        f"{'行数':>8} {'布局':>10} {'首页排版(s)':>11} {'首字节(s)':>9} {'总耗时(s)':>10} "
+        f"{'峰值RSS(MB)':>12} {'PDF(KB)':>9}"
+    )
+    for rows in args.rows:
+        for layout in ("fit", "paginated"):
+            if layout == "fit" and rows > args.fit_max_rows:
+                continue
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(rows), layout],
+                capture_output=True, text=True, cwd=ROOT, check=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(output)
+            first_page = f"{result['first_page_layout_s']:.3f}" if result["first_page_layout_s"] is not None else "-"
+            print(
+                f"{rows:>8} {layout:>10} {first_page:>11} {result['first_byte_s']:>9.3f} {result['total_s']:>10.3f} "
+                f"{result['peak_rss_mb']:>12.1f} {result['pdf_kb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
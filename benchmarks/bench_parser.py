@@ -0,0 +1,70 @@
+"""
+解析器吞吐量基准：对比流式解析器与旧的 markdown→HTML→BeautifulSoup 路径
+
+用法：
+    python benchmarks/bench_parser.py --sizes 0.1 1 4
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import parse_markdown_table  # noqa: E402
+
+
+def make_markdown(target_mb: float, cols: int = 8, seed: int = 42) -> str:
+    """生成约 target_mb 大小的中英文混合表格"""
+    rng = random.Random(seed)
+    words = ["张三", "李四", "技术部", "进行中", "alpha", "beta", "2023-01-01", "15,000", "**重点**", "`a|b`"]
+    lines = ["| " + " | ".join(f"列{i}" for i in range(cols)) + " |",
+             "|" + "|".join(":---:" if i % 2 else "---" for i in range(cols)) + "|"]
+    size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+    target = int(target_mb * 1024 * 1024)
+    while size < target:
+        line = "| " + " | ".join(" ".join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(cols)) + " |"
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(lines) + "\n"
+
+
+def same_ignoring_spaces(a, b):
+    """旧路径的 get_text(strip=True) 会丢掉行内标记两侧的空格，比较时忽略空白"""
+    squash = lambda rows: [["".join(cell.split()) for cell in row] for row in rows]
+    return squash(a) == squash(b)
+
+
+def measure(func, text, repeat):
+    best = float("inf")
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown表格解析吞吐量基准")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.1, 1.0, 4.0], help="输入大小(MB)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'大小(MB)':>9} {'行数':>8} {'旧路径(MB/s)':>14} {'流式(MB/s)':>12} {'加速比':>7} {'完全一致':>8} {'忽略空白一致':>12}")
+    for size_mb in args.sizes:
+        text = make_markdown(size_mb)
+        actual_mb = len(text.encode("utf-8")) / (1024 * 1024)
+        legacy_time, legacy_rows = measure(lambda t: parse_markdown_table(t, legacy=True), text, args.repeat)
+        stream_time, stream_rows = measure(lambda t: parse_markdown_table(t, legacy=False), text, args.repeat)
+        print(
+            f"{actual_mb:>9.2f} {len(stream_rows):>8} {actual_mb / legacy_time:>14.2f} "
+            f"{actual_mb / stream_time:>12.2f} {legacy_time / stream_time:>7.1f} "
+            f"{'是' if legacy_rows == stream_rows else '否':>8} "
+            f"{'是' if same_ignoring_spaces(legacy_rows, stream_rows) else '否':>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+多进程内存基准：模拟多个服务进程各自注册字体、缓存同一批PDF，比较每个进程独立缓存
+与使用共享缓存（MDT2PDF_SHARED_CACHE）时全部进程的内存占用
+
+每个进程注册字体，依次请求 --tables 个不同的表格（缓存未命中时渲染并放入缓存，各进程从不同的表格开始），
+全部进程完成后从 /proc/self/smaps_rollup 读取 Pss（共享页按进程数分摊）和 Anonymous（进程私有内存）。
+只支持 Linux。
+
+用法：
+    python benchmarks/bench_shared_memory.py --processes 4 --tables 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields.get("Pss", 0), fields.get("Anonymous", 0)
+
+
+def _serve(args):
+    """一个模拟的服务进程：渲染或从缓存读取全部表格，返回 (Pss, Anonymous, 渲染次数)"""
+    shared_path, tables, barrier, offset = args
+    import logging
+
+    logging.disable(logging.INFO)
+    if shared_path:
+        os.environ["MDT2PDF_SHARED_CACHE"] = shared_path
+    from mdt2pdf import converter
+    from mdt2pdf.cache import RenderCache, hash_source, make_source_cache_key
+
+    cache = RenderCache.from_env()
+    converter.register_chinese_fonts()
+    fonts = converter.font_manager.fingerprint()
+    rendered = 0
+    # 各进程从不同的表格开始，模拟相同内容的请求分散到不同进程
+    for index in [(offset + i) % tables for i in range(tables)]:
+        markdown = "| 编号 | 名称 | 说明 |\n|---|---|---|\n" + "".join(
+            f"| {index}-{row} | 项目{row} | 第 {index} 个表格的第 {row} 行 |\n" for row in range(40)
+        )
+        key = make_source_cache_key(hash_source(markdown), "portrait", fonts)
+        if cache.get(key) is None:
+            cache.put(key, converter.convert_markdown(markdown, "portrait"))
+            rendered += 1
+    # 全部进程都完成后再测量，共享页此时按实际进程数分摊
+    barrier.wait()
+    pss, anonymous = _memory_kb()
+    return pss, anonymous, rendered
+
+
+def run(processes: int, tables: int, shared_path):
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    barrier = manager.Barrier(processes)
+    start = time.perf_counter()
+    with ctx.Pool(processes) as pool:
+        jobs = [(shared_path, tables, barrier, i * tables // processes) for i in range(processes)]
+        results = pool.map(_serve, jobs)
+    elapsed = time.perf_counter() - start
+    manager.shutdown()
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程内存基准")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--tables", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    shared_path = os.path.join(directory, f"mdt2pdf-bench-{os.getpid()}")
+    print(f"{'模式':<10} {'Pss合计(MB)':>12} {'私有内存合计(MB)':>16} {'渲染次数':>8} {'耗时(s)':>8}")
+    try:
+        for label, path in (("独立缓存", None), ("共享缓存", shared_path)):
+            results, elapsed = run(args.processes, args.tables, path)
+            pss = sum(r[0] for r in results) / 1024
+            anonymous = sum(r[1] for r in results) / 1024
+            rendered = sum(r[2] for r in results)
+            print(f"{label:<10} {pss:>12.1f} {anonymous:>16.1f} {rendered:>8} {elapsed:>8.1f}")
+    finally:
+        if os.path.exists(shared_path):
+            os.remove(shared_path)
+
+
+if __name__ == "__main__":
+    main()
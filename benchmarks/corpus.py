@@ -0,0 +1,75 @@
+"""
+确定性的合成表格语料：按形状（窄/宽）、文字（ASCII/中文/混合）、单元格长度（短/长）和行数组合生成
+
+同一用例名总是生成完全相同的 Markdown 文本（固定随机种子），供 suite.py 等基准脚本使用。
+"""
+import random
+import zlib
+from dataclasses import dataclass
+from itertools import product
+from typing import List
+
+SHAPES = {"narrow": 3, "wide": 12}
+SCRIPTS = ("ascii", "cjk", "mixed")
+LENGTHS = ("short", "long")
+
+_ASCII_WORDS = ["alpha", "beta", "gamma", "delta", "release", "pending", "done", "2023-01-01", "15,000", "v1.2.3"]
+_CJK_WORDS = ["张三", "李四", "技术部", "市场部", "进行中", "已完成", "项目", "预算", "负责人", "备注"]
+
+
+@dataclass(frozen=True)
+class Case:
+    """一个语料用例"""
+
+    shape: str
+    script: str
+    length: str
+    rows: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.shape}-{self.script}-{self.length}-{self.rows}"
+
+    @property
+    def cols(self) -> int:
+        return SHAPES[self.shape]
+
+    def markdown(self) -> str:
+        return make_markdown(self)
+
+
+def cases(rows=(10, 500)) -> List[Case]:
+    """全部形状、文字和长度组合，每种组合按给定行数各一个用例"""
+    return [Case(*combo) for combo in product(SHAPES, SCRIPTS, LENGTHS, rows)]
+
+
+def _words(script: str, rng: random.Random):
+    if script == "ascii":
+        return _ASCII_WORDS
+    if script == "cjk":
+        return _CJK_WORDS
+    return _ASCII_WORDS if rng.random() < 0.5 else _CJK_WORDS
+
+
+def _cell(script: str, length: str, rng: random.Random) -> str:
+    if length == "short":
+        count = rng.randint(1, 2)
+    else:
+        # 长单元格：大部分需要换行，少量极长
+        count = rng.randint(6, 14) if rng.random() < 0.9 else rng.randint(30, 50)
+    separator = "" if script == "cjk" else " "
+    return separator.join(rng.choice(_words(script, rng)) for _ in range(count))
+
+
+def make_markdown(case: Case) -> str:
+    """生成用例对应的 Markdown 表格（表头 + 分隔行 + rows 行数据）"""
+    # 种子只取决于用例名，与运行环境无关
+    rng = random.Random(zlib.crc32(case.name.encode("utf-8")))
+    header = [f"列{i + 1}" if case.script != "ascii" else f"col{i + 1}" for i in range(case.cols)]
+    lines = [
+        "| " + " | ".join(header) + " |",
+        "|" + "|".join("---" for _ in header) + "|",
+    ]
+    for _ in range(case.rows):
+        lines.append("| " + " | ".join(_cell(case.script, case.length, rng) for _ in header) + " |")
+    return "\n".join(lines) + "\n"
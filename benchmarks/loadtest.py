@@ -0,0 +1,487 @@
+"""
+负载测试：在本机用 uvicorn 启动服务，以固定并发持续请求 POST /convert，
+测量各并发级别下的延迟分位数、吞吐量、错误率、事件循环延迟和各进程内存占用，结果写入JSON便于不同版本之间比较
+
+- 请求：每个并发连接一个线程，收到响应后立即发送下一个请求（闭环负载），表格按 --mix 指定的权重从 corpus.py 语料中选取
+- 采样：每隔 --sample-interval 秒请求一次 /health（按 HTTP 工作进程数连续请求几次，尽量覆盖每个工作进程），
+  记录 /health 响应耗时、各工作进程报告的最近事件循环延迟（见 telemetry.LoopLagMonitor），
+  并从 /proc 读取服务进程树中每个进程的 RSS（HTTP 工作进程、渲染进程等，只支持 Linux）
+- 默认关闭结果缓存和布局备忘（MDT2PDF_CACHE_MAX_BYTES=0、MDT2PDF_LAYOUT_MEMO_TABLES=0），每个请求都完整渲染；--cache 时保留
+
+负载生成器与服务运行在同一台机器上，会占用一部分CPU；比较两次运行时应使用相同的参数和机器。
+--url 指定已在运行的服务时不启动 uvicorn，只能读取 /health 报告的工作进程的 RSS。
+
+用法：
+    python benchmarks/loadtest.py --concurrency 1 4 16 --duration 20 --output before.json
+    python benchmarks/loadtest.py --concurrency 1 4 16 --duration 20 --output after.json --compare before.json
+    python benchmarks/loadtest.py --mix narrow-cjk-short-10=8 wide-mixed-long-500=1 --workers 2
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import Case  # noqa: E402
+
+DEFAULT_MIX = ["narrow-cjk-short-10=6", "wide-mixed-short-10=2", "narrow-mixed-long-500=1", "wide-cjk-long-500=1"]
+
+
+def parse_case(name: str) -> Case:
+    """用例名 shape-script-length-rows，例如 wide-cjk-long-500"""
+    shape, script, length, rows = name.split("-")
+    return Case(shape, script, length, int(rows))
+
+
+def parse_mix(items):
+    """--mix 参数：用例名=权重，权重默认为 1"""
+    mix = []
+    for item in items:
+        name, _, weight = item.partition("=")
+        mix.append((parse_case(name), float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values, q: float) -> float:
+    """最近秩法分位数，values 已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def summarize(values):
+    """延迟列表（秒）的分位数，单位毫秒"""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+BOUNDARY = "mdt2pdf-loadtest-boundary"
+
+
+def multipart_body(fields) -> bytes:
+    """multipart/form-data 请求体；与浏览器表单相同，Markdown 以 UTF-8 原样发送（urlencoded 会把中文放大到三倍）"""
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode("ascii")
+            + value.encode("utf-8") + b"\r\n"
+        )
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode("ascii")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_json(host: str, port: int, path: str, timeout: float = 10):
+    """新建连接发送 GET 请求，返回 (解析后的JSON, 耗时秒数)"""
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    return json.loads(body), time.perf_counter() - started
+
+
+class Server:
+    """在子进程中运行的 uvicorn 服务"""
+
+    def __init__(self, workers: int, env_overrides, log_path=None):
+        self.host = "127.0.0.1"
+        self.port = free_port()
+        env = dict(os.environ, **env_overrides)
+        self._log = open(log_path, "wb") if log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app", "--host", self.host, "--port", str(self.port),
+                "--workers", str(workers), "--log-level", "warning",
+            ],
+            cwd=ROOT, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout: float = 120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"服务启动失败，退出码 {self.process.returncode}")
+            try:
+                get_json(self.host, self.port, "/health", timeout=2)
+                return
+            except (OSError, http.client.HTTPException, ValueError):
+                time.sleep(0.2)
+        raise RuntimeError("等待服务启动超时")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self._log is not subprocess.DEVNULL:
+            self._log.close()
+
+
+def _children(pid: int):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _rss_bytes(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode("utf-8", "replace")
+    except OSError:
+        return ""
+
+
+def process_tree(root_pid, http_pids):
+    """
+    服务进程树中每个进程的角色和 RSS：http（报告过 /health 的工作进程）、supervisor（uvicorn 主进程）、
+    helper（multiprocessing 的 resource_tracker 和 forkserver）、render（其余子进程，即渲染进程）
+    """
+    roots = [root_pid] if root_pid else sorted(http_pids)
+    result = {}
+    forkservers = set()
+    stack = [(pid, None) for pid in roots]
+    while stack:
+        pid, parent = stack.pop()
+        if pid in result:
+            continue
+        rss = _rss_bytes(pid)
+        if rss is None:
+            continue
+        if pid in http_pids:
+            role = "http"
+        elif pid == root_pid:
+            role = "supervisor"
+        elif parent in forkservers:
+            # 由 forkserver fork 出的渲染进程，命令行与 forkserver 相同
+            role = "render"
+        elif "resource_tracker" in _cmdline(pid) or "forkserver" in _cmdline(pid):
+            role = "helper"
+            if "forkserver" in _cmdline(pid):
+                forkservers.add(pid)
+        else:
+            role = "render"
+        result[pid] = {"role": role, "rss_bytes": rss}
+        stack.extend((child, pid) for child in _children(pid))
+    return result
+
+
+class Recorder:
+    """请求结果：(完成时刻, 用例名, 延迟秒数, 状态码)；状态码 0 表示连接错误"""
+
+    def __init__(self):
+        self.results = []
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def add(self, finished: float, case: str, latency: float, status: int):
+        if not self.recording:
+            return
+        with self._lock:
+            self.results.append((finished, case, latency, status))
+
+    def count(self):
+        with self._lock:
+            return len(self.results), sum(1 for r in self.results if not 200 <= r[3] < 300)
+
+
+def client_loop(host, port, bodies, weights, seed, stop, recorder, timeout):
+    """一个并发连接：保持连接，收到响应后立即发送下一个请求"""
+    rng = random.Random(seed)
+    names = list(bodies)
+    connection = None
+    while not stop.is_set():
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        status = 0
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+            connection.request(
+                "POST", "/convert", bodies[name], {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+            )
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("connection", "").lower() == "close":
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            if connection is not None:
+                connection.close()
+            connection = None
+        finished = time.perf_counter()
+        recorder.add(finished, name, finished - started, status)
+    if connection is not None:
+        connection.close()
+
+
+def sample(host, port, root_pid, probes, known_http_pids):
+    """一次采样：/health 响应耗时、各工作进程的事件循环延迟和进程树 RSS"""
+    point = {"health_ms": [], "loop": {}, "processes": {}}
+    for _ in range(probes):
+        try:
+            health, elapsed = get_json(host, port, "/health")
+        except (OSError, http.client.HTTPException, ValueError):
+            continue
+        point["health_ms"].append(elapsed * 1000)
+        pid = health.get("pid")
+        if pid is not None:
+            known_http_pids.add(pid)
+            if health.get("event_loop"):
+                point["loop"][str(pid)] = health["event_loop"]
+    point["processes"] = {str(pid): info for pid, info in process_tree(root_pid, known_http_pids).items()}
+    return point
+
+
+def run_step(host, port, root_pid, args, bodies, weights, concurrency, known_http_pids):
+    """以给定并发运行 --duration 秒（预热 --warmup 秒不计入），返回这一级的汇总结果"""
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(host, port, bodies, weights, args.seed + i, stop, recorder, args.timeout),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+
+    recorder.recording = True
+    started = time.perf_counter()
+    timeline = []
+    loop_first = {}
+    loop_last = {}
+    while True:
+        elapsed = time.perf_counter() - started
+        if elapsed >= args.duration:
+            break
+        time.sleep(min(args.sample_interval, args.duration - elapsed))
+        point = sample(host, port, root_pid, args.workers, known_http_pids)
+        completed, errors = recorder.count()
+        point["t"] = round(time.perf_counter() - started, 3)
+        point["completed"] = completed
+        point["errors"] = errors
+        for pid, stats in point["loop"].items():
+            loop_first.setdefault(pid, stats)
+            loop_last[pid] = stats
+        timeline.append(point)
+    recorder.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(args.timeout + 5)
+
+    results = recorder.results
+    latencies = [latency for _, _, latency, status in results if 200 <= status < 300]
+    errors = len(results) - len(latencies)
+    statuses = {}
+    for _, _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_case = {}
+    for name in bodies:
+        case_latencies = [latency for _, case, latency, status in results if case == name and 200 <= status < 300]
+        by_case[name] = summarize(case_latencies)
+
+    # 事件循环延迟：采样到的最近最大延迟的最大值，以及各工作进程这一级内的平均延迟
+    lag_max = max((stats["recent_max_seconds"] for point in timeline for stats in point["loop"].values()), default=0.0)
+    lag_samples = sum(loop_last[pid]["samples"] - loop_first[pid]["samples"] for pid in loop_last)
+    lag_total = sum(
+        loop_last[pid]["mean_seconds"] * loop_last[pid]["samples"]
+        - loop_first[pid]["mean_seconds"] * loop_first[pid]["samples"]
+        for pid in loop_last
+    )
+    rss_by_role = {}
+    for point in timeline:
+        totals = {}
+        for info in point["processes"].values():
+            totals[info["role"]] = totals.get(info["role"], 0) + info["rss_bytes"]
+        for role, total in totals.items():
+            rss_by_role[role] = max(rss_by_role.get(role, 0), total)
+
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": elapsed,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "status_counts": statuses,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+        "by_case": by_case,
+        "health_latency": summarize([ms / 1000 for point in timeline for ms in point["health_ms"]]),
+        "event_loop_lag": {
+            "max_ms": lag_max * 1000,
+            "mean_ms": lag_total / lag_samples * 1000 if lag_samples > 0 else 0.0,
+        },
+        "peak_rss_bytes_by_role": rss_by_role,
+        "timeline": timeline,
+    }
+
+
+def print_step(step):
+    latency = step["latency"]
+    rss = ", ".join(f"{role} {total / 1024 / 1024:.0f}MB" for role, total in sorted(step["peak_rss_bytes_by_role"].items()))
+    print(
+        f"{step['concurrency']:>6} {step['throughput_rps']:>8.1f} {latency.get('p50_ms', 0):>9.1f} "
+        f"{latency.get('p95_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f} {step['error_rate']:>7.1%} "
+        f"{step['event_loop_lag']['max_ms']:>11.1f}  {rss}"
+    )
+
+
+def compare(previous, current):
+    """按并发级别对比两次运行的吞吐量和延迟分位数"""
+    before = {step["concurrency"]: step for step in previous["steps"]}
+    print(f"\n与 {previous['meta'].get('started', '之前的结果')} 比较:")
+    print(f"{'并发':>6} {'吞吐量':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'循环延迟':>10}")
+
+    def change(old, new):
+        return f"{(new - old) / old:>+10.0%}" if old else f"{'-':>10}"
+
+    for step in current["steps"]:
+        old = before.get(step["concurrency"])
+        if old is None:
+            continue
+        print(
+            f"{step['concurrency']:>6} {change(old['throughput_rps'], step['throughput_rps'])}"
+            + "".join(
+                change(old["latency"].get(key, 0), step["latency"].get(key, 0)) for key in ("p50_ms", "p95_ms", "p99_ms")
+            )
+            + change(old["event_loop_lag"]["max_ms"], step["event_loop_lag"]["max_ms"])
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POST /convert 负载测试")
+    parser.add_argument("--url", help="已在运行的服务地址，例如 http://127.0.0.1:8000；不指定时在本机启动 uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 工作进程数")
+    parser.add_argument("--render-workers", type=int, help="每个工作进程的渲染进程数 (MDT2PDF_RENDER_WORKERS)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="依次测量的并发连接数")
+    parser.add_argument("--duration", type=float, default=20, help="每个并发级别的测量秒数")
+    parser.add_argument("--warmup", type=float, default=3, help="每个并发级别开始测量前的预热秒数")
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX, help="用例名=权重，用例名格式见 corpus.py")
+    parser.add_argument("--layout", default="fit")
+    parser.add_argument("--orientation", default="auto")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=120, help="单个请求的超时秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="保留结果缓存和布局备忘")
+    parser.add_argument("--server-log", help="服务输出写入该文件")
+    parser.add_argument("--output", help="结果写入该JSON文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果比较")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    bodies = {
+        case.name: multipart_body(
+            {"markdown_content": case.markdown(), "orientation": args.orientation, "layout": args.layout}
+        )
+        for case, _ in mix
+    }
+    weights = [weight for _, weight in mix]
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port, root_pid = parts.hostname, parts.port or 80, None
+    else:
+        env = {}
+        if not args.cache:
+            env.update(MDT2PDF_CACHE_MAX_BYTES="0", MDT2PDF_LAYOUT_MEMO_TABLES="0")
+        if args.render_workers:
+            env["MDT2PDF_RENDER_WORKERS"] = str(args.render_workers)
+        server = Server(args.workers, env, args.server_log)
+        host, port, root_pid = server.host, server.port, server.process.pid
+
+    result = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "url": args.url,
+            "workers": args.workers,
+            "render_workers": args.render_workers,
+            "cache": args.cache,
+            "mix": {case.name: weight for case, weight in mix},
+            "layout": args.layout,
+            "orientation": args.orientation,
+            "duration_seconds": args.duration,
+            "warmup_seconds": args.warmup,
+        },
+        "steps": [],
+    }
+    known_http_pids = set()
+    try:
+        if server is not None:
+            server.wait_ready()
+        print(f"{'并发':>6} {'吞吐量/s':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'错误率':>7} {'循环延迟(ms)':>11}  峰值RSS")
+        for concurrency in args.concurrency:
+            step = run_step(host, port, root_pid, args, bodies, weights, concurrency, known_http_pids)
+            result["steps"].append(step)
+            print_step(step)
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"\n结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
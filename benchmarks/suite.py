@@ -0,0 +1,282 @@
+"""
+基准测试套件：在确定性合成语料上分别测量各处理阶段和端到端请求的耗时与峰值内存，
+并与保存的基线比较，出现性能回退时以非零状态退出
+
+阶段：
+    parse_markdown_table          流式表格解析
+    parse_markdown_table_manual   逐行手动解析
+    determine_orientation         页面方向判断
+    calculate_optimal_table_size  布局求解（列宽、字号）
+    create_pdf                    完整PDF生成
+    e2e                           通过 TestClient 调用 POST /convert/stream（含解析、渲染进程和响应）
+
+耗时取多次重复中的最小值，超出容差的项会复测确认；峰值内存为单次调用期间 tracemalloc 记录的 Python 分配峰值（e2e 不测内存）。
+基线与机器相关，换机器后需要用 --update-baseline 重新生成。
+
+用法：
+    python benchmarks/suite.py                     # 与 benchmarks/baseline.json 比较
+    python benchmarks/suite.py --update-baseline   # 重新生成基线
+    python benchmarks/suite.py --full --stages parse_markdown_table create_pdf
+"""
+import gc
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 关闭结果缓存和布局备忘，保证每次测量的都是完整渲染；端到端请求只用一个渲染进程
+os.environ.setdefault("MDT2PDF_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("MDT2PDF_LAYOUT_MEMO_TABLES", "0")
+os.environ.setdefault("MDT2PDF_RENDER_WORKERS", "1")
+
+import logging  # noqa: E402
+
+logging.disable(logging.INFO)
+
+import main as app  # noqa: E402
+from reportlab.lib.pagesizes import A4, landscape  # noqa: E402
+from reportlab.lib.units import cm  # noqa: E402
+
+from corpus import cases  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+STAGES = (
+    "parse_markdown_table",
+    "parse_markdown_table_manual",
+    "determine_orientation",
+    "calculate_optimal_table_size",
+    "create_pdf",
+    "e2e",
+)
+
+# 各阶段测量的最大行数：完整 PDF 生成在十万行时耗时过长，只测到一万行
+STAGE_MAX_ROWS = {"create_pdf": 10000, "e2e": 10000}
+
+QUICK_ROWS = (10, 500)
+FULL_ROWS = (10, 1000, 10000, 100000)
+
+
+def machine_id() -> str:
+    """基线对应的运行环境"""
+    return f"{platform.system()}-{platform.machine()}-py{platform.python_version()}-{os.cpu_count()}cpu"
+
+
+def available_area(orientation: str):
+    """与 create_pdf 相同的页面可用宽高"""
+    pagesize = landscape(A4) if orientation == "landscape" else A4
+    return pagesize[0] - 2 * 1.0 * cm, pagesize[1] - 2 * 1.2 * cm
+
+
+def stage_call(stage: str, markdown: str, client=None):
+    """返回执行该阶段一次的无参函数，输入数据预先准备好，不计入耗时"""
+    if stage == "parse_markdown_table":
+        return lambda: app.parse_markdown_table(markdown)
+    if stage == "parse_markdown_table_manual":
+        return lambda: app.parse_markdown_table_manual(markdown)
+
+    table_data = app.parse_markdown_table(markdown)
+    orientation = app.determine_orientation(table_data, "auto")
+    if stage == "determine_orientation":
+        return lambda: app.determine_orientation(table_data, "auto")
+    if stage == "calculate_optimal_table_size":
+        width, height = available_area(orientation)
+        return lambda: app.calculate_optimal_table_size(table_data, width, height)
+    if stage == "create_pdf":
+        return lambda: app.create_pdf(table_data, orientation).getvalue()
+    if stage == "e2e":
+        body = markdown.encode("utf-8")
+
+        def request():
+            # 原始请求体不受表单字段大小限制，大表格也能走完整流程；屏蔽接口中的调试输出
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = client.post(
+                    "/convert/stream", params={"orientation": "auto"},
+                    content=body, headers={"Content-Type": "text/markdown"}
+                )
+            if response.status_code != 200:
+                raise RuntimeError(f"/convert/stream 返回 {response.status_code}: {response.text[:200]}")
+            return response.content
+        return request
+    raise ValueError(f"未知阶段: {stage}")
+
+
+def measure_time(func, repeats: int, min_time: float = 0.05) -> float:
+    """
+    预热一次后，每轮循环执行到至少 min_time 秒，返回各轮单次耗时的最小值
+    （与 timeit 相同，最小值受其他进程和调度干扰最少，比中位数更适合做回退比较）
+    """
+    gc.collect()
+    started = time.perf_counter()
+    func()
+    once = time.perf_counter() - started
+    loops = max(1, int(min_time / once)) if once > 0 else 1000
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return min(samples)
+
+
+def measure_memory(func) -> int:
+    """单次调用期间的 Python 内存分配峰值（字节）"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def select(rows, stages, name_filter):
+    """要测量的 (结果键, 用例, 阶段)"""
+    for case in cases(rows):
+        if name_filter and name_filter not in case.name:
+            continue
+        for stage in stages:
+            if case.rows <= STAGE_MAX_ROWS.get(stage, float("inf")):
+                yield f"{case.name}/{stage}", case, stage
+
+
+def find_regressions(results, baseline, time_tolerance, memory_tolerance):
+    """返回 {结果键: [回退描述]}；耗时和内存都设有绝对下限，避免微秒级波动造成误报"""
+    regressions = {}
+    for key, current in sorted(results.items()):
+        previous = baseline.get("results", {}).get(key)
+        if previous is None:
+            continue
+        messages = []
+        if (current["seconds"] > previous["seconds"] * (1 + time_tolerance)
+                and current["seconds"] - previous["seconds"] > 0.001):
+            messages.append(f"耗时 {previous['seconds'] * 1000:.2f}ms -> {current['seconds'] * 1000:.2f}ms")
+        if "peak_bytes" in current and "peak_bytes" in previous:
+            if (current["peak_bytes"] > previous["peak_bytes"] * (1 + memory_tolerance)
+                    and current["peak_bytes"] - previous["peak_bytes"] > 64 * 1024):
+                messages.append(
+                    f"峰值内存 {previous['peak_bytes'] / 1024:.0f}KB -> {current['peak_bytes'] / 1024:.0f}KB"
+                )
+        if messages:
+            regressions[key] = messages
+    return regressions
+
+
+def run_suite(selection, repeats, baseline=None, tolerances=(0.25, 0.10), confirm=0):
+    """
+    测量全部用例；给出基线时，耗时超出容差的项再重新测量最多 confirm 次并保留最好的结果，
+    只有持续超出的才算回退（峰值内存是确定的，不需要复测）
+    """
+    results = {}
+    client = None
+    if any(stage == "e2e" for _, _, stage in selection):
+        from fastapi.testclient import TestClient
+        client = TestClient(app.app)
+        client.__enter__()
+    try:
+        # 不保留各用例的输入数据：堆越大，后面用例的垃圾回收开销越大，会干扰测量
+        for key, case, stage in selection:
+            func = stage_call(stage, case.markdown(), client)
+            entry = {"seconds": measure_time(func, repeats)}
+            if stage != "e2e":
+                entry["peak_bytes"] = measure_memory(func)
+            results[key] = entry
+            memory = f"{entry['peak_bytes'] / 1024:>10.0f}KB" if "peak_bytes" in entry else f"{'-':>12}"
+            print(f"{case.name:<28} {stage:<30} {entry['seconds'] * 1000:>10.2f}ms {memory}", flush=True)
+
+        for attempt in range(confirm):
+            suspects = [
+                key for key, messages in find_regressions(results, baseline or {}, *tolerances).items()
+                if any(message.startswith("耗时") for message in messages)
+            ]
+            if not suspects:
+                break
+            print(f"复测 {len(suspects)} 项可能的耗时回退（第 {attempt + 1} 次）", flush=True)
+            for key, case, stage in selection:
+                if key not in suspects:
+                    continue
+                seconds = measure_time(stage_call(stage, case.markdown(), client), repeats)
+                results[key]["seconds"] = min(results[key]["seconds"], seconds)
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试套件与性能回退检查")
+    parser.add_argument("--full", action="store_true", help=f"测量 {FULL_ROWS} 行（默认 {QUICK_ROWS} 行）")
+    parser.add_argument("--rows", type=int, nargs="+", help="自定义行数")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例，例如 wide-cjk")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果合并写入基线文件")
+    parser.add_argument("--output", help="把本次结果写入 JSON 文件")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="允许的耗时增幅（比例）")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="允许的峰值内存增幅（比例）")
+    parser.add_argument("--confirm", type=int, default=2, help="疑似耗时回退项的最多复测次数")
+    args = parser.parse_args()
+
+    rows = args.rows or (FULL_ROWS if args.full else QUICK_ROWS)
+    app.register_chinese_fonts()
+    print(f"{'用例':<28} {'阶段':<30} {'耗时':>12} {'峰值内存':>12}")
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    selection = list(select(rows, args.stages, args.filter))
+    tolerances = (args.time_tolerance, args.memory_tolerance)
+    results = run_suite(
+        selection, args.repeats, baseline, tolerances, 0 if args.update_baseline else args.confirm
+    )
+
+    report = {
+        "machine": machine_id(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        # 合并写入：只运行部分用例时保留其余用例的基线
+        merged = dict(baseline.get("results", {})) if baseline else {}
+        merged.update(results)
+        report["results"] = dict(sorted(merged.items()))
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"基线已更新: {args.baseline} ({len(results)} 项)")
+        return 0
+
+    if baseline is None:
+        print(f"没有找到基线 {args.baseline}，使用 --update-baseline 生成")
+        return 0
+    if baseline.get("machine") != machine_id():
+        print(f"警告: 基线生成于 {baseline.get('machine')}，当前为 {machine_id()}，耗时比较可能不可靠")
+
+    regressions = find_regressions(results, baseline, *tolerances)
+    compared = sum(key in baseline.get("results", {}) for key in results)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回退（共比较 {compared} 项）:")
+        for key, messages in regressions.items():
+            print(f"  {key}: {'; '.join(messages)}")
+        return 1
+    print(f"\n未发现性能回退（共比较 {compared} 项）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,622 +1,151 @@
 import os
-import io
-import re
+import asyncio
+import hashlib
 import logging
 from typing import Optional
 from enum import Enum
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Form, Response
+from fastapi import FastAPI, HTTPException, Form, Header, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 from fastapi.requests import Request
-import markdown
-from bs4 import BeautifulSoup
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, KeepTogether
-from reportlab.lib.units import inch, cm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+from mdt2pdf.executor import RenderExecutor, ExecutorOverloaded, RenderTimeout
+from mdt2pdf.cache import RenderCache, hash_source, make_source_cache_key, make_etag, etag_matches
+from mdt2pdf.batch import BatchError, BatchItem, BatchRunner, aiter_ndjson_items, item_name, merge_pdfs, stream_zip
+from mdt2pdf.upload import InvalidMultipart, UploadLimits, UploadTooLarge, multipart_file_chunks, read_tables
+from mdt2pdf.telemetry import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, LoopLagMonitor, Telemetry, TelemetryMiddleware, span,
+)
+from mdt2pdf.output import SpooledPdf
+from mdt2pdf.jobs import DONE, JobManager, job_info
+# 渲染核心（解析、布局、PDF生成）在 mdt2pdf.converter 中；解析和渲染函数在这里一并导入，
+# 保持 main.create_pdf 等原有的调用方式（基准脚本使用）
+from mdt2pdf.converter import (  # noqa: F401
+    OrientationEnum, LayoutEnum, OptimizeEnum, font_manager, FONT_NAME, BOLD_FONT_NAME, layout_memo,
+    register_chinese_fonts, wrap_text_in_cell, parse_markdown_table, parse_markdown_table_manual,
+    parse_markdown_document, determine_orientation, calculate_optimal_table_size, build_table,
+    PaginatedTable, create_pdf, create_document_pdf, build_preview_pages,
+    init_render_worker, render_table_to_pdf, render_document_to_pdf, render_preview, render_batch_item,
+    render_tables_to_pdf, render_markdown_to_pdf, render_markdown_preview,
+)
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-class OrientationEnum(str, Enum):
-    portrait = "portrait"
-    landscape = "landscape" 
-    auto = "auto"
+class BatchOutputEnum(str, Enum):
+    zip = "zip"  # 每个任务一个PDF，打包为ZIP
+    pdf = "pdf"  # 合并为一个带书签的PDF
 
 
-app = FastAPI(title="Markdown Table to PDF Converter", version="1.0.0")
+# 流式上传的请求体大小、行数和列数限制
+upload_limits = UploadLimits.from_env()
 
-# 创建必要的目录
-os.makedirs("static", exist_ok=True)
-os.makedirs("templates", exist_ok=True)
+# 单个批量请求的任务数上限
+BATCH_MAX_ITEMS = int(os.getenv("MDT2PDF_BATCH_MAX_ITEMS", "10000"))
 
-# 挂载静态文件
-app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# 模板引擎
-templates = Jinja2Templates(directory="templates")
+# 渲染执行器：在独立进程中完成解析和PDF生成，避免阻塞事件循环
+render_executor: Optional[RenderExecutor] = None
 
-# 注册中文字体
-def register_chinese_fonts():
-    """注册中文字体，确保中文正确显示"""
-    try:
-        # 尝试多种中文字体路径
-        font_paths = [
-            # macOS 字体路径 - 更全面的字体列表
-            '/System/Library/Fonts/PingFang.ttc',
-            '/System/Library/Fonts/STHeiti Light.ttc',
-            '/System/Library/Fonts/STHeiti Medium.ttc', 
-            '/System/Library/Fonts/Helvetica.ttc',
-            '/Library/Fonts/Arial Unicode MS.ttf',
-            '/System/Library/Fonts/Hiragino Sans GB.ttc',
-            # Windows 字体路径
-            'C:\\Windows\\Fonts\\simhei.ttf',
-            'C:\\Windows\\Fonts\\simsun.ttc',
-            'C:\\Windows\\Fonts\\msyh.ttc',
-            'C:\\Windows\\Fonts\\msyhbd.ttf',
-            # Linux 字体路径
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-            '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-            '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
-            '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
-        ]
-        
-        font_registered = False
-        base_font_name = None
-        bold_font_name = None
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    print(f"尝试注册字体: {font_path}")
-                    if font_path.endswith('.ttc'):
-                        # TTC字体集合文件，尝试注册不同的子字体
-                        for subfont_index in range(3):  # 尝试前3个子字体
-                            try:
-                                font_name = f'ChineseFont{subfont_index}'
-                                pdfmetrics.registerFont(TTFont(font_name, font_path, subfontIndex=subfont_index))
-                                
-                                # 尝试找到粗体字体，先尝试不同索引
-                                bold_registered = False
-                                for bold_index in range(3):
-                                    try:
-                                        bold_font_name = f'{font_name}-Bold'
-                                        pdfmetrics.registerFont(TTFont(bold_font_name, font_path, subfontIndex=bold_index))
-                                        bold_registered = True
-                                        break
-                                    except:
-                                        continue
-                                
-                                # 如果找不到独立粗体，使用同一字体作为粗体
-                                if not bold_registered:
-                                    bold_font_name = font_name
-                                
-                                print(f"成功注册字体: {font_path} (子字体 {subfont_index})")
-                                font_registered = True
-                                base_font_name = font_name
-                                break
-                            except Exception as e:
-                                print(f"子字体 {subfont_index} 注册失败: {e}")
-                                continue
-                    else:
-                        font_name = 'ChineseFont'
-                        pdfmetrics.registerFont(TTFont(font_name, font_path))
-                        # 注册Bold版本 - 使用相同字体文件
-                        bold_font_name = f'{font_name}-Bold'
-                        try:
-                            pdfmetrics.registerFont(TTFont(bold_font_name, font_path))
-                        except:
-                            bold_font_name = font_name  # 如果注册失败，使用相同字体
-                        print(f"成功注册字体: {font_path}")
-                        font_registered = True
-                        base_font_name = font_name
-                    
-                    if font_registered:
-                        break
-                        
-                except Exception as e:
-                    print(f"字体注册失败 {font_path}: {e}")
-                    continue
-        
-        # 如果所有字体都失败，尝试使用reportlab的内置Unicode字体
-        if not font_registered:
-            print("所有系统字体注册失败，尝试内置字体")
-            try:
-                # 尝试使用内置的字体
-                from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-                pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
-                print("成功注册内置中文字体: STSong-Light")
-                return 'STSong-Light', 'STSong-Light'
-            except:
-                print("内置中文字体也注册失败，使用Helvetica")
-                return 'Helvetica', 'Helvetica-Bold'
-                
-        return base_font_name or 'Helvetica', bold_font_name or 'Helvetica-Bold'
-    except Exception as e:
-        print(f"字体注册异常: {e}")
-        return 'Helvetica', 'Helvetica-Bold'
+# 渲染结果缓存：以表格内容、方向和字体为键
+render_cache = RenderCache.from_env()
 
-# 初始化字体
-FONT_NAME, BOLD_FONT_NAME = register_chinese_fonts()
-print(f"最终使用的字体: {FONT_NAME}, 粗体字体: {BOLD_FONT_NAME}")
+# 异步任务：任务表、结果目录和独立的任务渲染进程池
+job_manager = JobManager.from_env(initializer=init_render_worker)
 
 
-def wrap_text_in_cell(text, max_width, font_name, font_size):
-    """
-    将文本包装成Paragraph对象以支持自动换行
-    """
-    if not text:
-        return Paragraph("", ParagraphStyle(
-            'cell_style',
-            fontName=font_name,
-            fontSize=font_size,
-            alignment=TA_CENTER,
-            wordWrap='LTR',
-            leading=font_size * 1.1  # 减少行间距
-        ))
-    
-    style = ParagraphStyle(
-        'cell_style',
-        fontName=font_name,
-        fontSize=font_size,
-        alignment=TA_CENTER,
-        wordWrap='LTR',
-        leading=font_size * 1.2,  # 适度的行间距
-        leftIndent=2,
-        rightIndent=2,
-        spaceAfter=0,
-        spaceBefore=0
-    )
-    
-    return Paragraph(str(text), style)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动和停止渲染进程池、异步任务和事件循环延迟监测"""
+    global render_executor
+    render_executor = RenderExecutor.from_env(initializer=init_render_worker)
+    render_executor.start()
+    job_manager.start()
+    loop_lag.start()
+    try:
+        yield
+    finally:
+        loop_lag.stop()
+        job_manager.shutdown()
+        render_executor.shutdown()
 
 
-def parse_markdown_table(md_content: str):
-    """解析Markdown表格内容，确保UTF-8编码"""
-    # 确保内容是UTF-8编码
-    if isinstance(md_content, bytes):
-        md_content = md_content.decode('utf-8')
-    
-    # 转换Markdown为HTML
-    html = markdown.markdown(md_content, extensions=['tables'])
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # 查找表格
-    tables = soup.find_all('table')
-    if not tables:
-        # 如果没有标准表格，尝试手动解析Markdown表格
-        return parse_markdown_table_manual(md_content)
-    
-    table_data = []
-    for table in tables:
-        rows = table.find_all('tr')
-        table_rows = []
-        for row in rows:
-            cells = row.find_all(['th', 'td'])
-            row_data = [cell.get_text(strip=True) for cell in cells]
-            if row_data:  # 只添加非空行
-                table_rows.append(row_data)
-        if table_rows:
-            table_data.extend(table_rows)
-    
-    return table_data
+app = FastAPI(title="Markdown Table to PDF Converter", version="1.0.0", lifespan=lifespan)
 
+# 分阶段耗时、请求规模等指标，由 /metrics 输出；MDT2PDF_SERVER_TIMING=1 时附带 Server-Timing 头
+telemetry = Telemetry.from_env()
+app.add_middleware(TelemetryMiddleware, telemetry=telemetry, exclude=("/metrics",))
 
-def parse_markdown_table_manual(md_content: str):
-    """手动解析Markdown表格格式，确保UTF-8处理"""
-    # 确保UTF-8编码
-    if isinstance(md_content, bytes):
-        md_content = md_content.decode('utf-8')
-        
-    lines = md_content.strip().split('\n')
-    table_data = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # 跳过分隔符行 (|---|---|)
-        if re.match(r'^\|[\s\-\|:]*\|?$', line):
-            continue
-            
-        # 解析表格行
-        if line.startswith('|') and line.endswith('|'):
-            cells = [cell.strip() for cell in line[1:-1].split('|')]
-            if cells:
-                table_data.append(cells)
-        elif '|' in line:
-            cells = [cell.strip() for cell in line.split('|')]
-            if cells:
-                table_data.append(cells)
-    
-    return table_data
+# 事件循环调度延迟，写入 mdt2pdf_event_loop_lag_seconds 并在 /health 中报告
+loop_lag = LoopLagMonitor.from_env(telemetry.loop_lag)
 
+# 执行器和缓存的当前状态在抓取 /metrics 时读取
+for _name, _key, _doc in (
+    ("mdt2pdf_executor_workers", "workers", "渲染进程数量"),
+    ("mdt2pdf_executor_busy", "busy", "正在渲染的进程数量"),
+    ("mdt2pdf_executor_queue_depth", "queue_depth", "等待空闲渲染进程的任务数"),
+):
+    telemetry.registry.gauge(
+        _name, _doc, lambda key=_key: render_executor.stats()[key] if render_executor else None
+    )
+for _name, _key, _doc in (
+    ("mdt2pdf_cache_bytes", "bytes", "内存缓存占用字节数"),
+    ("mdt2pdf_cache_hits", "hits", "内存缓存累计命中次数"),
+    ("mdt2pdf_cache_shared_hits", "shared_hits", "共享缓存累计命中次数"),
+    ("mdt2pdf_cache_disk_hits", "disk_hits", "磁盘缓存累计命中次数"),
+    ("mdt2pdf_cache_misses", "misses", "缓存累计未命中次数"),
+):
+    telemetry.registry.gauge(_name, _doc, lambda key=_key: render_cache.stats()[key])
+if render_cache.shared is not None:
+    telemetry.registry.gauge(
+        "mdt2pdf_shared_cache_bytes", "共享缓存中有效条目的字节数（全部进程共用）",
+        lambda: render_cache.shared.stats()["bytes"],
+    )
+telemetry.registry.gauge(
+    "mdt2pdf_jobs_active", "本进程中排队或运行中的异步任务数", lambda: job_manager.active
+)
 
-def determine_orientation(table_data, orientation: str = "auto"):
-    """确定PDF方向，优先考虑内容适配"""
-    if orientation in ["portrait", "landscape"]:
-        return orientation
-    
-    if not table_data:
-        return "portrait"
-    
-    # 计算表格的复杂度来决定方向
-    max_cols = max(len(row) for row in table_data) if table_data else 0
-    total_content_length = sum(
-        sum(len(str(cell)) for cell in row) for row in table_data
-    ) if table_data else 0
-    avg_content_per_cell = total_content_length / (len(table_data) * max_cols) if len(table_data) > 0 and max_cols > 0 else 0
-    
-    # 更智能的方向判断：考虑列数、平均内容长度和总内容量
-    if max_cols > 4 or avg_content_per_cell > 20 or total_content_length > 500:
-        return "landscape"
-    else:
-        return "portrait"
+# 静态文件和模板目录相对于本文件，不随启动时的工作目录变化
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+os.makedirs(STATIC_DIR, exist_ok=True)
+os.makedirs(TEMPLATES_DIR, exist_ok=True)
 
+# 挂载静态文件
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
-def calculate_text_width(text, font_name, font_size):
-    """计算文本的实际显示宽度，考虑中英文混合"""
-    if not text:
-        return 0
-    
-    text_str = str(text)
-    width = 0
-    
-    for char in text_str:
-        if ord(char) > 127:  # 中文字符
-            width += font_size * 0.9  # 中文字符宽度
-        else:  # 英文字符和标点
-            width += font_size * 0.5  # 英文字符宽度
-    
-    return width
+# 模板引擎
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 
-def create_table_styles(font_size):
-    """创建表格样式，根据字体大小调整样式"""
-    # 根据字体大小调整内边距
-    padding = max(3, font_size // 2)
-    
-    return TableStyle([
-        # 字体设置
-        ('FONTNAME', (0, 0), (-1, 0), BOLD_FONT_NAME),  # 表头：使用粗体字体
-        ('FONTNAME', (0, 1), (-1, -1), FONT_NAME),      # 正文：使用普通字体
-        ('FONTSIZE', (0, 0), (-1, -1), font_size),      # 动态字体大小
-        
-        # 对齐方式
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),         # 垂直居中
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),          # 水平居中
-        
-        # 边框和网格
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # 细边框
-        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black), # 表头下细线
-        
-        # 背景色
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # 表头背景
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),     # 正文背景
-        
-        # 紧凑的内边距
-        ('LEFTPADDING', (0, 0), (-1, -1), padding),
-        ('RIGHTPADDING', (0, 0), (-1, -1), padding),
-        ('TOPPADDING', (0, 0), (-1, -1), padding),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), padding),
-    ])
-
-
-def calculate_optimal_table_size(data, available_width, available_height):
-    """优化的表格尺寸计算，确保内容尽量在一页中显示"""
-    if not data or len(data) < 1:
-        return None, None, 1.0, 10
-    
-    num_cols = len(data[0])
-    num_rows = len(data)
-    
-    # 动态字体大小策略：根据表格复杂度调整
-    total_content = sum(len(str(cell)) for row in data for cell in row)
-    
-    # 根据内容量和表格大小决定字体大小
-    if total_content > 1000 or num_rows > 8 or num_cols > 5:
-        base_font_size = 8  # 内容多时使用小字体
-    elif total_content > 500 or num_rows > 5:
-        base_font_size = 9  # 中等内容使用中等字体
-    else:
-        base_font_size = 10  # 内容少时使用标准字体
-    
-    # 计算每列的内容宽度和可能的行数
-    col_widths = []
-    max_lines_per_col = []
-    
-    for col_idx in range(num_cols):
-        max_width = 0
-        max_lines = 1
-        
-        for row in data:
-            if col_idx < len(row):
-                cell_content = str(row[col_idx])
-                text_width = calculate_text_width(cell_content, FONT_NAME, base_font_size)
-                max_width = max(max_width, text_width)
-                
-                # 更精确的换行预估：根据字符数和列宽预估
-                char_count = len(cell_content)
-                if char_count > 20:  # 长文本预估换行
-                    estimated_lines = max(1, char_count // 20)
-                    max_lines = max(max_lines, min(estimated_lines, 4))  # 限制最大行数
-        
-        col_widths.append(max_width)
-        max_lines_per_col.append(max_lines)
-    
-    # 计算基础表格尺寸
-    min_col_width = 50  # 降低最小列宽
-    padding_per_col = 8  # 减少内边距
-    
-    # 初始列宽分配
-    total_content_width = sum(col_widths)
-    border_width = num_cols  # 减少边框占用
-    base_table_width = total_content_width + padding_per_col * num_cols + border_width
-    
-    # 动态行高计算
-    max_lines_overall = max(max_lines_per_col) if max_lines_per_col else 1
-    base_row_height = max(0.8 * cm, base_font_size * max_lines_overall * 1.3 + 10)
-    estimated_table_height = num_rows * base_row_height
-    
-    # 优化的缩放策略：目标是尽量填满页面
-    width_scale = available_width / base_table_width if base_table_width > 0 else 1.0
-    height_scale = available_height / estimated_table_height if estimated_table_height > 0 else 1.0
-    
-    # 更激进的缩放策略，优先保证一页显示
-    scale_factor = min(width_scale, height_scale)
-    
-    # 如果缩放比例太小，尝试减小字体大小
-    if scale_factor < 0.6:
-        # 重新计算，使用更小的字体
-        adjusted_font_size = max(6, int(base_font_size * scale_factor * 1.2))
-        
-        # 重新计算列宽
-        adjusted_col_widths = []
-        for col_idx in range(num_cols):
-            max_width = 0
-            for row in data:
-                if col_idx < len(row):
-                    cell_content = str(row[col_idx])
-                    text_width = calculate_text_width(cell_content, FONT_NAME, adjusted_font_size)
-                    max_width = max(max_width, text_width)
-            adjusted_col_widths.append(max_width)
-        
-        # 重新计算基础宽度
-        total_content_width = sum(adjusted_col_widths)
-        base_table_width = total_content_width + padding_per_col * num_cols + border_width
-        
-        # 重新计算行高
-        base_row_height = max(0.7 * cm, adjusted_font_size * max_lines_overall * 1.3 + 8)
-        estimated_table_height = num_rows * base_row_height
-        
-        # 重新计算缩放
-        width_scale = available_width / base_table_width if base_table_width > 0 else 1.0
-        height_scale = available_height / estimated_table_height if estimated_table_height > 0 else 1.0
-        scale_factor = min(width_scale, height_scale)
-        
-        col_widths = adjusted_col_widths
-        base_font_size = adjusted_font_size
-    
-    # 智能列宽分配
-    if scale_factor < 1.0:
-        # 需要压缩时的列宽分配
-        total_weight = sum(col_widths) if sum(col_widths) > 0 else 1
-        final_col_widths = []
-        
-        for w in col_widths:
-            min_width = max(min_col_width, available_width * 0.06)  # 最小列宽6%
-            proportional_width = (w / total_weight) * available_width * 0.98
-            final_width = max(min_width, proportional_width)
-            final_col_widths.append(final_width)
-        
-        # 确保总宽度不超出
-        total_final_width = sum(final_col_widths)
-        if total_final_width > available_width:
-            adjustment_factor = available_width * 0.98 / total_final_width
-            final_col_widths = [w * adjustment_factor for w in final_col_widths]
-    else:
-        # 不需要压缩时，适当扩展
-        extra_space = available_width - base_table_width
-        space_per_col = extra_space / num_cols if num_cols > 0 else 0
-        final_col_widths = [w + padding_per_col + max(0, space_per_col) for w in col_widths]
-    
-    # 最终行高
-    final_row_height = max(base_row_height * min(scale_factor, 1.0), 0.6 * cm)
-    
-    return final_col_widths, final_row_height, scale_factor, base_font_size
+async def submit_batch_item(item: BatchItem):
+    """提交单个批量任务；渲染队列已满时等待后重试，不让整批任务因瞬时拥塞失败"""
+    while True:
+        try:
+            pdf_bytes = await render_executor.submit(
+                render_batch_item, item.markdown, item.orientation, item.layout, item.optimize
+            )
+            telemetry.observe_pdf(len(pdf_bytes), item.optimize)
+            return pdf_bytes
+        except ExecutorOverloaded as e:
+            await asyncio.sleep(e.retry_after)
 
 
-def create_pdf(table_data, orientation: str = "portrait"):
-    """创建PDF文档，优化布局确保内容在一页中并居中显示"""
-    buffer = io.BytesIO()
-    
-    # 设置页面尺寸
-    if orientation == "landscape":
-        pagesize = landscape(A4)
-    else:
-        pagesize = A4
-    
-    # 减少页面边距，为表格留出更多空间
-    margin_left = margin_right = 1.0 * cm  # 减少左右边距
-    margin_top = margin_bottom = 1.2 * cm  # 减少上下边距
-    
-    # 计算可用空间
-    available_width = pagesize[0] - margin_left - margin_right
-    available_height = pagesize[1] - margin_top - margin_bottom
-    
-    # 创建文档，设置PDF元数据确保预览器正常显示
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=pagesize, 
-        topMargin=margin_top, 
-        bottomMargin=margin_bottom,
-        leftMargin=margin_left, 
-        rightMargin=margin_right,
-        title="表格转换PDF",
-        author="Markdown表格转换工具",
-        subject="表格数据",
-        creator="mdt2pdf"
-    )
-    
-    story = []
-    
-    if table_data:
-        # 计算最优表格尺寸（现在返回字体大小）
-        col_widths, row_height, scale_factor, font_size = calculate_optimal_table_size(
-            table_data, available_width, available_height
-        )
-        
-        # 转换表格数据为Paragraph对象以支持换行
-        processed_data = []
-        
-        for row_idx, row in enumerate(table_data):
-            processed_row = []
-            for col_idx, cell in enumerate(row):
-                # 表头使用粗体
-                font_name = BOLD_FONT_NAME if row_idx == 0 else FONT_NAME
-                wrapped_cell = wrap_text_in_cell(
-                    cell, 
-                    col_widths[col_idx] if col_idx < len(col_widths) else 100, 
-                    font_name, 
-                    font_size
-                )
-                processed_row.append(wrapped_cell)
-            processed_data.append(processed_row)
-        
-        # 创建表格
-        table = Table(
-            processed_data,
-            colWidths=col_widths,
-            repeatRows=1  # 重复表头行
-        )
-        
-        # 设置表格样式（传入字体大小）
-        table_style = create_table_styles(font_size)
-        table.setStyle(table_style)
-        
-        # 计算表格实际宽度和高度
-        actual_table_width = sum(col_widths)
-        estimated_table_height = len(table_data) * row_height
-        
-        # 添加垂直居中的空白间隔
-        if estimated_table_height < available_height:
-            top_spacer_height = (available_height - estimated_table_height) / 2
-            story.append(Spacer(1, max(0, top_spacer_height)))
-        
-        # 创建居中的表格容器
-        centered_table = KeepTogether([table])
-        
-        # 如果表格宽度小于可用宽度，通过调整页边距来居中
-        if actual_table_width < available_width:
-            # 重新计算边距以实现水平居中
-            horizontal_margin = (pagesize[0] - actual_table_width) / 2
-            
-            # 重新创建文档以应用新的边距
-            doc = SimpleDocTemplate(
-                buffer, 
-                pagesize=pagesize, 
-                topMargin=margin_top, 
-                bottomMargin=margin_bottom,
-                leftMargin=horizontal_margin, 
-                rightMargin=horizontal_margin,
-                title="表格转换PDF",
-                author="Markdown表格转换工具", 
-                subject="表格数据",
-                creator="mdt2pdf"
-            )
-            
-            # 重新计算可用高度（宽度已经匹配表格宽度）
-            available_height_centered = pagesize[1] - margin_top - margin_bottom
-            
-            # 重新添加垂直居中间隔
-            story = []  # 清空之前的story
-            if estimated_table_height < available_height_centered:
-                top_spacer_height = (available_height_centered - estimated_table_height) / 2
-                story.append(Spacer(1, max(0, top_spacer_height)))
-        
-        story.append(centered_table)
-        
-        logger.info(f"PDF生成成功，缩放比例: {scale_factor:.2f}, 字体大小: {font_size}, 列宽: {[f'{w:.1f}' for w in col_widths]}, 表格宽度: {actual_table_width:.1f}")
-        
-    else:
-        # 如果没有表格数据，添加居中的提示文本
-        style = ParagraphStyle(
-            'default',
-            fontName=FONT_NAME,
-            fontSize=14,
-            alignment=1,  # 居中对齐
-            textColor=colors.black
-        )
-        
-        # 添加垂直居中的间隔
-        story.append(Spacer(1, available_height / 2 - 1 * cm))
-        story.append(Paragraph("没有找到有效的表格数据", style))
-    
-    # 构建PDF，设置文档属性确保预览器正常显示
-    try:
-        doc.build(story)
-        
-        # 在buffer中添加一些PDF查看器兼容性设置
-        buffer.seek(0)
-        pdf_content = buffer.read()
-        buffer.seek(0)
-        buffer.truncate()
-        
-        # 重新写入内容，确保PDF查看器工具栏正常显示
-        buffer.write(pdf_content)
-        buffer.seek(0)
-        
-    except Exception as e:
-        logger.error(f"PDF生成失败: {e}")
-        # 如果居中布局失败，使用原始布局
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer, 
-            pagesize=pagesize, 
-            topMargin=margin_top, 
-            bottomMargin=margin_bottom,
-            leftMargin=margin_left, 
-            rightMargin=margin_right
-        )
-        
-        story = []
-        if table_data:
-            col_widths, row_height, scale_factor, font_size = calculate_optimal_table_size(
-                table_data, available_width, available_height
-            )
-            
-            processed_data = []
-            for row_idx, row in enumerate(table_data):
-                processed_row = []
-                for col_idx, cell in enumerate(row):
-                    font_name = BOLD_FONT_NAME if row_idx == 0 else FONT_NAME
-                    wrapped_cell = wrap_text_in_cell(
-                        cell, 
-                        col_widths[col_idx] if col_idx < len(col_widths) else 100, 
-                        font_name, 
-                        font_size
-                    )
-                    processed_row.append(wrapped_cell)
-                processed_data.append(processed_row)
-            
-            table = Table(processed_data, colWidths=col_widths, repeatRows=1)
-            table_style = create_table_styles(font_size)
-            table.setStyle(table_style)
-            story.append(KeepTogether([table]))
-        
-        doc.build(story)
-        buffer.seek(0)
-    
-    return buffer
+def check_batch_item(item: BatchItem):
+    """校验任务中的页面方向、布局和输出优化参数"""
+    if item.orientation not in OrientationEnum.__members__:
+        raise BatchError(f"任务 {item.name} 的页面方向无效: {item.orientation}")
+    if item.layout not in LayoutEnum.__members__:
+        raise BatchError(f"任务 {item.name} 的表格布局无效: {item.layout}")
+    if item.optimize not in OptimizeEnum.__members__:
+        raise BatchError(f"任务 {item.name} 的输出优化方式无效: {item.optimize}")
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -625,53 +154,389 @@ async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+def pdf_headers(cache_key: str) -> dict:
+    """PDF响应头；相同的输入、方向和字体总是生成相同的PDF，缓存键直接作为ETag"""
+    return {
+        "Content-Disposition": "inline; filename=table.pdf",  # 使用inline而不是attachment
+        "Cache-Control": "no-cache",
+        "ETag": make_etag(cache_key)
+    }
+
+
+def pdf_response(result, cache_key: str, optimize: str, headers: dict):
+    """渲染进程生成的PDF转换为响应：大文件直接从临时文件发送，其余写入缓存后返回"""
+    telemetry.observe_pdf(result.size if isinstance(result, SpooledPdf) else len(result), optimize)
+    if isinstance(result, SpooledPdf):
+        # 发送完成后删除临时文件，不进入内存缓存
+        return FileResponse(
+            result.path,
+            media_type="application/pdf",
+            headers=headers,
+            background=BackgroundTask(result.remove)
+        )
+    return Response(content=result, media_type="application/pdf", headers=headers)
+
+
+async def render_tables_response(
+    tables, source_digest: str, orientation: str, layout: str, optimize: str, if_none_match: Optional[str]
+):
+    """
+    根据解析好的表格生成PDF响应（含ETag、缓存和大文件落盘）；optimize=size 时输出体积优化的PDF。
+    缓存键按原始请求体的摘要计算，方向判断和排版都在渲染进程中完成
+    """
+    telemetry.observe_tables(tables)
+    cache_key = make_source_cache_key(source_digest, orientation, font_manager.fingerprint(), layout, optimize)
+    headers = pdf_headers(cache_key)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    # 磁盘层的读写在线程中进行
+    pdf_bytes = await asyncio.to_thread(render_cache.get, cache_key)
+    if pdf_bytes is not None:
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    
+    result = await render_executor.submit(render_tables_to_pdf, tables, orientation, layout, optimize)
+    if not isinstance(result, SpooledPdf):
+        await asyncio.to_thread(render_cache.put, cache_key, result)
+    return pdf_response(result, cache_key, optimize, headers)
+
+
+def render_error_to_http(e: Exception) -> HTTPException:
+    """渲染阶段的异常转换为HTTP错误"""
+    if isinstance(e, ExecutorOverloaded):
+        return HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    if isinstance(e, RenderTimeout):
+        return HTTPException(status_code=504, detail=f"PDF生成超时: {str(e)}")
+    logger.error(f"PDF生成错误: {e}", exc_info=e)
+    return HTTPException(status_code=500, detail=f"PDF生成失败: {str(e)}")
+
+
 @app.post("/convert")
 async def convert_markdown_to_pdf(
     markdown_content: str = Form(...),
-    orientation: OrientationEnum = Form(OrientationEnum.auto)
+    orientation: OrientationEnum = Form(OrientationEnum.auto),
+    layout: LayoutEnum = Form(LayoutEnum.fit),
+    optimize: OptimizeEnum = Form(OptimizeEnum.none),
+    if_none_match: Optional[str] = Header(None)
 ):
-    """转换Markdown表格为PDF"""
+    """转换Markdown表格为PDF；optimize=size 时输出体积优化的PDF（精简字体子集、压缩内容流）"""
     try:
-        print(f"接收到的内容: {markdown_content[:100]}...")  # 调试信息
+        # 缓存键只对原始文本做一次 sha256；解析表格、确定方向和排版都在渲染进程中完成，
+        # 服务进程不做任何与表格规模相关的计算
+        source_digest = await asyncio.to_thread(hash_source, markdown_content)
+        cache_key = make_source_cache_key(
+            source_digest, orientation.value, font_manager.fingerprint(), layout.value, optimize.value
+        )
+        headers = pdf_headers(cache_key)
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
         
-        # 解析Markdown表格
-        table_data = parse_markdown_table(markdown_content)
-        print(f"解析得到的表格数据: {table_data}")  # 调试信息
+        pdf_bytes = await asyncio.to_thread(render_cache.get, cache_key)
+        if pdf_bytes is not None:
+            return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
         
-        if not table_data:
+        shapes, result = await render_executor.submit(
+            render_markdown_to_pdf, markdown_content, orientation.value, layout.value, optimize.value
+        )
+        if result is None:
             raise HTTPException(status_code=400, detail="未找到有效的表格数据")
+        telemetry.observe_shapes(shapes)
+        if not isinstance(result, SpooledPdf):
+            await asyncio.to_thread(render_cache.put, cache_key, result)
+        return pdf_response(result, cache_key, optimize.value, headers)
         
-        # 确定方向
-        final_orientation = determine_orientation(table_data, orientation.value)
-        print(f"确定的页面方向: {final_orientation}")  # 调试信息
-        
-        # 生成PDF
-        pdf_buffer = create_pdf(table_data, final_orientation)
-        
-        # 返回PDF文件，设置正确的响应头确保预览器工具栏显示
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise render_error_to_http(e)
+
+
+@app.post("/preview")
+async def preview_markdown_table(
+    markdown_content: str = Form(...),
+    orientation: OrientationEnum = Form(OrientationEnum.auto),
+    layout: LayoutEnum = Form(LayoutEnum.fit),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    HTML预览：使用与PDF相同的页面方向、列宽和字号，不经过ReportLab排版，
+    完整的PDF只在下载时通过 /convert 生成
+    """
+    try:
+        # 与 /convert 相同：服务进程只计算原始文本的摘要，解析和预览计算在渲染进程中完成
+        source_digest = await asyncio.to_thread(hash_source, markdown_content)
+        cache_key = make_source_cache_key(
+            source_digest, orientation.value, font_manager.fingerprint(), f"preview-{layout.value}"
+        )
+        etag = make_etag(cache_key)
+        headers = {"Cache-Control": "no-cache", "ETag": etag}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        
+        html_bytes = await asyncio.to_thread(render_cache.get, cache_key)
+        if html_bytes is None:
+            shapes, html_bytes = await render_executor.submit(
+                render_markdown_preview, markdown_content, orientation.value, layout.value
+            )
+            if html_bytes is None:
+                raise HTTPException(status_code=400, detail="未找到有效的表格数据")
+            telemetry.observe_shapes(shapes)
+            await asyncio.to_thread(render_cache.put, cache_key, html_bytes)
+        return Response(content=html_bytes, media_type="text/html; charset=utf-8", headers=headers)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise render_error_to_http(e)
+
+
+async def read_request_tables(request: Request):
+    """
+    边接收边解析请求体中的表格：原始 Markdown（text/markdown、text/plain 等）
+    或 multipart 上传的单个 file；超过大小、行数或列数限制时返回 413。
+    返回表格列表和原始 Markdown 字节的 sha256（用于缓存键）
+    """
+    digest = hashlib.sha256()
+    content_type = request.headers.get("content-type", "")
+    try:
+        upload_limits.check_content_length(request.headers.get("content-length"))
+        if content_type.startswith("multipart/form-data"):
+            # 文件字段的内容随请求体的接收逐块取出并解析，不写入临时文件，行数和列数超限时同样立即返回 413
+            with span("parse"):
+                tables = await read_tables(
+                    multipart_file_chunks(content_type, upload_limits.limit_bytes(request.stream())),
+                    upload_limits, digest=digest
+                )
+        else:
+            # 边接收边解析，这里的耗时包含接收请求体的时间
+            with span("parse"):
+                tables = await read_tables(request.stream(), upload_limits, digest=digest)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="请求体不是UTF-8编码")
+    except InvalidMultipart as e:
+        raise HTTPException(status_code=400, detail=f"multipart 请求体无效: {e}")
+    
+    if not tables:
+        raise HTTPException(status_code=400, detail="未找到有效的表格数据")
+    logger.debug(f"流式上传解析完成: {len(tables)} 个表格")
+    return tables, digest.hexdigest()
+
+
+@app.post("/convert/stream")
+async def convert_stream(
+    request: Request,
+    orientation: OrientationEnum = OrientationEnum.auto,
+    layout: LayoutEnum = LayoutEnum.fit,
+    optimize: OptimizeEnum = OptimizeEnum.none,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    流式上传转换：请求体为原始 Markdown（text/markdown、text/plain 等），
+    或 multipart 上传的单个 file；边接收边解析，超过大小、行数或列数限制时返回 413
+    """
+    tables, source_digest = await read_request_tables(request)
+    try:
+        return await render_tables_response(
+            tables, source_digest, orientation.value, layout.value, optimize.value, if_none_match
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise render_error_to_http(e)
+
+
+@app.post("/convert/batch")
+async def convert_batch(
+    request: Request,
+    output: BatchOutputEnum = BatchOutputEnum.zip,
+    orientation: OrientationEnum = OrientationEnum.auto,
+    layout: LayoutEnum = LayoutEnum.fit,
+    optimize: OptimizeEnum = OptimizeEnum.none
+):
+    """
+    批量转换：multipart 上传多个 files，或 NDJSON 流（每行一个任务）；
+    每个任务独立解析和渲染，返回 ZIP（output=zip）或合并PDF（output=pdf）
+    """
+    content_type = request.headers.get("content-type", "")
+    runner = BatchRunner(submit_batch_item, render_executor.workers)
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form(max_files=BATCH_MAX_ITEMS, max_fields=BATCH_MAX_ITEMS + 16)
+            default_orientation = form.get("orientation") or orientation.value
+            default_layout = form.get("layout") or layout.value
+            default_optimize = form.get("optimize") or optimize.value
+            output = BatchOutputEnum(form.get("output") or output.value)
+            uploads = form.getlist("files")
+            if len(uploads) > BATCH_MAX_ITEMS:
+                raise BatchError(f"任务数超过上限 {BATCH_MAX_ITEMS}")
+            for index, upload in enumerate(uploads):
+                try:
+                    markdown_content = (await upload.read()).decode("utf-8-sig")
+                except UnicodeDecodeError:
+                    raise BatchError(f"文件 {upload.filename} 不是UTF-8编码")
+                item = BatchItem(
+                    index, item_name(upload.filename, index), markdown_content,
+                    default_orientation, default_layout, default_optimize
+                )
+                check_batch_item(item)
+                runner.add(item)
+        elif content_type.split(";")[0].strip() in ("application/x-ndjson", "application/jsonl"):
+            # 边接收边调度：请求体还没读完时，前面的任务已经开始渲染
+            async for item in aiter_ndjson_items(
+                request.stream(), orientation.value, layout.value, BATCH_MAX_ITEMS, optimize.value
+            ):
+                check_batch_item(item)
+                runner.add(item)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail="请使用 multipart/form-data 或 application/x-ndjson 提交批量任务"
+            )
+    except (BatchError, ValueError) as e:
+        runner.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        runner.cancel()
+        raise
+    
+    if not len(runner):
+        raise HTTPException(status_code=400, detail="批量请求中没有任务")
+    logger.info(f"批量任务: {len(runner)} 个, 输出: {output.value}")
+    
+    if output == BatchOutputEnum.zip:
         return StreamingResponse(
-            io.BytesIO(pdf_buffer.read()),
-            media_type="application/pdf",
+            stream_zip(runner),
+            media_type="application/zip",
             headers={
-                "Content-Disposition": "inline; filename=table.pdf",  # 使用inline而不是attachment
-                "Content-Type": "application/pdf",
-                "Cache-Control": "no-cache",
-                "Pragma": "no-cache"
+                "Content-Disposition": "attachment; filename=tables.zip",
+                "X-Batch-Items": str(len(runner))
             }
         )
-        
-    except Exception as e:
-        print(f"PDF生成错误: {e}")  # 调试信息
-        raise HTTPException(status_code=500, detail=f"PDF生成失败: {str(e)}")
+    
+    results = await runner.in_order()
+    with span("merge"):
+        pdf_bytes, manifest = await asyncio.to_thread(merge_pdfs, results)
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": "attachment; filename=tables.pdf",
+            "X-Batch-Items": str(len(manifest)),
+            "X-Batch-Failed": str(sum(not entry["ok"] for entry in manifest))
+        }
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    orientation: OrientationEnum = OrientationEnum.auto,
+    layout: LayoutEnum = LayoutEnum.fit,
+    optimize: OptimizeEnum = OptimizeEnum.none
+):
+    """
+    提交异步转换任务：请求体与 /convert/stream 相同，解析完成后立即返回任务信息，
+    渲染在任务进程池中进行；相同内容和参数的未过期任务直接返回已有任务
+    """
+    tables, source_digest = await read_request_tables(request)
+    telemetry.observe_tables(tables)
+    key = make_source_cache_key(
+        source_digest, orientation.value, font_manager.fingerprint(), layout.value, optimize.value
+    )
+    try:
+        job, created = await job_manager.submit(key, tables, orientation.value, layout.value, optimize.value)
+    except ExecutorOverloaded as e:
+        raise render_error_to_http(e)
+    info = job_info(job)
+    info["deduplicated"] = not created
+    return JSONResponse(info, status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+
+async def get_job_or_404(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """任务状态和进度"""
+    return job_info(await get_job_or_404(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """下载任务结果；任务未完成、失败或已取消时返回 409"""
+    job = await get_job_or_404(job_id)
+    if job["status"] != DONE:
+        detail = f"任务状态为 {job['status']}"
+        if job["error"]:
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    path = job_manager.result_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="任务结果已被清理")
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        headers={"Content-Disposition": "attachment; filename=table.pdf", "ETag": make_etag(job["key"])}
+    )
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消排队中或运行中的任务，返回取消后的任务信息；已结束的任务不受影响"""
+    await get_job_or_404(job_id)
+    return job_info(await job_manager.cancel(job_id))
 
 
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
-    return {"status": "healthy", "font": FONT_NAME, "bold_font": BOLD_FONT_NAME}
+    return {
+        "status": "healthy",
+        "pid": os.getpid(),
+        "font": font_manager.font_name,
+        "bold_font": font_manager.bold_font_name,
+        "fonts": font_manager.describe(),
+        "executor": render_executor.stats() if render_executor else None,
+        "cache": render_cache.stats(),
+        "jobs": await asyncio.to_thread(job_manager.stats),
+        "event_loop": loop_lag.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(content=telemetry.registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Markdown表格转PDF服务")
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="不启动服务，输出各模块导入耗时、初始化步骤耗时和各启动方式下渲染进程的就绪耗时",
+    )
+    parser.add_argument("--profile-json", help="启动耗时分析结果同时写入该JSON文件")
+    parser.add_argument("--profile-workers", type=int, default=2, help="启动耗时分析中渲染进程的数量")
+    args = parser.parse_args()
+    if args.startup_profile:
+        from mdt2pdf.startup import run_startup_profile
+
+        logging.disable(logging.INFO)
+        sys.exit(run_startup_profile(args.profile_json, args.profile_workers))
+
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
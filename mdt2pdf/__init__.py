@@ -0,0 +1 @@
+"""mdt2pdf 渲染核心（converter）、命令行工具（cli）和各子系统（渲染执行器等），Web 接口由 main.py 组装"""
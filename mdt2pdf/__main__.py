@@ -0,0 +1,7 @@
+"""python -m mdt2pdf：与 mdt2pdf 命令相同"""
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+批量转换：任务解析、并发调度与结果打包
+
+任务来自 multipart 上传的多个文件或 NDJSON 流（每行一个 {"name", "markdown", "orientation", "layout", "optimize"}），
+每个任务单独提交到渲染进程池，结果按完成顺序流式写入 ZIP，或按提交顺序合并为一个带书签的 PDF。
+每个任务的成功/失败信息写入 manifest.json（ZIP 中的文件，或合并 PDF 的附件）。
+"""
+import io
+import re
+import json
+import asyncio
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterable, Awaitable, Callable, List, Optional
+
+from pypdf import PdfReader, PdfWriter
+
+from .table_parser import aiter_lines
+
+MANIFEST_NAME = "manifest.json"
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+class BatchError(ValueError):
+    """批量请求本身无效（格式错误、任务数超限等）"""
+
+
+@dataclass
+class BatchItem:
+    """一个批量转换任务"""
+
+    index: int
+    name: str
+    markdown: str
+    orientation: str
+    layout: str
+    optimize: str = "none"
+
+
+@dataclass
+class BatchResult:
+    """单个任务的结果：成功时 pdf 为字节，失败时 error 为错误描述"""
+
+    item: BatchItem
+    pdf: Optional[bytes] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def item_name(name: Optional[str], index: int) -> str:
+    """任务名称：去掉目录和扩展名，替换文件名中不允许的字符"""
+    if not name:
+        return f"table-{index + 1}"
+    base = name.replace("\\", "/").rsplit("/", 1)[-1]
+    base = re.sub(r"\.(md|markdown|txt)$", "", base, flags=re.IGNORECASE)
+    return _UNSAFE_CHARS.sub("_", base).strip() or f"table-{index + 1}"
+
+
+async def aiter_ndjson_items(
+    chunks: AsyncIterable[bytes], orientation: str, layout: str, max_items: int, optimize: str = "none"
+):
+    """从 NDJSON 字节流中逐行读取任务，orientation / layout / optimize 为缺省值"""
+    index = 0
+    async for line in aiter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            raise BatchError(f"第 {index + 1} 个任务不是有效的JSON: {e}")
+        if not isinstance(job, dict) or not isinstance(job.get("markdown"), str):
+            raise BatchError(f"第 {index + 1} 个任务缺少 markdown 字段")
+        if index >= max_items:
+            raise BatchError(f"任务数超过上限 {max_items}")
+        yield BatchItem(
+            index,
+            item_name(job.get("name"), index),
+            job["markdown"],
+            job.get("orientation") or orientation,
+            job.get("layout") or layout,
+            job.get("optimize") or optimize,
+        )
+        index += 1
+
+
+class BatchRunner:
+    """以有限并发把任务提交给 render(item)，结果可按完成顺序或提交顺序取回"""
+
+    def __init__(self, render: Callable[[BatchItem], Awaitable[bytes]], concurrency: int):
+        self._render = render
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def add(self, item: BatchItem):
+        """立即开始调度任务（受并发上限控制），不等待结果"""
+        self._tasks.append(asyncio.ensure_future(self._run(item)))
+
+    async def _run(self, item: BatchItem) -> BatchResult:
+        async with self._semaphore:
+            try:
+                return BatchResult(item, pdf=await self._render(item))
+            except Exception as e:
+                return BatchResult(item, error=str(e) or type(e).__name__)
+
+    async def as_completed(self):
+        for future in asyncio.as_completed(self._tasks):
+            yield await future
+
+    async def in_order(self) -> List[BatchResult]:
+        return list(await asyncio.gather(*self._tasks))
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+
+def manifest_entry(result: BatchResult, **extra) -> dict:
+    entry = {"index": result.item.index, "name": result.item.name, "ok": result.ok}
+    if result.ok:
+        entry["bytes"] = len(result.pdf)
+    else:
+        entry["error"] = result.error
+    entry.update(extra)
+    return entry
+
+
+class _ChunkSink:
+    """zipfile 的输出目标：收集写入的字节，由调用方逐块取走"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def stream_zip(runner: BatchRunner):
+    """按完成顺序把 PDF 写入 ZIP 并逐块产出，最后写入 manifest.json"""
+    sink = _ChunkSink()
+    manifest = []
+    used_names = set()
+    try:
+        # PDF 本身已压缩，使用 STORED 避免在事件循环中做无效压缩
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            async for result in runner.as_completed():
+                if result.ok:
+                    filename = f"{result.item.name}.pdf"
+                    if filename in used_names:
+                        filename = f"{result.item.name}-{result.item.index + 1}.pdf"
+                    used_names.add(filename)
+                    archive.writestr(filename, result.pdf)
+                    manifest.append(manifest_entry(result, file=filename))
+                    yield sink.take()
+                else:
+                    manifest.append(manifest_entry(result))
+            manifest.sort(key=lambda entry: entry["index"])
+            archive.writestr(
+                MANIFEST_NAME,
+                json.dumps(manifest, ensure_ascii=False, indent=2),
+                compress_type=zipfile.ZIP_DEFLATED,
+            )
+        yield sink.take()
+    finally:
+        runner.cancel()
+
+
+def merge_pdfs(results: List[BatchResult]):
+    """按任务顺序合并成功的 PDF，每个任务一个书签；返回 (PDF字节, manifest)"""
+    writer = PdfWriter()
+    manifest = []
+    for result in results:
+        if not result.ok:
+            manifest.append(manifest_entry(result))
+            continue
+        page = len(writer.pages)
+        writer.append(PdfReader(io.BytesIO(result.pdf)), outline_item=result.item.name)
+        manifest.append(manifest_entry(result, page=page + 1))
+    writer.add_attachment(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue(), manifest
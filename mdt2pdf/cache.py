@@ -0,0 +1,234 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+
+def _output_options(layout: str, optimize: str) -> list:
+    """布局模式和输出优化方式；默认输出不写入优化方式"""
+    return [layout] if optimize == "none" else [layout, optimize]
+
+
+def hash_source(markdown_content) -> str:
+    """原始 Markdown（字符串按UTF-8编码）的 sha256，与流式上传时对请求体逐块计算的结果相同"""
+    if isinstance(markdown_content, str):
+        markdown_content = markdown_content.encode("utf-8")
+    return hashlib.sha256(markdown_content).hexdigest()
+
+
+def make_source_cache_key(source_digest: str, orientation: str, fonts, layout: str = "fit", optimize: str = "none") -> str:
+    """
+    按原始 Markdown 计算内容地址：source_digest 为请求中 Markdown 字节的 sha256，页面方向为请求的方向
+    （auto 时不代入判断结果）。不需要先解析表格，服务进程在接收请求时即可算出，解析和方向判断都留给渲染进程。
+    键不做规范化：只是单元格两侧空白等写法不同、表格内容相同的两份 Markdown 得到不同的键，各自渲染一次
+    """
+    payload = json.dumps(
+        ["source", source_digest, orientation, list(fonts)] + _output_options(layout, optimize),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_etag(key: str) -> str:
+    """强ETag：同一输入总是渲染出字节相同的PDF"""
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 请求头是否命中当前ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class RenderCache:
+    """
+    PDF渲染结果缓存：
+    - 内存层：按字节数限制的LRU
+    - 共享层（可选）：同一台机器上的全部服务进程共用的内存映射文件（见 shared_cache）
+    - 磁盘层（可选）：按字节数限制，淘汰最久未使用的文件
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        shared: Optional[SharedCache] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shared = shared
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建缓存；启用共享层时，各进程自己的内存层默认关闭，避免每个进程再存一份"""
+        shared = SharedCache.from_env()
+        default_max_bytes = 0 if shared is not None else 64 * 1024 * 1024
+        return cls(
+            max_bytes=int(os.getenv("MDT2PDF_CACHE_MAX_BYTES", str(default_max_bytes))),
+            disk_dir=os.getenv("MDT2PDF_CACHE_DIR") or None,
+            disk_max_bytes=int(os.getenv("MDT2PDF_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+            shared=shared,
+        )
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pdf")
+
+    def _load_disk_index(self):
+        """启动时扫描磁盘缓存目录，按修改时间从旧到新建立索引"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".pdf"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.info(f"磁盘缓存已加载: {len(self._disk)} 个文件, {self._disk_bytes} 字节")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """查找缓存，共享层或磁盘命中时提升到内存层（磁盘命中同时写入共享层）"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            on_disk = key in self._disk
+
+        if self.shared is not None:
+            data = self.shared.get(key)
+            if data is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                    self._put_memory(key, data)
+                return data
+
+        if on_disk:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._drop_disk_entry(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self._put_memory(key, data)
+            if data is not None:
+                if self.shared is not None:
+                    self.shared.put(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        """写入缓存（内存层、共享层和磁盘层）"""
+        with self._lock:
+            self._put_memory(key, data)
+            write_disk = self.disk_dir is not None and key not in self._disk
+        if self.shared is not None:
+            self.shared.put(key, data)
+        if write_disk:
+            self._put_disk(key, data)
+
+    def _put_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _put_disk(self, key, data):
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入磁盘缓存失败 {path}: {e}")
+            return
+
+        with self._lock:
+            # 同一个键可能被并发写入两次，已记录的条目不再重复计入字节数
+            self._drop_disk_entry(key)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_max_bytes and self._disk:
+                oldest = next(iter(self._disk))
+                self._drop_disk_entry(oldest, remove_file=True)
+
+    def _drop_disk_entry(self, key, remove_file=False):
+        size = self._disk.pop(key, 0)
+        self._disk_bytes -= size
+        if remove_file:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """缓存命中率与容量统计"""
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
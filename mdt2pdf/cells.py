@@ -0,0 +1,232 @@
+"""
+表格单元格：共享样式池与轻量单行单元格
+
+ParagraphStyle / TableStyle 按 (字体, 字号, 对齐, 角色) 缓存并在单元格、表格之间共享，
+不再为每个单元格新建样式对象；能在一行内放下、且不含标记字符的短文本使用 CellText 直接绘制，
+跳过 Paragraph 的标记解析和断行。
+
+数值、日期和短文本列整列都能在一行内放下时，单元格直接使用字符串，由 Table 按列的对齐方式绘制，
+不为这些单元格创建任何对象，也不再逐个测量宽度。
+"""
+from functools import lru_cache
+from itertools import islice, repeat
+from typing import List, Sequence
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import Flowable, Paragraph, TableStyle
+
+from .layout import LEADING_RATIO, PARAGRAPH_INDENT, cell_padding
+from .metrics import unit_width, text_width
+from .table_data import LONG
+
+# 表格标题的行距与段后间距
+CAPTION_LEADING_RATIO = 4 / 3
+CAPTION_SPACE_AFTER = 0.3 * cm
+
+_ALIGNMENTS = {"left": TA_LEFT, "center": TA_CENTER, "right": TA_RIGHT}
+_TABLE_ALIGNMENTS = {"left": "LEFT", "center": "CENTER", "right": "RIGHT"}
+
+
+@lru_cache(maxsize=None)
+def paragraph_style(font_name: str, font_size: float, alignment: str = "center", role: str = "cell") -> ParagraphStyle:
+    """共享的段落样式；role 为 cell（单元格）或 caption（表格标题）"""
+    if role == "caption":
+        return ParagraphStyle(
+            f"{role}_{font_name}_{font_size}_{alignment}",
+            fontName=font_name,
+            fontSize=font_size,
+            leading=font_size * CAPTION_LEADING_RATIO,
+            alignment=_ALIGNMENTS[alignment],
+            spaceAfter=CAPTION_SPACE_AFTER,
+        )
+    return ParagraphStyle(
+        f"{role}_{font_name}_{font_size}_{alignment}",
+        fontName=font_name,
+        fontSize=font_size,
+        alignment=_ALIGNMENTS[alignment],
+        wordWrap="LTR",
+        leading=font_size * LEADING_RATIO,
+        leftIndent=PARAGRAPH_INDENT / 2,
+        rightIndent=PARAGRAPH_INDENT / 2,
+        spaceAfter=0,
+        spaceBefore=0,
+    )
+
+
+@lru_cache(maxsize=1024)
+def table_style(font_name: str, bold_font_name: str, font_size: float, alignments: tuple = ()) -> TableStyle:
+    """
+    共享的表格样式，Table.setStyle 只读取其中的命令，可以在多个表格间复用；
+    alignments 为各列的对齐方式（left/center/right），未给出的列居中
+    """
+    padding = cell_padding(font_size)
+    column_alignments = [
+        ('ALIGN', (col_idx, 0), (col_idx, -1), _TABLE_ALIGNMENTS[alignment])
+        for col_idx, alignment in enumerate(alignments)
+        if alignment != "center"
+    ]
+    return TableStyle([
+        # 字体设置
+        ('FONTNAME', (0, 0), (-1, 0), bold_font_name),  # 表头：使用粗体字体
+        ('FONTNAME', (0, 1), (-1, -1), font_name),      # 正文：使用普通字体
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),      # 动态字体大小
+        ('LEADING', (0, 0), (-1, -1), font_size * LEADING_RATIO),  # 字符串单元格的行距，与 CellText 一致
+
+        # 对齐方式
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),         # 垂直居中
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),          # 水平居中
+        *column_alignments,                              # 对齐行指定的列和数值列
+
+        # 边框和网格
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # 细边框
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black), # 表头下细线
+
+        # 背景色
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # 表头背景
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),     # 正文背景
+
+        # 紧凑的内边距
+        ('LEFTPADDING', (0, 0), (-1, -1), padding),
+        ('RIGHTPADDING', (0, 0), (-1, -1), padding),
+        ('TOPPADDING', (0, 0), (-1, -1), padding),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), padding),
+    ])
+
+
+class CellText(Flowable):
+    """
+    单行单元格：宽度取文本实际宽度，由表格的 ALIGN 负责水平对齐，
+    基线位置与单行 Paragraph 相同。不调用 Flowable.__init__，默认属性放在类上。
+    """
+
+    hAlign = "CENTER"
+    vAlign = "MIDDLE"
+    wrapped = 0
+    _traceInfo = None
+    _showBoundary = None
+    encoding = None
+
+    def __init__(self, text: str, font_name: str, font_size: float, width: float):
+        self.text = text
+        self.font_name = font_name
+        self.font_size = font_size
+        self.width = width
+        self.height = font_size * LEADING_RATIO if text else 0
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        if self.text:
+            canv = self.canv
+            canv.setFont(self.font_name, self.font_size)
+            canv.drawString(0, self.height - self.font_size, self.text)
+
+
+class CellParagraph(Paragraph):
+    """
+    需要换行的单元格：按可用宽度记住上一次 wrap 的结果。
+    表格分页时每个分片都会重新 wrap 全部单元格，单元格对象在多次渲染间复用时同样如此，
+    宽度不变时直接返回上次的尺寸，不再重复断行
+    """
+
+    _wrap_width = None
+    _wrap_size = None
+
+    def wrap(self, availWidth, availHeight):
+        if availWidth != self._wrap_width:
+            self._wrap_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrap_width = availWidth
+        return self._wrap_size
+
+
+def measure_row_height(cells, col_widths, font_size: float) -> float:
+    """
+    一行单元格的高度，与 Table._calc_height 对单个 Flowable 单元格的计算一致。
+    预先算好传给 Table 的 rowHeights，表格分页时每个分片不再重新 wrap 全部单元格
+    """
+    padding = cell_padding(font_size)
+    height = 0
+    for cell, col_width in zip(cells, col_widths):
+        if isinstance(cell, str):
+            # 字符串单元格只有一行
+            cell_height = font_size * LEADING_RATIO if cell else 0
+        else:
+            _, cell_height = cell.wrap(col_width - padding - padding, 72000 - padding - padding)
+        height = max(height, cell_height + (padding + padding))
+    return height
+
+
+def split_row_cells(cells, col_widths, font_size: float, avail_height: float):
+    """
+    把高于整页的一行在单元格内部拆成两段：avail_height 内放得下的行，以及留给下一页的续行。
+    换行单元格按 Paragraph.split 断开，至少留下一行文字；单行单元格整个放在第一段，续行中对应位置为空
+    """
+    padding = cell_padding(font_size)
+    content_height = max(avail_height - 2 * padding, font_size * LEADING_RATIO)
+    head, tail = [], []
+    for cell, col_width in zip(cells, col_widths):
+        parts = cell.split(col_width - 2 * padding, content_height) if isinstance(cell, Paragraph) else [cell]
+        if not parts:
+            head.append("")
+            tail.append(cell)
+            continue
+        head.append(parts[0])
+        tail.append(parts[1] if len(parts) > 1 else "")
+    return head, tail
+
+
+def plain_text(text) -> str:
+    """字符串单元格的文本：与 Paragraph 一样合并连续空白"""
+    text = str(text) if text else ""
+    if "  " in text or "\t" in text or "\n" in text:
+        return " ".join(text.split())
+    return text
+
+
+def plain_columns(table_data, col_widths: Sequence[float], font_name: str, header_font_name: str, font_size: float) -> List[bool]:
+    """
+    各列是否整列使用字符串单元格：不是长文本列，且整列最宽的单元格（表头按粗体）在当前列宽下
+    能在一行内放下。单元格宽度在布局测量时已经缓存，这里的查找不会重新测量
+    """
+    padding = cell_padding(font_size)
+    result = []
+    for column, kind, col_width in zip(table_data.columns, table_data.kinds, col_widths):
+        if kind == LONG or not column:
+            result.append(False)
+            continue
+        inner = (col_width - 2 * padding - PARAGRAPH_INDENT) * 1000 / font_size
+        widest = max(
+            unit_width(column[0], header_font_name),
+            max(map(unit_width, islice(column, 1, None), repeat(font_name)), default=0),
+        )
+        result.append(widest <= inner)
+    return result
+
+
+def make_row_cells(row, col_widths, plain, alignments, font_name: str, font_size: float) -> list:
+    """创建一行单元格：字符串列直接使用文本，其余列按单元格选择 CellText 或 CellParagraph"""
+    return [
+        plain_text(text) if is_plain else make_cell(text, col_width, font_name, font_size, alignment)
+        for text, col_width, is_plain, alignment in zip(row, col_widths, plain, alignments)
+    ]
+
+
+def make_cell(text, col_width: float, font_name: str, font_size: float, alignment: str = "center"):
+    """
+    创建单元格：空单元格和能在一行内放下的纯文本使用 CellText，
+    其余文本（需要换行或含 < & 等标记字符）使用共享样式的 CellParagraph
+    """
+    text = str(text) if text else ""
+    if not text:
+        return CellText("", font_name, font_size, 0)
+    if "<" not in text and "&" not in text:
+        # Paragraph 会合并连续空白，这里保持一致
+        line = " ".join(text.split())
+        width = text_width(line, font_name, font_size)
+        if width <= col_width - 2 * cell_padding(font_size) - PARAGRAPH_INDENT:
+            return CellText(line, font_name, font_size, width)
+    return CellParagraph(text, paragraph_style(font_name, font_size, alignment))
@@ -0,0 +1,253 @@
+"""
+命令行批量转换：不启动 Web 服务，直接把 Markdown 文件或整个目录树转换为 PDF
+
+    mdt2pdf docs/ -o out/                  # 递归转换目录中的 *.md，输出目录保持相同的层级
+    mdt2pdf "reports/**/*.md" -o out/ -j 8  # glob 输入（需加引号，由程序展开）
+    mdt2pdf a.md b.md                       # 不指定 -o 时 PDF 写在源文件旁边
+
+多个文件由 multiprocessing 进程池并行转换（默认进程数为 CPU 核数）。输出目录中的清单文件记录每个
+输出对应源文件的修改时间、大小和 SHA-256 以及转换参数，源文件和参数都没有变化且输出仍存在时跳过；
+只有修改时间变化而内容相同的文件也会跳过。结束时输出转换数量和吞吐量，有失败时退出码为 1。
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import hashlib
+import logging
+import argparse
+import multiprocessing
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import converter
+
+MANIFEST_NAME = ".mdt2pdf-manifest.json"
+
+_GLOB_MAGIC = re.compile(r"[*?\[]")
+
+
+@dataclass
+class Task:
+    """一个待转换的文件"""
+
+    source: str
+    output: str
+    mtime_ns: int
+    size: int
+
+
+def _glob_root(pattern: str) -> str:
+    """glob 模式中第一个通配符之前的目录，输出路径相对于它保持层级"""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if _GLOB_MAGIC.search(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or "."
+
+
+def iter_sources(inputs: List[str], pattern: str = "*.md") -> Iterator[Tuple[str, str]]:
+    """
+    展开命令行输入，返回 (源文件路径, 相对输出路径)：目录递归匹配 pattern，
+    glob 模式相对于通配符前的目录，单个文件只保留文件名
+    """
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            root = item
+            matches = glob.iglob(os.path.join(glob.escape(item), "**", pattern), recursive=True)
+        elif _GLOB_MAGIC.search(item) and not os.path.exists(item):
+            root = _glob_root(item)
+            matches = glob.iglob(item, recursive=True)
+        else:
+            root = os.path.dirname(item) or "."
+            matches = [item]
+        for path in sorted(matches):
+            if not os.path.isfile(path):
+                if path == item:
+                    raise FileNotFoundError(f"输入文件不存在: {item}")
+                continue
+            key = os.path.realpath(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield path, os.path.relpath(path, root)
+
+
+def output_path(source: str, relative: str, output_dir: Optional[str]) -> str:
+    """输出 PDF 路径：指定输出目录时保持输入的目录层级，否则写在源文件旁边"""
+    name = os.path.splitext(relative)[0] + ".pdf"
+    if output_dir is None:
+        return os.path.join(os.path.dirname(source), os.path.basename(name))
+    return os.path.join(output_dir, name)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """输出路径 → 源文件状态和转换参数，用于跳过未变化的文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f).get("outputs", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_fresh(self, task: Task, options: list) -> bool:
+        """输出存在、参数相同，且源文件的修改时间和大小（或内容哈希）与上次转换时相同"""
+        entry = self.entries.get(os.path.abspath(task.output))
+        if entry is None or entry.get("options") != options or not os.path.exists(task.output):
+            return False
+        if entry.get("mtime_ns") == task.mtime_ns and entry.get("size") == task.size:
+            return True
+        # 修改时间变化（如重新检出）但内容未变化：更新记录后跳过
+        if entry.get("size") == task.size and entry.get("sha256") == file_sha256(task.source):
+            entry["mtime_ns"] = task.mtime_ns
+            return True
+        return False
+
+    def record(self, task: Task, options: list, sha256: str):
+        self.entries[os.path.abspath(task.output)] = {
+            "source": os.path.abspath(task.source),
+            "mtime_ns": task.mtime_ns,
+            "size": task.size,
+            "sha256": sha256,
+            "options": options,
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "outputs": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def convert_file(task: Task, orientation: str, layout: str, optimize: str = "none"):
+    """
+    转换一个文件（在进程池中执行），返回 (task, sha256, 输出字节数, 错误信息)；
+    先写入临时文件再改名，中断时不会留下不完整的 PDF
+    """
+    try:
+        with open(task.source, "rb") as f:
+            content = f.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        pdf_bytes = converter.convert_markdown(content.decode("utf-8-sig"), orientation, layout, optimize)
+        os.makedirs(os.path.dirname(os.path.abspath(task.output)), exist_ok=True)
+        tmp_path = f"{task.output}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, task.output)
+        return task, sha256, len(pdf_bytes), None
+    except Exception as e:
+        return task, None, 0, f"{type(e).__name__}: {e}"
+
+
+def _convert_job(job):
+    return convert_file(*job)
+
+
+def run(tasks: List[Task], orientation: str, layout: str, jobs: int, optimize: str = "none"):
+    """按完成顺序逐个返回转换结果；jobs 为 1 或只有一个文件时在当前进程中执行"""
+    job_args = [(task, orientation, layout, optimize) for task in tasks]
+    if jobs <= 1 or len(tasks) <= 1:
+        converter.register_chinese_fonts()
+        yield from map(_convert_job, job_args)
+        return
+    with multiprocessing.Pool(min(jobs, len(tasks)), initializer=converter.init_render_worker) as pool:
+        # 文件大小差别很大，逐个分发让空闲进程及时取到下一个文件
+        yield from pool.imap_unordered(_convert_job, job_args, chunksize=1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="mdt2pdf", description="把 Markdown 表格文件批量转换为 PDF（不启动 Web 服务）"
+    )
+    parser.add_argument("inputs", nargs="+", help="Markdown 文件、目录或 glob 模式（如 \"docs/**/*.md\"）")
+    parser.add_argument("-o", "--output-dir", help="输出目录，保持输入的目录层级；不指定时写在源文件旁边")
+    parser.add_argument("--pattern", default="*.md", help="目录输入时匹配的文件名模式 (默认: *.md)")
+    parser.add_argument(
+        "--orientation", choices=[e.value for e in converter.OrientationEnum], default="auto"
+    )
+    parser.add_argument("--layout", choices=[e.value for e in converter.LayoutEnum], default="fit")
+    parser.add_argument(
+        "--optimize", choices=[e.value for e in converter.OptimizeEnum], default="none",
+        help="size: 输出体积优化的PDF（精简字体子集、压缩内容流），适合归档和移动端下载"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="并行进程数 (默认: CPU 核数)")
+    parser.add_argument("-f", "--force", action="store_true", help="忽略清单，全部重新转换")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每个文件的结果和渲染日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    try:
+        sources = list(iter_sources(args.inputs, args.pattern))
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not sources:
+        print("没有找到要转换的文件", file=sys.stderr)
+        return 2
+
+    manifest = Manifest(os.path.join(args.output_dir or ".", MANIFEST_NAME))
+    # 字体变化时输出也会变化，字体标识与参数一起参与跳过判断
+    options = [args.orientation, args.layout] + converter.font_manager.fingerprint()
+    if args.optimize != "none":
+        options.append(args.optimize)
+
+    started = time.perf_counter()
+    tasks = []
+    skipped = 0
+    for source, relative in sources:
+        stat = os.stat(source)
+        task = Task(source, output_path(source, relative, args.output_dir), stat.st_mtime_ns, stat.st_size)
+        if not args.force and manifest.is_fresh(task, options):
+            skipped += 1
+            if args.verbose:
+                print(f"跳过 {source}（未变化）")
+            continue
+        tasks.append(task)
+
+    converted = failed = 0
+    input_bytes = output_bytes = 0
+    try:
+        for task, sha256, size, error in run(tasks, args.orientation, args.layout, args.jobs, args.optimize):
+            if error is not None:
+                failed += 1
+                print(f"失败 {task.source}: {error}", file=sys.stderr)
+                continue
+            converted += 1
+            input_bytes += task.size
+            output_bytes += size
+            manifest.record(task, options, sha256)
+            if args.verbose:
+                print(f"完成 {task.source} -> {task.output} ({size} 字节)")
+    finally:
+        # 中断时也保存已完成的文件，下次运行从剩余文件继续
+        manifest.save()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    workers = max(1, min(args.jobs, len(tasks)))
+    print(
+        f"转换 {converted} 个，跳过 {skipped} 个，失败 {failed} 个，用时 {elapsed:.2f} 秒"
+        f"（{workers} 个进程），{converted / elapsed:.1f} 文件/秒，"
+        f"输入 {input_bytes / 1024 / 1024 / elapsed:.2f} MB/秒，输出共 {output_bytes / 1024 / 1024:.1f} MB"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
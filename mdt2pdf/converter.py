@@ -0,0 +1,868 @@
+"""
+渲染核心：Markdown 表格解析、布局计算和 PDF / HTML 预览生成，不依赖 Web 框架
+
+main.py 的接口、渲染进程和命令行工具（cli.py）都调用这里的函数；导入本模块不会创建目录或启动服务。
+"""
+import os
+import io
+import re
+import math
+import logging
+from typing import Callable, Optional
+from enum import Enum
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import markdown
+from bs4 import BeautifulSoup
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, KeepTogether
+from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, NextPageTemplate, PageBreak, Flowable
+from reportlab.lib.units import cm
+from reportlab.pdfgen.canvas import Canvas
+
+from .table_parser import iter_tables, read_table_data
+from .table_data import TableData, as_table_data
+from .metrics import text_width
+from .layout import base_font_size, measure_table, solve_table_layout
+from .page_layout import FRAME_PADDING, choose_page_layout
+from .fonts import FontManager
+from .cells import (
+    make_cell, make_row_cells, measure_row_height, paragraph_style, plain_columns, split_row_cells, table_style,
+)
+from .preview import PreviewPage, render_preview_html
+from .memo import LayoutMemo
+from .telemetry import span
+from .output import PdfSink, spool_if_large
+from .optimize import CompactCanvas
+
+logger = logging.getLogger(__name__)
+
+# 是否使用旧的 markdown→HTML→BeautifulSoup 解析路径
+LEGACY_PARSER = os.getenv("MDT2PDF_LEGACY_PARSER", "0") == "1"
+
+
+class OrientationEnum(str, Enum):
+    portrait = "portrait"
+    landscape = "landscape" 
+    auto = "auto"
+
+
+class LayoutEnum(str, Enum):
+    fit = "fit"              # 缩放字体，尽量在一页中显示
+    paginated = "paginated"  # 固定字体，按页切分并重复表头
+    auto = "auto"            # 测量一次，按代价函数在纸张、方向、页边距和排版方式中选择（见 page_layout.py）
+
+
+class OptimizeEnum(str, Enum):
+    none = "none"  # ReportLab 默认输出
+    size = "size"  # 体积优化：坐标取整、合并网格线、精简嵌入字体（见 optimize.py）
+
+
+# 超过该大小的PDF由渲染进程写入临时文件，只传递路径
+SPOOL_THRESHOLD = int(os.getenv("MDT2PDF_SPOOL_THRESHOLD", str(8 * 1024 * 1024)))
+
+# HTML预览中每个表格最多显示的数据行数
+PREVIEW_MAX_ROWS = int(os.getenv("MDT2PDF_PREVIEW_MAX_ROWS", "200"))
+
+# 分页模式下用于计算列宽的抽样行数
+PAGINATED_SAMPLE_ROWS = int(os.getenv("MDT2PDF_PAGINATED_SAMPLE_ROWS", "500"))
+
+# 行级布局备忘：同一表格修改少量行后再次渲染时，只重新测量和创建变化的行（每个进程各一份）
+layout_memo = LayoutMemo.from_env()
+
+# 渲染进度回调 callback(阶段, 已完成, 总数)：cells 阶段按行、build 阶段按页（分页模式按行）报告，
+# 异步任务用它更新进度；回调抛出 RenderCancelled 即中止渲染
+_progress_callback: ContextVar[Optional[Callable[[str, int, int], None]]] = ContextVar(
+    "mdt2pdf_progress", default=None
+)
+
+
+class RenderCancelled(Exception):
+    """渲染被进度回调中止（任务已取消）"""
+
+
+@contextmanager
+def progress_reporting(callback: Callable[[str, int, int], None]):
+    """在 with 块内的渲染过程中调用 callback 报告进度"""
+    token = _progress_callback.set(callback)
+    try:
+        yield
+    finally:
+        _progress_callback.reset(token)
+
+
+def report_progress(stage: str, done: int, total: int):
+    callback = _progress_callback.get()
+    if callback is not None:
+        callback(stage, done, total)
+
+
+def track_pages(doc, estimated_pages: int):
+    """把 ReportLab 每页完成时的回调转换为 build 阶段的进度；无法估算页数（分页模式由表格自己报告）时不跟踪"""
+    if _progress_callback.get() is None or estimated_pages <= 0:
+        return
+
+    def on_progress(kind, value):
+        if kind == "PAGE":
+            report_progress("build", value, max(estimated_pages, value))
+    doc.setProgressCallBack(on_progress)
+
+# 字体管理：启动时只读取字体索引确定字体，第一次渲染前才注册
+font_manager = FontManager.from_env()
+FONT_NAME, BOLD_FONT_NAME = font_manager.select()
+logger.info(f"最终使用的字体: {FONT_NAME}, 粗体字体: {BOLD_FONT_NAME}")
+
+
+def canvas_maker(optimize: str = "none"):
+    """doc.build 使用的 Canvas 类：optimize=size 时为体积优化的 CompactCanvas"""
+    return CompactCanvas if optimize == OptimizeEnum.size.value else Canvas
+
+
+def register_chinese_fonts():
+    """
+    注册选中的中文字体，每个进程只在第一次调用时真正解析字体文件；
+    全部候选字体注册失败时改用内置字体，FONT_NAME / BOLD_FONT_NAME 随之更新
+    """
+    global FONT_NAME, BOLD_FONT_NAME
+    font_manager.ensure_registered()
+    FONT_NAME, BOLD_FONT_NAME = font_manager.font_name, font_manager.bold_font_name
+    return FONT_NAME, BOLD_FONT_NAME
+
+
+def wrap_text_in_cell(text, max_width, font_name, font_size):
+    """
+    将文本包装成单元格对象：短文本使用单行 CellText，需要换行的文本使用共享样式的 Paragraph
+    """
+    return make_cell(text, max_width, font_name, font_size)
+
+
+def parse_markdown_table(md_content: str, legacy: Optional[bool] = None):
+    """
+    解析Markdown表格内容，确保UTF-8编码
+    默认使用单遍流式解析器，直接产出按列存储的 TableData（带对齐行给出的各列对齐方式）；
+    legacy=True（或 MDT2PDF_LEGACY_PARSER=1）时使用旧的 markdown→HTML→BeautifulSoup 路径（返回行列表），
+    便于一致性对比
+    """
+    if legacy is None:
+        legacy = LEGACY_PARSER
+    if legacy:
+        return parse_markdown_table_legacy(md_content)
+    with span("parse"):
+        return read_table_data(md_content)
+
+
+def parse_markdown_document(md_content: str):
+    """解析文档中的全部表格，每个表格独立保留表头、对齐方式和标题"""
+    if isinstance(md_content, bytes):
+        md_content = md_content.decode('utf-8')
+    with span("parse"):
+        return [table for table in iter_tables(md_content) if table.header]
+
+
+def parse_markdown_table_legacy(md_content: str):
+    """旧的解析路径：Markdown转HTML后用BeautifulSoup提取表格"""
+    # 确保内容是UTF-8编码
+    if isinstance(md_content, bytes):
+        md_content = md_content.decode('utf-8')
+    
+    # 转换Markdown为HTML
+    with span("markdown"):
+        html = markdown.markdown(md_content, extensions=['tables'])
+    
+    with span("soup"):
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # 查找表格
+        tables = soup.find_all('table')
+        if not tables:
+            # 如果没有标准表格，尝试手动解析Markdown表格
+            return parse_markdown_table_manual(md_content)
+        
+        table_data = []
+        for table in tables:
+            rows = table.find_all('tr')
+            table_rows = []
+            for row in rows:
+                cells = row.find_all(['th', 'td'])
+                row_data = [cell.get_text(strip=True) for cell in cells]
+                if row_data:  # 只添加非空行
+                    table_rows.append(row_data)
+            if table_rows:
+                table_data.extend(table_rows)
+    
+    return table_data
+
+
+def parse_markdown_table_manual(md_content: str):
+    """手动解析Markdown表格格式，确保UTF-8处理"""
+    # 确保UTF-8编码
+    if isinstance(md_content, bytes):
+        md_content = md_content.decode('utf-8')
+        
+    lines = md_content.strip().split('\n')
+    table_data = []
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        
+        # 跳过分隔符行 (|---|---|)
+        if re.match(r'^\|[\s\-\|:]*\|?$', line):
+            continue
+            
+        # 解析表格行
+        if line.startswith('|') and line.endswith('|'):
+            cells = [cell.strip() for cell in line[1:-1].split('|')]
+            if cells:
+                table_data.append(cells)
+        elif '|' in line:
+            cells = [cell.strip() for cell in line.split('|')]
+            if cells:
+                table_data.append(cells)
+    
+    return table_data
+
+
+@span("orientation")
+def determine_orientation(table_data, orientation: str = "auto", layout: str = "fit"):
+    """确定PDF方向，优先考虑内容适配；自动版面（layout=auto）的方向由版面搜索决定，原样返回"""
+    if orientation in ["portrait", "landscape"] or layout == LayoutEnum.auto.value:
+        return orientation
+    
+    if not table_data:
+        return "portrait"
+    
+    # 计算表格的复杂度来决定方向：列数和字符数都在解析时已经算好
+    table_data = as_table_data(table_data)
+    max_cols = table_data.num_cols
+    total_content_length = table_data.total_chars
+    avg_content_per_cell = total_content_length / (len(table_data) * max_cols) if max_cols > 0 else 0
+    
+    # 更智能的方向判断：考虑列数、平均内容长度和总内容量
+    if max_cols > 4 or avg_content_per_cell > 20 or total_content_length > 500:
+        return "landscape"
+    else:
+        return "portrait"
+
+
+def calculate_text_width(text, font_name, font_size):
+    """计算文本的实际显示宽度，使用已注册字体的字形宽度（带缓存）"""
+    if not text:
+        return 0
+    
+    text_str = str(text)
+    try:
+        return text_width(text_str, font_name, font_size)
+    except KeyError:
+        # 字体未注册时按中英文字符估算
+        width = 0
+        for char in text_str:
+            if ord(char) > 127:  # 中文字符
+                width += font_size * 0.9  # 中文字符宽度
+            else:  # 英文字符和标点
+                width += font_size * 0.5  # 英文字符宽度
+        return width
+
+
+def create_table_styles(font_size, alignments=()):
+    """获取表格样式（按字体、字号和各列对齐方式共享）"""
+    return table_style(FONT_NAME, BOLD_FONT_NAME, font_size, tuple(alignments))
+
+
+def measure(data, memo=None):
+    """测量全部单元格；传入 memo 时只测量与上一版本相比有变化的行"""
+    register_chinese_fonts()
+    data = as_table_data(data)
+    if memo is not None:
+        return memo.measure(data)
+    return measure_table(data, FONT_NAME, BOLD_FONT_NAME)
+
+
+@span("layout")
+def calculate_optimal_table_size(data, available_width, available_height, memo=None, measurement=None):
+    """
+    优化的表格尺寸计算，确保内容尽量在一页中显示
+    一次测量全部单元格，再二分查找能放进可用高度的最大字号；
+    传入 memo 时只测量与上一版本相比有变化的行，传入 measurement 时直接使用已有的测量结果
+    """
+    register_chinese_fonts()
+    if not data or len(data) < 1:
+        return None, None, 1.0, 10
+    
+    if measurement is None:
+        measurement = measure(data, memo)
+    
+    # 根据内容量和表格大小决定字体大小上限
+    return solve_table_layout(measurement, available_width, available_height, base_font_size(measurement))
+
+
+def build_table(table_data, available_width, available_height, measurement=None):
+    """
+    计算最优尺寸并创建带样式的表格，返回表格及布局参数
+    同一表格（按表头区分）再次渲染时，未变化的行复用上一次的测量结果和单元格对象；
+    measurement 为已有的测量结果（自动版面搜索时已经测量过）
+    """
+    table_data = as_table_data(table_data)
+    memo = layout_memo.for_table(table_data, FONT_NAME, BOLD_FONT_NAME)
+    # 计算最优表格尺寸（现在返回字体大小）
+    col_widths, row_height, scale_factor, font_size = calculate_optimal_table_size(
+        table_data, available_width, available_height, memo, measurement
+    )
+    
+    # 数值、日期和短文本列整列放得下时直接使用字符串，其余单元格转换为CellText或Paragraph以支持换行，
+    # 同时算好行高
+    alignments = table_data.column_alignments
+    plain = plain_columns(table_data, col_widths, FONT_NAME, BOLD_FONT_NAME, font_size)
+    
+    def create_row(row_idx, row):
+        if row_idx % 256 == 0:
+            report_progress("cells", row_idx, len(table_data))
+        # 表头使用粗体；TableData 各行列数相同，与列宽一一对应
+        font_name = BOLD_FONT_NAME if row_idx == 0 else FONT_NAME
+        cells = make_row_cells(row, col_widths, plain, alignments, font_name, font_size)
+        return cells, measure_row_height(cells, col_widths, font_size)
+    
+    with span("cells"):
+        if memo is not None:
+            # 列宽、字号、对齐方式或字符串列变化时 build_rows 会全部重新创建
+            layout_key = (font_size, tuple(col_widths), tuple(alignments), tuple(plain))
+            rows = memo.build_rows(table_data, layout_key, create_row)
+        else:
+            rows = [create_row(row_idx, row) for row_idx, row in enumerate(table_data)]
+    processed_data = [cells for cells, _ in rows]
+    
+    # 创建表格；行高已知，分页时各分片不必重新计算
+    table = Table(
+        processed_data,
+        colWidths=col_widths,
+        rowHeights=[height for _, height in rows],
+        repeatRows=1  # 重复表头行
+    )
+    
+    # 设置表格样式（传入字体大小和各列对齐方式）
+    table_style = create_table_styles(font_size, alignments)
+    table.setStyle(table_style)
+    
+    return table, col_widths, row_height, scale_factor, font_size
+
+
+def sample_rows(table_data, limit):
+    """表头加上均匀抽样的数据行，用于估算列宽"""
+    table_data = as_table_data(table_data)
+    if len(table_data) <= limit:
+        return table_data
+    step = (len(table_data) - 1) / (limit - 1)
+    return table_data.select([0] + [1 + int(i * step) for i in range(limit - 1)])
+
+
+class PaginatedTable(Flowable):
+    """
+    分页表格：每次按当前页剩余高度切出一段表格（带表头），其余行留给下一页。
+    只有当前页的单元格会被创建为Paragraph，内存占用与单页内容成正比。
+    table 为 TableData，第 0 行为表头，start 为下一页的第一行；plain 为各列是否整列使用字符串单元格；
+    carry 为第 start 行在上一页放不下、拆到本页的续行单元格
+    """
+    
+    def __init__(self, table, col_widths, font_size, start=1, page_height=0, plain=None, carry=None):
+        Flowable.__init__(self)
+        self.table = table
+        self.col_widths = col_widths
+        self.font_size = font_size
+        self.start = start
+        self.page_height = page_height  # 见过的最大可用高度，视为整页高度
+        self.padding = max(3, font_size // 2)
+        self.width = sum(col_widths)
+        self.alignments = table.column_alignments
+        self.plain = plain if plain is not None else [False] * table.num_cols
+        self.carry = carry
+    
+    def wrap(self, availWidth, availHeight):
+        # 总是报告超出可用高度，让框架调用split按页切分
+        return self.width, availHeight + 1
+    
+    def _make_row(self, row, font_name):
+        """创建一行单元格并测量行高"""
+        cells = make_row_cells(row, self.col_widths, self.plain, self.alignments, font_name, self.font_size)
+        return cells, measure_row_height(cells, self.col_widths, self.font_size)
+    
+    def split(self, availWidth, availHeight):
+        page_height = max(self.page_height, availHeight)
+        header_cells, used = self._make_row(self.table.header, BOLD_FONT_NAME)
+        page_rows = [header_cells]
+        
+        index = self.start
+        total = len(self.table)
+        carry = None
+        while index < total:
+            if index == self.start and self.carry is not None:
+                cells = self.carry
+                height = measure_row_height(cells, self.col_widths, self.font_size)
+            else:
+                cells, height = self._make_row(self.table.row(index), FONT_NAME)
+            if used + height > availHeight - 1:
+                if len(page_rows) > 1:
+                    if index == self.start:
+                        carry = self.carry
+                    break
+                if availHeight < page_height:
+                    # 当前页剩余空间放不下表头和一行数据，移到下一页
+                    return []
+                # 单独一行就高于整页：在单元格内部拆开，其余部分作为续行放到下一页
+                head, carry = split_row_cells(cells, self.col_widths, self.font_size, availHeight - 1 - used)
+                page_rows.append(head)
+                break
+            page_rows.append(cells)
+            used += height
+            index += 1
+        
+        table = Table(page_rows, colWidths=self.col_widths)
+        table.setStyle(create_table_styles(self.font_size, self.alignments))
+        report_progress("build", index - 1, total - 1)
+        if index >= total:
+            return [table]
+        return [table, PaginatedTable(
+            self.table, self.col_widths, self.font_size, index, page_height, self.plain, carry
+        )]
+    
+    def draw(self):
+        pass
+
+
+def build_paginated_table(table_data, available_width, plan=None):
+    """分页模式：用抽样行计算列宽和字体大小，不为适配单页而缩小字体；plan 为自动版面选出的分页版面"""
+    table_data = as_table_data(table_data)
+    if plan is not None:
+        col_widths, font_size = plan.col_widths, plan.font_size
+    else:
+        col_widths, _, scale_factor, font_size = calculate_optimal_table_size(
+            sample_rows(table_data, PAGINATED_SAMPLE_ROWS), available_width, float("inf")
+        )
+    plain = plain_columns(table_data, col_widths, FONT_NAME, BOLD_FONT_NAME, font_size)
+    table = PaginatedTable(table_data, col_widths, font_size, plain=plain)
+    return table, col_widths, font_size
+
+
+def create_paginated_pdf(table_data, orientation: str = "portrait", optimize: str = "none", plan=None):
+    """创建分页PDF：表格按页切分，每页重复表头；plan 为自动版面选出的分页版面"""
+    register_chinese_fonts()
+    sink = PdfSink()
+    if plan is not None:
+        pagesize = plan.pagesize
+        margin_left = margin_right = plan.margins[0]
+        margin_top = margin_bottom = plan.margins[1]
+    else:
+        pagesize = landscape(A4) if orientation == "landscape" else A4
+        margin_left = margin_right = 1.0 * cm
+        margin_top = margin_bottom = 1.2 * cm
+    available_width = pagesize[0] - margin_left - margin_right
+    
+    doc = SimpleDocTemplate(
+        sink,
+        pagesize=pagesize,
+        topMargin=margin_top,
+        bottomMargin=margin_bottom,
+        leftMargin=margin_left,
+        rightMargin=margin_right,
+        title="表格转换PDF",
+        author="Markdown表格转换工具",
+        subject="表格数据",
+        creator="mdt2pdf",
+        invariant=1
+    )
+    
+    table, col_widths, font_size = build_paginated_table(table_data, available_width, plan)
+    with span("build"):
+        doc.build([table], canvasmaker=canvas_maker(optimize))
+    
+    logger.info(f"分页PDF生成成功，行数: {len(table_data)}, 字体大小: {font_size}, 页数: {doc.page}, 大小: {len(sink.data)} 字节")
+    return io.BytesIO(sink.data)
+
+
+def plan_page_layout(table_data, orientation: str = "auto", reserved_height: float = 0.0):
+    """
+    自动版面：测量一次（大表格只测量抽样行），在候选版面中选出代价最小的一个。
+    reserved_height 为页面上表格以外占用的高度；返回 (PageLayout, 测量结果)，
+    测量结果只在覆盖全部行时返回，供 build_table 直接使用
+    """
+    register_chinese_fonts()
+    table_data = as_table_data(table_data)
+    sample = sample_rows(table_data, PAGINATED_SAMPLE_ROWS)
+    whole = sample is table_data
+    with span("layout"):
+        measurement = measure(sample, layout_memo.for_table(table_data, FONT_NAME, BOLD_FONT_NAME) if whole else None)
+        plan = choose_page_layout(measurement, orientation, reserved_height=reserved_height, total_rows=len(table_data))
+    logger.info(f"自动版面: {plan.describe()}")
+    return plan, measurement if whole else None
+
+
+def create_pdf(table_data, orientation: str = "portrait", layout: str = "fit", optimize: str = "none"):
+    """
+    创建PDF文档，优化布局确保内容在一页中并居中显示；layout="paginated" 时按页切分，
+    optimize="size" 时输出体积优化的PDF
+    layout="auto" 时先选出纸张、方向、页边距和排版方式（见 plan_page_layout）
+    先计算布局和居中边距，再只构建一次文档；返回的BytesIO直接共享ReportLab输出的字节
+    """
+    register_chinese_fonts()
+    table_data = as_table_data(table_data)
+    plan = measurement = None
+    if layout == LayoutEnum.auto.value and table_data:
+        plan, measurement = plan_page_layout(table_data, orientation, 2 * FRAME_PADDING)
+        if plan.layout == LayoutEnum.paginated.value:
+            return create_paginated_pdf(table_data, plan.orientation, optimize, plan)
+    if layout == LayoutEnum.paginated.value and table_data:
+        return create_paginated_pdf(table_data, orientation, optimize)
+    
+    # 设置页面尺寸
+    if plan is not None:
+        pagesize = plan.pagesize
+    elif orientation == "landscape":
+        pagesize = landscape(A4)
+    else:
+        pagesize = A4
+    
+    # 减少页面边距，为表格留出更多空间
+    margin_left = margin_right = 1.0 * cm  # 减少左右边距
+    margin_top = margin_bottom = 1.2 * cm  # 减少上下边距
+    if plan is not None:
+        margin_left = margin_right = plan.margins[0]
+        margin_top = margin_bottom = plan.margins[1]
+    page_margin = margin_left
+    
+    # 计算可用空间
+    available_width = pagesize[0] - margin_left - margin_right
+    available_height = pagesize[1] - margin_top - margin_bottom
+    if plan is not None:
+        # 与版面搜索一致，扣除 Frame 的内边距，按搜索结果放得下的表格实际也放得下
+        available_height -= 2 * FRAME_PADDING
+    
+    story = []
+    table = None
+    estimated_pages = 1
+    
+    if table_data:
+        # 计算最优表格尺寸并创建表格
+        table, col_widths, row_height, scale_factor, font_size = build_table(
+            table_data, available_width, available_height, measurement
+        )
+        
+        # 计算表格实际宽度和高度
+        actual_table_width = sum(col_widths)
+        estimated_table_height = len(table_data) * row_height
+        estimated_pages = max(1, math.ceil(estimated_table_height / available_height))
+        
+        # 如果表格宽度小于可用宽度，通过调整页边距来居中
+        if actual_table_width < available_width:
+            margin_left = margin_right = (pagesize[0] - actual_table_width) / 2
+        
+        # 添加垂直居中的空白间隔
+        if estimated_table_height < available_height:
+            top_spacer_height = (available_height - estimated_table_height) / 2
+            story.append(Spacer(1, max(0, top_spacer_height)))
+        
+        # 创建居中的表格容器
+        story.append(KeepTogether([table]))
+        
+        logger.info(f"PDF生成成功，缩放比例: {scale_factor:.2f}, 字体大小: {font_size}, 列宽: {[f'{w:.1f}' for w in col_widths]}, 表格宽度: {actual_table_width:.1f}")
+        
+    else:
+        # 如果没有表格数据，添加居中的提示文本
+        style = ParagraphStyle(
+            'default',
+            fontName=FONT_NAME,
+            fontSize=14,
+            alignment=1,  # 居中对齐
+            textColor=colors.black
+        )
+        
+        # 添加垂直居中的间隔
+        story.append(Spacer(1, available_height / 2 - 1 * cm))
+        story.append(Paragraph("没有找到有效的表格数据", style))
+    
+    def build(story, left_margin, right_margin):
+        sink = PdfSink()
+        # 创建文档，设置PDF元数据确保预览器正常显示
+        doc = SimpleDocTemplate(
+            sink, 
+            pagesize=pagesize, 
+            topMargin=margin_top, 
+            bottomMargin=margin_bottom,
+            leftMargin=left_margin, 
+            rightMargin=right_margin,
+            title="表格转换PDF",
+            author="Markdown表格转换工具",
+            subject="表格数据",
+            creator="mdt2pdf",
+            invariant=1  # 固定文档ID和时间戳，相同输入生成相同字节，便于缓存和ETag
+        )
+        track_pages(doc, estimated_pages)
+        with span("build"):
+            doc.build(story, canvasmaker=canvas_maker(optimize))
+        return sink.data
+    
+    try:
+        pdf_data = build(story, margin_left, margin_right)
+    except RenderCancelled:
+        raise
+    except Exception as e:
+        if table is None:
+            raise
+        logger.error(f"PDF生成失败: {e}")
+        # 如果居中布局失败，复用已创建的表格，使用原始边距重新排版
+        pdf_data = build([KeepTogether([table])], page_margin, page_margin)
+    
+    return io.BytesIO(pdf_data)
+
+
+def make_page_template(name, pagesize, margin_x=1.0 * cm, margin_y=1.2 * cm):
+    """单栏页面模板，margin_x / margin_y 为左右和上下页边距"""
+    frame = Frame(
+        margin_x, margin_y,
+        pagesize[0] - 2 * margin_x,
+        pagesize[1] - 2 * margin_y,
+        leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0,
+        id=f"{name}_frame"
+    )
+    return PageTemplate(id=name, frames=[frame], pagesize=pagesize)
+
+
+def create_document_pdf(tables, orientation: str = "auto", layout: str = "fit", optimize: str = "none"):
+    """
+    创建多表格文档：每个表格独立确定方向并计算布局，从新的一页开始排版，
+    表格前的标题行作为表格标题；layout="auto" 时每个表格各自选择版面，按需增加页面模板
+    """
+    register_chinese_fonts()
+    
+    # 竖版和横版两种页面模板，按表格切换
+    page_templates = {
+        name: make_page_template(name, pagesize) for name, pagesize in (("portrait", A4), ("landscape", landscape(A4)))
+    }
+    
+    caption_style = paragraph_style(BOLD_FONT_NAME, 12, role="caption")
+    caption_height = caption_style.leading + caption_style.spaceAfter
+    
+    story = []
+    template_names = []
+    estimated_pages = 0
+    for table_idx, markdown_table in enumerate(tables):
+        table_data = markdown_table.data
+        plan = measurement = None
+        margin_x, margin_y = 1.0 * cm, 1.2 * cm
+        if layout == LayoutEnum.auto.value:
+            plan, measurement = plan_page_layout(
+                table_data, orientation, caption_height if markdown_table.caption else 0.0
+            )
+            table_orientation = plan.orientation
+            template_name = f"{plan.paper}_{plan.orientation}_{plan.margin_name}"
+            if template_name not in page_templates:
+                page_templates[template_name] = make_page_template(template_name, plan.pagesize, *plan.margins)
+            margin_x, margin_y = plan.margins
+        else:
+            table_orientation = template_name = determine_orientation(table_data, orientation)
+        template_names.append(template_name)
+        pagesize = page_templates[template_name].pagesize
+        
+        available_width = pagesize[0] - 2 * margin_x
+        available_height = pagesize[1] - 2 * margin_y
+        if markdown_table.caption:
+            available_height -= caption_height
+        
+        if table_idx > 0:
+            story.append(NextPageTemplate(template_name))
+            story.append(PageBreak())
+        if markdown_table.caption:
+            story.append(Paragraph(markdown_table.caption, caption_style))
+        
+        if layout == LayoutEnum.paginated.value or (plan is not None and plan.layout == LayoutEnum.paginated.value):
+            table, col_widths, font_size = build_paginated_table(table_data, available_width, plan)
+            scale_factor = 1.0
+        else:
+            table, col_widths, row_height, scale_factor, font_size = build_table(
+                table_data, available_width, available_height, measurement
+            )
+            estimated_pages += max(1, math.ceil(len(table_data) * row_height / available_height))
+        story.append(table)
+        
+        logger.info(f"表格 {table_idx + 1}/{len(tables)} 布局完成，方向: {table_orientation}, 缩放比例: {scale_factor:.2f}, 字体大小: {font_size}")
+    
+    if not story:
+        return create_pdf([], orientation if orientation != "auto" else "portrait", layout, optimize)
+    
+    # 第一页使用第一个表格的页面模板
+    first = template_names[0]
+    templates_in_order = [page_templates[first]] + [
+        page_template for name, page_template in page_templates.items() if name != first
+    ]
+    sink = PdfSink()
+    doc = BaseDocTemplate(
+        sink,
+        pagesize=page_templates[first].pagesize,
+        pageTemplates=templates_in_order,
+        title="表格转换PDF",
+        author="Markdown表格转换工具",
+        subject="表格数据",
+        creator="mdt2pdf",
+        invariant=1
+    )
+    track_pages(doc, estimated_pages)
+    with span("build"):
+        doc.build(story, canvasmaker=canvas_maker(optimize))
+    
+    return io.BytesIO(sink.data)
+
+
+def init_render_worker():
+    """渲染进程初始化：预先注册字体，避免第一个请求承担字体解析的耗时"""
+    register_chinese_fonts()
+    logger.info(f"渲染进程已就绪 (pid={os.getpid()}), 字体: {FONT_NAME}, 粗体字体: {BOLD_FONT_NAME}")
+
+
+def render_table_to_pdf(table_data, orientation: str, layout: str = "fit", optimize: str = "none"):
+    """生成PDF字节（过大时为临时文件），在渲染进程中执行"""
+    return spool_if_large(create_pdf(table_data, orientation, layout, optimize).getvalue(), SPOOL_THRESHOLD)
+
+
+def render_document_to_pdf(tables, orientation: str, layout: str = "fit", optimize: str = "none"):
+    """生成多表格文档的PDF字节（过大时为临时文件），在渲染进程中执行"""
+    return spool_if_large(
+        create_document_pdf(tables, orientation, layout, optimize).getvalue(), SPOOL_THRESHOLD
+    )
+
+
+def render_tables_to_pdf(tables, orientation: str, layout: str = "fit", optimize: str = "none"):
+    """
+    渲染解析好的表格（MarkdownTable 列表），在渲染进程中执行：单个表格确定方向后整页居中排版，
+    多个表格每个独立布局，方向在渲染时逐个确定
+    """
+    if len(tables) == 1:
+        table_data = tables[0].data
+        return render_table_to_pdf(table_data, determine_orientation(table_data, orientation, layout), layout, optimize)
+    return render_document_to_pdf(tables, orientation, layout, optimize)
+
+
+def table_shapes(tables):
+    """各表格的行数（含表头）和列数，随渲染结果回传给服务进程记录指标"""
+    return [(len(table.data), len(table.header)) for table in tables]
+
+
+def render_markdown_to_pdf(markdown_content: str, orientation: str, layout: str = "fit", optimize: str = "none"):
+    """
+    /convert 的渲染任务：解析、确定方向和生成PDF都在渲染进程中完成，服务进程只负责收发。
+    返回 (表格规模, PDF字节或临时文件)；文档中没有表格时PDF部分为 None
+    """
+    tables = parse_markdown_document(markdown_content)
+    if not tables:
+        return [], None
+    return table_shapes(tables), render_tables_to_pdf(tables, orientation, layout, optimize)
+
+
+def build_preview_pages(tables, orientation: str = "auto", layout: str = "fit"):
+    """
+    计算每个表格的预览参数：页面方向、列宽和字号与生成PDF时的布局结果一致，
+    只是不经过ReportLab排版
+    """
+    pages = []
+    for markdown_table in tables:
+        table_data = markdown_table.data
+        # 多表格文档中表格标题占用的高度，与 create_document_pdf 一致
+        caption = markdown_table.caption if len(tables) > 1 else None
+        caption_height = 0.0
+        if caption:
+            caption_style = paragraph_style(BOLD_FONT_NAME, 12, role="caption")
+            caption_height = caption_style.leading + caption_style.spaceAfter
+        
+        plan = None
+        if layout == LayoutEnum.auto.value and table_data:
+            # 单个表格由 create_pdf 排版，扣除 Frame 内边距；多表格文档的 Frame 没有内边距
+            plan, _ = plan_page_layout(table_data, orientation, caption_height if len(tables) > 1 else 2 * FRAME_PADDING)
+            table_orientation, pagesize = plan.orientation, plan.pagesize
+            margin_left = margin_right = plan.margins[0]
+            margin_top = margin_bottom = plan.margins[1]
+        else:
+            table_orientation = determine_orientation(table_data, orientation)
+            pagesize = landscape(A4) if table_orientation == "landscape" else A4
+            margin_left = margin_right = 1.0 * cm
+            margin_top = margin_bottom = 1.2 * cm
+        available_width = pagesize[0] - margin_left - margin_right
+        available_height = pagesize[1] - margin_top - margin_bottom - caption_height
+        
+        notes = []
+        if plan is not None:
+            # 列宽和字号与版面搜索的结果一致
+            col_widths, font_size = plan.col_widths, plan.font_size
+            notes.append(plan.paper)
+            if plan.layout == LayoutEnum.paginated.value:
+                notes.append("分页")
+        elif layout == LayoutEnum.paginated.value:
+            col_widths, _, _, font_size = calculate_optimal_table_size(
+                sample_rows(table_data, PAGINATED_SAMPLE_ROWS), available_width, float("inf")
+            )
+            notes.append("分页")
+        else:
+            col_widths, _, scale_factor, font_size = calculate_optimal_table_size(
+                table_data, available_width, available_height,
+                layout_memo.for_table(table_data, FONT_NAME, BOLD_FONT_NAME)
+            )
+        
+        pages.append(PreviewPage(
+            header=table_data.header,
+            rows=table_data[1:PREVIEW_MAX_ROWS + 1],
+            total_rows=len(table_data) - 1,
+            orientation=table_orientation,
+            page_width=pagesize[0],
+            page_height=pagesize[1],
+            margins=(margin_left, margin_right, margin_top, margin_bottom),
+            col_widths=col_widths,
+            font_size=font_size,
+            layout=layout,
+            caption=caption,
+            notes=notes,
+            alignments=table_data.column_alignments,
+        ))
+    return pages
+
+
+def render_preview(tables, orientation: str, layout: str = "fit"):
+    """生成HTML预览（UTF-8字节），在渲染进程中执行"""
+    pages = build_preview_pages(tables, orientation, layout)
+    with span("html"):
+        return render_preview_html(pages).encode("utf-8")
+
+
+def render_markdown_preview(markdown_content: str, orientation: str, layout: str = "fit"):
+    """/preview 的渲染任务：解析并生成HTML预览，返回 (表格规模, HTML字节)；没有表格时HTML部分为 None"""
+    tables = parse_markdown_document(markdown_content)
+    if not tables:
+        return [], None
+    return table_shapes(tables), render_preview(tables, orientation, layout)
+
+
+def render_batch_item(markdown_content: str, orientation: str, layout: str = "fit", optimize: str = "none"):
+    """批量任务：解析文档中的全部表格并生成PDF字节，在渲染进程中执行；结果与 /convert 相同"""
+    tables = parse_markdown_document(markdown_content)
+    if not tables:
+        raise ValueError("未找到有效的表格数据")
+    return render_tables(tables, orientation, layout, optimize)
+
+
+def convert_markdown(md_content, orientation: str = "auto", layout: str = "fit", optimize: str = "none") -> bytes:
+    """把 Markdown 文档中的表格转换为PDF字节，与 /convert 接口的结果相同"""
+    tables = parse_markdown_document(md_content)
+    if not tables:
+        raise ValueError("未找到有效的表格数据")
+    return render_tables(tables, orientation, layout, optimize)
+
+
+def render_tables(tables, orientation: str = "auto", layout: str = "fit", optimize: str = "none") -> bytes:
+    """
+    渲染解析好的表格（MarkdownTable 列表）：单个表格确定方向后整页居中排版，
+    多个表格每个独立布局
+    """
+    if len(tables) == 1:
+        table_data = tables[0].data
+        final_orientation = determine_orientation(table_data, orientation, layout)
+        return create_pdf(table_data, final_orientation, layout, optimize).getvalue()
+    return create_document_pdf(tables, orientation, layout, optimize).getvalue()
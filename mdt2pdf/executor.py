@@ -0,0 +1,263 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+from . import telemetry
+from .startup import mp_context
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloaded(Exception):
+    """排队任务已满，调用方应返回 503 并提示 Retry-After"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"渲染队列已满，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    """单个渲染任务超时，对应的工作进程已被终止"""
+
+
+class RenderFailed(Exception):
+    """工作进程中的渲染任务抛出异常或进程意外退出"""
+
+
+def _worker_main(conn, initializer):
+    """工作进程主循环：预热后逐个执行父进程发来的任务，各阶段耗时随结果一起回传"""
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        func, args = job
+        with telemetry.collect() as trace:
+            try:
+                result = func(*args)
+            except Exception as e:
+                # 异常对象不一定能pickle，只回传描述文本
+                conn.send(("error", f"{type(e).__name__}: {e}", trace.spans))
+                continue
+        if isinstance(result, (bytes, bytearray, memoryview)):
+            # 字节结果不经过pickle，直接按原始字节发送
+            conn.send(("bytes", len(result), trace.spans))
+            conn.send_bytes(result)
+        else:
+            conn.send(("ok", result, trace.spans))
+    conn.close()
+
+
+class _Worker:
+    """一个常驻渲染进程及其通信管道"""
+
+    def __init__(self, ctx, initializer):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, initializer), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def alive(self):
+        return self.process.is_alive() and not self.conn.closed
+
+    def call(self, func, args, timeout):
+        """在工作进程中执行任务（阻塞，在线程中调用）"""
+        try:
+            self.conn.send((func, args))
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise RenderTimeout(f"渲染超过 {timeout} 秒，已终止")
+            status, value, spans = self.conn.recv()
+            if status == "bytes":
+                value = self.conn.recv_bytes()
+        except (EOFError, OSError) as e:
+            self.kill()
+            raise RenderFailed(f"渲染进程异常退出: {e}")
+        telemetry.record(spans)
+        if status == "error":
+            raise RenderFailed(value)
+        return value
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self, timeout=2.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+
+class RenderExecutor:
+    """
+    有界的多进程渲染执行器：
+    - 固定数量的预热工作进程（initializer 在进程启动时执行，例如注册字体）
+    - 有界等待队列，满时抛出 ExecutorOverloaded
+    - 单任务超时，超时的进程被杀死并替换
+    - 队列深度与延迟统计
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: int = 32,
+        timeout: float = 60.0,
+        initializer: Optional[Callable] = None,
+        start_method: str = "spawn",
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.initializer = initializer
+        self.start_method = start_method
+        self._ctx = mp_context(start_method)
+        self._idle: Optional[asyncio.Queue] = None
+        self._all = []
+        self._lock = threading.Lock()
+
+        # 统计数据
+        self._waiting = 0
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    @classmethod
+    def from_env(cls, initializer: Optional[Callable] = None):
+        """根据环境变量创建执行器"""
+        return cls(
+            workers=int(os.getenv("MDT2PDF_RENDER_WORKERS", "0")) or None,
+            max_queue=int(os.getenv("MDT2PDF_RENDER_QUEUE_SIZE", "32")),
+            timeout=float(os.getenv("MDT2PDF_RENDER_TIMEOUT", "60")),
+            initializer=initializer,
+            start_method=os.getenv("MDT2PDF_RENDER_START_METHOD", "spawn"),
+        )
+
+    def _spawn(self):
+        worker = _Worker(self._ctx, self.initializer)
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _retire(self, worker):
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+
+    def start(self):
+        """启动全部工作进程，需在事件循环中调用"""
+        # 后进先出：优先使用最近空闲的进程，其布局备忘和字宽缓存更可能命中
+        self._idle = asyncio.LifoQueue()
+        for _ in range(self.workers):
+            self._idle.put_nowait(self._spawn())
+        logger.info(
+            f"渲染执行器已启动: {self.workers} 个进程, 队列上限 {self.max_queue}, 超时 {self.timeout}s"
+        )
+
+    def shutdown(self):
+        """停止全部工作进程"""
+        with self._lock:
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
+        self._idle = None
+
+    def retry_after(self):
+        """根据近期平均渲染耗时估算客户端重试间隔（秒）"""
+        avg_run = sum(self._run_times) / len(self._run_times) if self._run_times else 1.0
+        return max(1, math.ceil(avg_run * (self._waiting + 1) / self.workers))
+
+    async def submit(self, func: Callable, *args, timeout: Optional[float] = None):
+        """提交任务并等待结果；func 与参数必须可以pickle"""
+        if self._idle is None:
+            raise RuntimeError("渲染执行器尚未启动")
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise ExecutorOverloaded(self.retry_after())
+
+        enqueued = time.monotonic()
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        waited = time.monotonic() - enqueued
+        self._wait_times.append(waited)
+        telemetry.record([("queue", waited)])
+
+        # 即使请求被取消，也要等任务结束后再归还进程
+        task = asyncio.ensure_future(
+            self._run_on(worker, func, args, timeout or self.timeout)
+        )
+        return await asyncio.shield(task)
+
+    async def _run_on(self, worker, func, args, timeout):
+        self._busy += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.to_thread(worker.call, func, args, timeout)
+            self._completed += 1
+            return result
+        except RenderTimeout:
+            self._timeouts += 1
+            raise
+        except RenderFailed:
+            self._failed += 1
+            raise
+        finally:
+            self._run_times.append(time.monotonic() - started)
+            self._busy -= 1
+            if self._idle is not None:
+                if not worker.alive:
+                    self._retire(worker)
+                    self._restarts += 1
+                    worker = self._spawn()
+                self._idle.put_nowait(worker)
+
+    def stats(self):
+        """队列深度、进程状态与延迟统计"""
+
+        def percentile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            "queue_depth": self._waiting,
+            "queue_limit": self.max_queue,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+            "restarts": self._restarts,
+            "wait_p50_ms": round(percentile(self._wait_times, 0.5) * 1000, 1),
+            "wait_p95_ms": round(percentile(self._wait_times, 0.95) * 1000, 1),
+            "run_p50_ms": round(percentile(self._run_times, 0.5) * 1000, 1),
+            "run_p95_ms": round(percentile(self._run_times, 0.95) * 1000, 1),
+        }
@@ -0,0 +1,460 @@
+"""
+字体管理：按搜索路径发现字体、缓存字体索引、首次使用时才注册
+
+启动时只读取字体文件头部的 name / OS/2 / cmap 表（族名、字重、是否覆盖常用汉字），
+结果按 (路径, mtime, 大小) 写入磁盘索引，下次启动文件未变化时直接复用；
+选中的字体在第一次渲染前才交给 ReportLab 解析注册。
+"""
+import os
+import json
+import mmap
+import struct
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from .optimize import strip_font_tables
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf")
+
+# 默认搜索路径（macOS / Windows / Linux）
+DEFAULT_SEARCH_PATH = [
+    "/System/Library/Fonts",
+    "/Library/Fonts",
+    "C:\\Windows\\Fonts",
+    "/usr/share/fonts",
+    "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"),
+]
+
+# 字体族优先顺序：先中文字体，再常见的西文无衬线字体
+PREFERRED_FAMILIES = [
+    "PingFang SC",
+    "PingFang",
+    "STHeiti",
+    "Heiti SC",
+    "Hiragino Sans GB",
+    "Arial Unicode MS",
+    "Microsoft YaHei",
+    "SimHei",
+    "SimSun",
+    "WenQuanYi Micro Hei",
+    "WenQuanYi Zen Hei",
+    "Noto Sans CJK SC",
+    "Source Han Sans SC",
+    "DejaVu Sans",
+    "Liberation Sans",
+    "Helvetica",
+]
+
+# 用于判断是否支持中文的样本字符
+CJK_SAMPLE = "中文表格数据"
+
+# 注册到 ReportLab 的字体名称，与具体字体文件无关
+FONT_NAME = "ChineseFont"
+BOLD_FONT_NAME = "ChineseFont-Bold"
+
+# 没有可用 TrueType 字体时的内置字体
+CID_FALLBACK = "STSong-Light"
+
+# 内置中文字体也无法注册时使用的 ReportLab 标准字体 (正文, 粗体)，不需要注册
+STANDARD_FALLBACK = ("Helvetica", "Helvetica-Bold")
+
+
+class SubsetTTFont(TTFont):
+    """
+    可以按文档精简嵌入子集的 TTFont。文档带有 mdt2pdf_strip_font_tables 标记时
+    （体积优化输出，见 optimize.CompactCanvas）：
+    - 子集只包含文档实际用到的字符。ReportLab 默认让第一个子集预先包含全部可打印 ASCII 字符，
+      使内容流中的英文可读，每个字体因此多嵌入约 95 个字形
+    - 从生成的每个子集中去掉标记的表
+    """
+
+    def splitString(self, text, doc, encoding="utf-8"):
+        if getattr(doc, "mdt2pdf_strip_font_tables", None) and doc not in self.state:
+            self.state[doc] = TTFont.State(False, self)
+        return TTFont.splitString(self, text, doc, encoding)
+
+    def addObjects(self, doc):
+        TTFont.addObjects(self, doc)
+        tags = getattr(doc, "mdt2pdf_strip_font_tables", None)
+        if not tags or not isinstance(getattr(doc, "idToObject", None), dict):
+            return
+        # 子集字体流以 "fontFile:路径(子集名)" 注册在文档中
+        prefix = f"fontFile:{self.face.filename}("
+        for name, stream in doc.idToObject.items():
+            if name.startswith(prefix) and name not in doc.mdt2pdf_stripped:
+                stream.content = strip_font_tables(stream.content, tags)
+                stream.dictionary["Length1"] = len(stream.content)
+                doc.mdt2pdf_stripped.add(name)
+
+
+class MappedFontFile:
+    """
+    以只读内存映射的方式把字体文件交给 ReportLab（TTFontFile 接受带 read() 的文件对象，
+    read() 返回的 mmap 支持它用到的切片读取）。ReportLab 默认把整个字体文件读入进程内存，
+    中文字体通常有十几到几十 MB，每个服务进程和渲染进程各一份；映射后字体数据留在系统页缓存中，
+    全部进程共用，且只有实际读到的页（表目录、cmap、用到的字形）占用内存
+    """
+
+    def __init__(self, path: str):
+        self.name = path
+
+    def read(self):
+        with open(self.name, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@dataclass
+class FontFace:
+    """字体文件中的一个字形集合（TTC 中的一个子字体）"""
+
+    path: str
+    index: int
+    family: str
+    style: str
+    weight: int
+    italic: bool
+    cjk: bool
+
+    @property
+    def label(self) -> str:
+        return f"{self.family} {self.style} ({self.path}#{self.index})"
+
+
+def _read_name(data, offset) -> Tuple[str, str]:
+    """读取 name 表中的 (族名, 样式名)，优先使用 Windows 英文名称"""
+    _, count, string_offset = struct.unpack_from(">HHH", data, offset)
+    found = {}
+    for i in range(count):
+        platform, encoding, language, name_id, length, str_offset = struct.unpack_from(
+            ">HHHHHH", data, offset + 6 + i * 12
+        )
+        if name_id not in (1, 2, 16, 17):
+            continue
+        raw = data[offset + string_offset + str_offset:offset + string_offset + str_offset + length]
+        if platform == 3 or platform == 0:
+            text = raw.decode("utf-16-be", "replace")
+            rank = 0 if language == 0x409 else 1
+        elif platform == 1 and encoding == 0:
+            text = raw.decode("latin-1")
+            rank = 2
+        else:
+            continue
+        if name_id not in found or rank < found[name_id][0]:
+            found[name_id] = (rank, text)
+    family = (found.get(16) or found.get(1) or (0, ""))[1]
+    style = (found.get(17) or found.get(2) or (0, "Regular"))[1]
+    return family, style
+
+
+def _cmap_covers(data, offset, codepoints) -> bool:
+    """cmap 表（格式 4 或 12）是否包含全部码位"""
+    _, num_tables = struct.unpack_from(">HH", data, offset)
+    subtables = {}
+    for i in range(num_tables):
+        platform, encoding, sub_offset = struct.unpack_from(">HHI", data, offset + 4 + i * 8)
+        subtables[(platform, encoding)] = offset + sub_offset
+
+    for key in ((3, 10), (0, 4), (0, 6)):
+        if key in subtables and struct.unpack_from(">H", data, subtables[key])[0] == 12:
+            base = subtables[key]
+            num_groups = struct.unpack_from(">I", data, base + 12)[0]
+            groups = [struct.unpack_from(">II", data, base + 16 + i * 12) for i in range(num_groups)]
+            return all(any(start <= cp <= end for start, end in groups) for cp in codepoints)
+
+    for key in ((3, 1), (0, 3), (0, 1), (0, 0)):
+        if key in subtables and struct.unpack_from(">H", data, subtables[key])[0] == 4:
+            base = subtables[key]
+            seg_count = struct.unpack_from(">H", data, base + 6)[0] // 2
+            ends = struct.unpack_from(f">{seg_count}H", data, base + 14)
+            starts = struct.unpack_from(f">{seg_count}H", data, base + 16 + seg_count * 2)
+            return all(
+                any(start <= cp <= end for start, end in zip(starts, ends)) for cp in codepoints
+            )
+    return False
+
+
+def _read_face(data, offset, path, index) -> Optional[FontFace]:
+    """解析一个子字体的表目录；CFF 轮廓（OTTO）ReportLab 不支持，返回 None"""
+    sfnt_version, num_tables = struct.unpack_from(">4sH", data, offset)
+    if sfnt_version == b"OTTO":
+        return None
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, length = struct.unpack_from(">4sIII", data, offset + 12 + i * 16)
+        tables[tag] = (table_offset, length)
+    if b"name" not in tables or b"cmap" not in tables or b"glyf" not in tables:
+        return None
+
+    family, style = _read_name(data, tables[b"name"][0])
+    weight, italic = 400, "italic" in style.lower() or "oblique" in style.lower()
+    if b"OS/2" in tables and tables[b"OS/2"][1] >= 64:
+        os2 = tables[b"OS/2"][0]
+        weight = struct.unpack_from(">H", data, os2 + 4)[0]
+        italic = italic or bool(struct.unpack_from(">H", data, os2 + 62)[0] & 0x01)
+    cjk = _cmap_covers(data, tables[b"cmap"][0], [ord(c) for c in CJK_SAMPLE])
+    return FontFace(path, index, family, style, weight, italic, cjk)
+
+
+def scan_font_file(path: str) -> List[FontFace]:
+    """读取字体文件头部信息，TTC 文件返回全部子字体"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] == b"ttcf":
+                num_fonts = struct.unpack_from(">I", data, 8)[0]
+                offsets = struct.unpack_from(f">{num_fonts}I", data, 12)
+            else:
+                offsets = (0,)
+            faces = []
+            for index, offset in enumerate(offsets):
+                face = _read_face(data, offset, path, index)
+                if face is not None:
+                    faces.append(face)
+            return faces
+
+
+def default_index_path() -> str:
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "mdt2pdf", "font-index.json")
+
+
+class FontManager:
+    """
+    字体发现、选择与延迟注册：
+    - select() 只读取索引，决定正文/粗体使用哪个子字体，不解析字体文件
+    - ensure_registered() 在第一次渲染前注册选中的字体，失败时依次尝试下一个候选
+    """
+
+    def __init__(
+        self,
+        search_path: Optional[List[str]] = None,
+        index_path: Optional[str] = None,
+        families: Optional[List[str]] = None,
+    ):
+        self.search_path = search_path or DEFAULT_SEARCH_PATH
+        self.index_path = index_path
+        self.families = families or PREFERRED_FAMILIES
+        self.faces: List[FontFace] = []
+        self.candidates = []
+        self.regular: Optional[FontFace] = None
+        self.bold: Optional[FontFace] = None
+        self.font_name = FONT_NAME
+        self.bold_font_name = BOLD_FONT_NAME
+        self.registered = False
+        self.index_hit = False
+        # select() 选中的字体标识，以及本进程注册时回退到其他字体后实际使用的字体（未回退时为 None）
+        self.selection: Optional[List[str]] = None
+        self.fallback: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建字体管理器"""
+        search_path = os.getenv("MDT2PDF_FONT_PATH")
+        families = os.getenv("MDT2PDF_FONT_FAMILIES")
+        return cls(
+            search_path=search_path.split(os.pathsep) if search_path else None,
+            index_path=os.getenv("MDT2PDF_FONT_INDEX", default_index_path()) or None,
+            families=[name.strip() for name in families.split(",") if name.strip()] if families else None,
+        )
+
+    def _font_files(self):
+        for entry in self.search_path:
+            if os.path.isfile(entry):
+                yield entry
+                continue
+            for root, _, files in os.walk(entry):
+                for name in sorted(files):
+                    if name.lower().endswith(FONT_EXTENSIONS):
+                        yield os.path.join(root, name)
+
+    def _load_index(self):
+        if not self.index_path:
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get("version") != INDEX_VERSION:
+            return {}
+        return index.get("files", {})
+
+    def _save_index(self, files):
+        if not self.index_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": files}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"写入字体索引失败 {self.index_path}: {e}")
+
+    def discover(self) -> List[FontFace]:
+        """扫描搜索路径；文件的 mtime 和大小未变化时使用索引中的结果"""
+        cached = self._load_index()
+        files = {}
+        changed = False
+        for path in self._font_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = cached.get(path)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                files[path] = entry
+                continue
+            try:
+                faces = [asdict(face) for face in scan_font_file(path)]
+            except (OSError, ValueError, struct.error) as e:
+                logger.debug(f"无法读取字体 {path}: {e}")
+                faces = []
+            files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "faces": faces}
+            changed = True
+        if changed or set(files) != set(cached):
+            self._save_index(files)
+        self.index_hit = not changed
+        self.faces = [FontFace(**face) for entry in files.values() for face in entry["faces"]]
+        return self.faces
+
+    def _family_rank(self, family: str):
+        lowered = [name.lower() for name in self.families]
+        return lowered.index(family.lower()) if family.lower() in lowered else len(lowered)
+
+    def select(self):
+        """选择正文与粗体字体，返回注册名 (正文, 粗体)"""
+        if not self.faces:
+            self.discover()
+        upright = [face for face in self.faces if not face.italic and face.family]
+        # 支持中文优先，其次按族名优先顺序，最后按族名排序保证结果稳定
+        families = sorted(
+            {face.family for face in upright},
+            key=lambda family: (
+                not any(face.cjk for face in upright if face.family == family),
+                self._family_rank(family),
+                family,
+            ),
+        )
+        self.candidates = []
+        for family in families:
+            members = [face for face in upright if face.family == family]
+            regular = min(members, key=lambda face: (abs(face.weight - 400), face.path, face.index))
+            bolds = [face for face in members if face.weight >= 600]
+            bold = min(bolds, key=lambda face: (abs(face.weight - 700), face.path, face.index)) if bolds else regular
+            self.candidates.append((regular, bold))
+
+        if self.candidates:
+            self.regular, self.bold = self.candidates[0]
+            # 字体族没有粗体时表头也使用常规体：只注册一个字体，PDF 中只嵌入一份字形。
+            # 有粗体时两个字体的字形不同，各自嵌入自己的子集，不能共用
+            self.font_name = FONT_NAME
+            self.bold_font_name = FONT_NAME if self.bold == self.regular else BOLD_FONT_NAME
+        else:
+            self.regular = self.bold = None
+            self.font_name = self.bold_font_name = CID_FALLBACK
+        self.selection = self._identity()
+        return self.font_name, self.bold_font_name
+
+    def ensure_registered(self):
+        """首次调用时注册选中的字体（每个进程一次）"""
+        if self.registered:
+            return
+        with self._lock:
+            if self.registered:
+                return
+            if self.selection is None:
+                self.select()
+            self._register()
+            actual = self._identity()
+            if actual != self.selection:
+                # 选中的字体注册失败，改用了后续候选或内置字体
+                self.fallback = "fallback:" + ",".join(actual[2:])
+            self.registered = True
+
+    def _register(self):
+        for regular, bold in self.candidates:
+            try:
+                pdfmetrics.registerFont(
+                    SubsetTTFont(FONT_NAME, MappedFontFile(regular.path), subfontIndex=regular.index)
+                )
+                if self.bold_font_name == BOLD_FONT_NAME:
+                    pdfmetrics.registerFont(
+                        SubsetTTFont(BOLD_FONT_NAME, MappedFontFile(bold.path), subfontIndex=bold.index)
+                    )
+            except Exception as e:
+                logger.warning(f"字体注册失败 {regular.label}: {e}")
+                continue
+            self.regular, self.bold = regular, bold
+            logger.info(f"已注册字体: {regular.label}, 粗体: {bold.label}")
+            return
+
+        if self.candidates:
+            logger.error("所有候选字体都注册失败，改用内置字体")
+        self.regular = self.bold = None
+        # 没有可用的 TrueType 字体时使用内置中文字体，仍然失败时使用 ReportLab 的标准字体（不支持中文）
+        try:
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+            pdfmetrics.registerFont(UnicodeCIDFont(CID_FALLBACK))
+            self.font_name = self.bold_font_name = CID_FALLBACK
+            logger.info(f"使用内置中文字体: {CID_FALLBACK}")
+        except Exception as e:
+            self.font_name, self.bold_font_name = STANDARD_FALLBACK
+            logger.error(f"内置中文字体注册失败: {e}，使用 {self.font_name}")
+
+    def _identity(self) -> List[str]:
+        """当前字体的注册名加上字体文件（内置字体为字体名）"""
+        faces = [
+            f"{face.path}#{face.index}" if face else name
+            for face, name in ((self.regular, self.font_name), (self.bold, self.bold_font_name))
+        ]
+        return [self.font_name, self.bold_font_name] + faces
+
+    def fingerprint(self):
+        """
+        参与缓存键计算的字体标识：select() 选中的注册名和字体文件，只读取字体索引，不注册字体，
+        服务进程处理请求时不解析字体文件。本进程注册时发生回退的，实际使用的字体作为单独一项追加在后
+        """
+        if self.selection is None:
+            self.select()
+        if self.fallback is None:
+            return list(self.selection)
+        return self.selection + [self.fallback]
+
+    def describe(self):
+        """健康检查中展示的字体信息"""
+
+        def face_info(face, name):
+            if face is None:
+                return {"family": name, "builtin": True}
+            return {
+                "family": face.family,
+                "style": face.style,
+                "weight": face.weight,
+                "path": face.path,
+                "index": face.index,
+                "cjk": face.cjk,
+            }
+
+        return {
+            "font": self.font_name,
+            "bold_font": self.bold_font_name,
+            "regular": face_info(self.regular, self.font_name),
+            "bold": face_info(self.bold, self.bold_font_name),
+            "cjk": bool(self.regular and self.regular.cjk) or self.font_name == CID_FALLBACK,
+            "registered": self.registered,
+            "faces_indexed": len(self.faces),
+            "index_path": self.index_path,
+            "index_hit": self.index_hit,
+        }
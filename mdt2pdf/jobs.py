@@ -0,0 +1,433 @@
+"""
+异步转换任务：提交后立即返回任务ID，渲染在独立的任务进程池中进行，客户端轮询状态后下载结果
+
+任务状态保存在 SQLite 中，结果PDF写入磁盘目录，任务结束后保留 TTL 秒再清理。渲染进程直接把进度
+写入 SQLite（节流），同时检查任务是否已被取消，取消后在下一次进度报告时中止渲染。内容、参数和字体
+都相同的任务在排队、运行中或结果尚未过期时直接返回已有的任务，不重复渲染。
+"""
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from . import converter, telemetry
+from .executor import ExecutorOverloaded, RenderExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+# 各阶段在总进度中所占的区间；解析在提交前已完成
+STAGE_RANGES = {"cells": (0.0, 0.4), "build": (0.4, 0.99)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    orientation TEXT NOT NULL,
+    layout TEXT NOT NULL,
+    optimize TEXT NOT NULL DEFAULT 'none',
+    tables INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    result_bytes INTEGER,
+    owner INTEGER NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires);
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite 任务表：服务进程和渲染进程各自打开连接（WAL 模式，允许并发读写），
+    状态变更都带有前置状态条件，取消与完成同时发生时只有一个生效
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            # 早期版本创建的任务表没有 optimize 列
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "optimize" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN optimize TEXT NOT NULL DEFAULT 'none'")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def create(self, key: str, orientation: str, layout: str, tables: int, rows: int,
+               optimize: str = "none") -> dict:
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, key, status, orientation, layout, optimize, tables, rows, owner, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, key, QUEUED, orientation, layout, optimize, tables, rows, os.getpid(), time.time()),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """查询任务，已过期的任务视为不存在"""
+        row = self._execute(
+            "SELECT * FROM jobs WHERE id = ? AND (expires IS NULL OR expires > ?)", (job_id, time.time())
+        ).fetchone()
+        return dict(row) if row else None
+
+    def find_reusable(self, key: str) -> Optional[dict]:
+        """相同内容的任务：排队中、运行中，或已完成且结果未过期"""
+        row = self._execute(
+            "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?, ?) AND (expires IS NULL OR expires > ?) "
+            "ORDER BY created DESC LIMIT 1",
+            (key, QUEUED, RUNNING, DONE, time.time()),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def start(self, job_id: str) -> bool:
+        """标记任务开始运行；任务已被取消时返回 False"""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+            (RUNNING, time.time(), job_id, QUEUED),
+        )
+        return cursor.rowcount == 1
+
+    def progress(self, job_id: str, stage: str, progress: float) -> bool:
+        """更新运行中任务的进度；任务已不在运行（被取消）时返回 False"""
+        cursor = self._execute(
+            "UPDATE jobs SET stage = ?, progress = ? WHERE id = ? AND status = ?",
+            (stage, progress, job_id, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, ttl: float, error: Optional[str] = None,
+               result_bytes: Optional[int] = None) -> bool:
+        """结束排队中或运行中的任务，结果保留 ttl 秒；任务已经结束时返回 False"""
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, error = ?, result_bytes = ?, finished = ?, expires = ?, "
+            "progress = CASE WHEN ? = ? THEN 1.0 ELSE progress END "
+            "WHERE id = ? AND status IN (?, ?)",
+            (status, error, result_bytes, now, now + ttl, status, DONE, job_id, QUEUED, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def interrupt_orphans(self, ttl: float) -> int:
+        """
+        服务启动时调用：所属服务进程已经退出的未完成任务标记为失败。
+        容器中重启后的进程号可能与之前相同，属于当前进程号的记录同样视为遗留任务
+        """
+        rows = self._execute(
+            "SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        orphans = [row["id"] for row in rows if row["owner"] == os.getpid() or not _pid_alive(row["owner"])]
+        for job_id in orphans:
+            self.finish(job_id, FAILED, ttl, error="服务重启，任务已中断")
+        return len(orphans)
+
+    def expire(self) -> list:
+        """删除已过期的任务记录，返回它们的ID"""
+        now = time.time()
+        with self._lock:
+            ids = [row["id"] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (now,)
+            )]
+            self._conn.execute("DELETE FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        return ids
+
+    def ids(self) -> set:
+        return {row["id"] for row in self._execute("SELECT id FROM jobs")}
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="seconds")
+
+
+def job_info(job: dict) -> dict:
+    """接口返回的任务信息"""
+    info = {
+        "id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": round(job["progress"], 3),
+        "orientation": job["orientation"],
+        "layout": job["layout"],
+        "optimize": job["optimize"],
+        "tables": job["tables"],
+        "rows": job["rows"],
+        "created": _timestamp(job["created"]),
+        "started": _timestamp(job["started"]),
+        "finished": _timestamp(job["finished"]),
+        "expires": _timestamp(job["expires"]),
+    }
+    if job["error"]:
+        info["error"] = job["error"]
+    if job["status"] == DONE:
+        info["result_bytes"] = job["result_bytes"]
+        info["result_url"] = f"/jobs/{job['id']}/result"
+    return info
+
+
+class ProgressReporter:
+    """渲染进程中的进度回调：按阶段区间换算总进度，节流写入任务表，发现任务已取消时中止渲染"""
+
+    def __init__(self, store: JobStore, job_id: str, interval: float = 0.5):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.progress = 0.0
+        self._last = 0.0
+
+    def __call__(self, stage: str, done: int, total: int):
+        start, end = STAGE_RANGES.get(stage, (self.progress, self.progress))
+        fraction = min(1.0, done / total) if total else 1.0
+        # 多表格文档中各表格依次经过各阶段，总进度只增不减
+        self.progress = max(self.progress, start + (end - start) * fraction)
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+        if not self.store.progress(self.job_id, stage, self.progress):
+            raise converter.RenderCancelled(f"任务 {self.job_id} 已取消")
+
+
+# 渲染进程中的任务表连接，按数据库路径复用
+_worker_stores: Dict[str, JobStore] = {}
+
+
+def run_job(db_path: str, job_id: str, result_path: str, tables, orientation: str, layout: str,
+            optimize: str = "none"):
+    """
+    在渲染进程中执行一个任务：把PDF写入 result_path（先写临时文件再改名），返回字节数；
+    任务在开始前或渲染中被取消时返回 None
+    """
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = JobStore(db_path)
+    if not store.start(job_id):
+        return None
+    try:
+        with converter.progress_reporting(ProgressReporter(store, job_id)):
+            pdf_bytes = converter.render_tables(tables, orientation, layout, optimize)
+    except converter.RenderCancelled:
+        logger.info(f"任务 {job_id} 已取消，停止渲染")
+        return None
+    tmp_path = f"{result_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, result_path)
+    return len(pdf_bytes)
+
+
+class JobManager:
+    """
+    异步任务调度：任务表和结果目录、独立的渲染进程池（不占用同步接口的渲染进程），
+    以及定期清理过期任务的后台协程。供请求处理调用的方法都是协程，任务表的读写在线程中进行：
+    渲染进程写入进度时数据库可能被锁住，查询最多等待 10 秒，不能阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = 3600,
+        workers: int = 1,
+        timeout: float = 1800,
+        max_queue: int = 256,
+        initializer: Optional[Callable] = None,
+        start_method: str = "spawn",
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.db_path = os.path.join(directory, "jobs.sqlite3")
+        self.results_dir = os.path.join(directory, "results")
+        self.executor = RenderExecutor(
+            workers=workers, max_queue=max_queue, timeout=timeout,
+            initializer=initializer, start_method=start_method,
+        )
+        self.store: Optional[JobStore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cleaner: Optional[asyncio.Task] = None
+        # 查找可复用任务与新建任务之间会让出事件循环，相同内容的并发提交依次进行，只新建一个任务
+        self._submit_lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, initializer: Optional[Callable] = None):
+        """根据环境变量创建任务管理器"""
+        return cls(
+            directory=os.getenv("MDT2PDF_JOB_DIR") or os.path.join(tempfile.gettempdir(), "mdt2pdf-jobs"),
+            ttl=float(os.getenv("MDT2PDF_JOB_TTL", "3600")),
+            workers=int(os.getenv("MDT2PDF_JOB_WORKERS", "1")),
+            timeout=float(os.getenv("MDT2PDF_JOB_TIMEOUT", "1800")),
+            max_queue=int(os.getenv("MDT2PDF_JOB_QUEUE_SIZE", "256")),
+            initializer=initializer,
+            start_method=os.getenv("MDT2PDF_RENDER_START_METHOD", "spawn"),
+        )
+
+    def start(self):
+        """打开任务表并启动任务进程池，需在事件循环中调用"""
+        os.makedirs(self.results_dir, exist_ok=True)
+        self.store = JobStore(self.db_path)
+        interrupted = self.store.interrupt_orphans(self.ttl)
+        if interrupted:
+            logger.warning(f"{interrupted} 个未完成的任务因服务重启而中断")
+        self.cleanup(remove_orphans=True)
+        self.executor.start()
+        self._cleaner = asyncio.ensure_future(self._cleanup_loop())
+
+    def shutdown(self):
+        if self._cleaner is not None:
+            self._cleaner.cancel()
+        for job_id, task in list(self._tasks.items()):
+            task.cancel()
+            self.store.finish(job_id, FAILED, self.ttl, error="服务停止，任务已中断")
+        self.executor.shutdown()
+        if self.store is not None:
+            self.store.close()
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, f"{job_id}.pdf")
+
+    @property
+    def active(self) -> int:
+        """本进程中排队或运行中的任务数"""
+        return len(self._tasks)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _find_reusable(self, key: str) -> Optional[dict]:
+        existing = self.store.find_reusable(key)
+        if existing is not None and (existing["status"] != DONE or os.path.exists(self.result_path(existing["id"]))):
+            return existing
+        return None
+
+    async def submit(self, key: str, tables, orientation: str, layout: str, optimize: str = "none") -> Tuple[dict, bool]:
+        """
+        提交任务，返回 (任务, 是否新建)：已有相同内容的任务时直接返回它；
+        本进程未完成的任务过多时抛出 ExecutorOverloaded
+        """
+        async with self._submit_lock:
+            existing = await asyncio.to_thread(self._find_reusable, key)
+            if existing is not None:
+                return existing, False
+            if len(self._tasks) >= self.executor.max_queue + self.executor.workers:
+                raise ExecutorOverloaded(self.executor.retry_after())
+
+            job = await asyncio.to_thread(
+                self.store.create,
+                key, orientation, layout, len(tables), sum(len(t.data) for t in tables), optimize
+            )
+            task = asyncio.ensure_future(self._run(job["id"], tables, orientation, layout, optimize))
+            self._tasks[job["id"]] = task
+            task.add_done_callback(lambda _, job_id=job["id"]: self._tasks.pop(job_id, None))
+        return job, True
+
+    async def _run(self, job_id: str, tables, orientation: str, layout: str, optimize: str):
+        # 任务耗时不计入提交请求的 Trace
+        with telemetry.collect():
+            try:
+                size = await self.executor.submit(
+                    run_job, self.db_path, job_id, self.result_path(job_id),
+                    tables, orientation, layout, optimize
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"任务 {job_id} 失败: {e}")
+                await asyncio.to_thread(self.store.finish, job_id, FAILED, self.ttl, error=str(e))
+                return
+        if size is not None and not await asyncio.to_thread(
+            self.store.finish, job_id, DONE, self.ttl, result_bytes=size
+        ):
+            # 渲染完成的同时任务被取消：结果不再需要
+            self._remove_result(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        取消排队中或运行中的任务：排队中的任务不再渲染，运行中的任务在渲染进程下一次报告进度时中止；
+        已结束的任务保持原状态。任务不存在时返回 None
+        """
+        if await asyncio.to_thread(self.store.finish, job_id, CANCELLED, self.ttl, error="任务已取消"):
+            task = self._tasks.get(job_id)
+            if task is not None:
+                # 等待渲染进程的任务直接取消；已在渲染的任务由执行器等到进程中止后再归还进程
+                task.cancel()
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _remove_result(self, job_id: str):
+        try:
+            os.remove(self.result_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self, remove_orphans: bool = False) -> int:
+        """删除过期的任务及其结果文件；remove_orphans 时还删除没有对应任务记录的结果文件"""
+        expired = self.store.expire()
+        for job_id in expired:
+            self._remove_result(job_id)
+        if remove_orphans:
+            known = self.store.ids()
+            for name in os.listdir(self.results_dir):
+                if name.split(".", 1)[0] not in known:
+                    os.remove(os.path.join(self.results_dir, name))
+        if expired:
+            logger.info(f"已清理 {len(expired)} 个过期任务")
+        return len(expired)
+
+    async def _cleanup_loop(self):
+        interval = max(1.0, min(60.0, self.ttl / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.cleanup)
+            except Exception as e:
+                logger.error(f"清理过期任务失败: {e}")
+
+    def stats(self):
+        return {
+            "active": len(self._tasks),
+            "jobs": self.store.counts() if self.store is not None else {},
+            "executor": self.executor.stats(),
+        }
@@ -0,0 +1,188 @@
+"""
+表格布局求解器
+
+一次遍历测量全部单元格，得到按列存储的宽度矩阵（字号 1000 时的宽度，array 存储），
+之后对字号做二分查找：每个候选字号下按列分配宽度（窄列保持自然宽度，宽列按需求分摊剩余空间），
+再用各列实际宽度计算每个单元格的换行数和总表高，取能放进可用高度的最大字号。
+"""
+from array import array
+from itertools import islice, repeat
+from typing import List
+
+from .metrics import unit_width
+from .table_data import as_table_data
+
+# 候选字号：最小 6pt，步长 0.5pt
+MIN_FONT_SIZE = 6.0
+FONT_SIZE_STEP = 0.5
+# 行距与字号的比例，与 wrap_text_in_cell 中 Paragraph 的 leading 一致
+LEADING_RATIO = 1.2
+# Paragraph 左右缩进之和
+PARAGRAPH_INDENT = 4
+# 需要压缩时只使用可用宽度的 98%
+SQUEEZE_RATIO = 0.98
+# 换行单元格每行平均少排的宽度（em）：Paragraph 按词断行，放不下的词整个移到下一行，行尾留空；
+# 按语料中的 Paragraph 实际行数校准（中文按字断行，行尾留空更少，估算略偏大）
+WRAP_SLACK_EM = 1.0
+# 安全余量：一行的高度取该行最多的单元格行数，个别单元格少算一行就会让整行少算，
+# 多于一行的行按估算行数的这个比例多留高度
+WRAP_MARGIN = 0.1
+
+
+class TableMeasurement:
+    """按列存储的单元格宽度矩阵"""
+
+    __slots__ = ("columns", "column_max", "num_rows", "num_cols", "total_chars")
+
+    def __init__(self, columns: List[array], num_rows: int, num_cols: int, total_chars: int):
+        self.columns = columns
+        self.column_max = [max(column) if column else 0 for column in columns]
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.total_chars = total_chars
+
+    def natural_widths(self, font_size: float) -> List[float]:
+        """各列最长单元格在指定字号下的宽度"""
+        scale = font_size / 1000
+        return [width * scale for width in self.column_max]
+
+
+def measure_table(data, font_name: str, header_font_name: str) -> TableMeasurement:
+    """测量全部单元格（表头用粗体字体）；data 为 TableData，各行列数已经统一，缺失单元格为空字符串"""
+    data = as_table_data(data)
+    columns = []
+    # 直接按列批量测量，宽度缓存的查找都在 C 层完成
+    for column in data.columns:
+        widths = array("d", [unit_width(column[0], header_font_name)])
+        widths.extend(map(unit_width, islice(column, 1, None), repeat(font_name)))
+        columns.append(widths)
+    return TableMeasurement(columns, len(data), data.num_cols, data.total_chars)
+
+
+def base_font_size(measurement: TableMeasurement) -> float:
+    """字号上限：内容多时使用小字体，内容少时使用标准字体"""
+    if measurement.total_chars > 1000 or measurement.num_rows > 8 or measurement.num_cols > 5:
+        return 8
+    if measurement.total_chars > 500 or measurement.num_rows > 5:
+        return 9
+    return 10
+
+
+def cell_padding(font_size: float) -> float:
+    """与 create_table_styles 一致的单元格内边距"""
+    return max(3, font_size // 2)
+
+
+def allocate_widths(natural: List[float], padding: float, available_width: float) -> List[float]:
+    """
+    分配列宽：
+    - 总宽度足够时，每列自然宽度加上平均分摊的剩余空间
+    - 不够时，自然宽度不超过平均份额的窄列保持原宽，其余宽列一半按平均份额、
+      一半按自然宽度比例分摊剩余空间
+    """
+    num_cols = len(natural)
+    needed = [w + 2 * padding + PARAGRAPH_INDENT for w in natural]
+    total_needed = sum(needed)
+    if total_needed <= available_width:
+        extra = (available_width - total_needed) / num_cols
+        return [w + extra for w in needed]
+
+    budget = available_width * SQUEEZE_RATIO
+    widths = [0.0] * num_cols
+    remaining = budget
+    wide = []
+    order = sorted(range(num_cols), key=needed.__getitem__)
+    for position, col_idx in enumerate(order):
+        share = remaining / (num_cols - position)
+        if needed[col_idx] > share:
+            wide = order[position:]
+            break
+        widths[col_idx] = needed[col_idx]
+        remaining -= needed[col_idx]
+    if wide:
+        share = remaining / len(wide)
+        wide_total = sum(needed[i] for i in wide)
+        for col_idx in wide:
+            widths[col_idx] = 0.5 * share + 0.5 * remaining * needed[col_idx] / wide_total
+    return widths
+
+
+def table_height(measurement: TableMeasurement, col_widths: List[float], font_size: float) -> float:
+    """
+    按列宽估算每个单元格的换行数，得到整表高度。
+    只有单元格宽度、没有文本，换行数不是 Paragraph 断行的结果：一行放得下的单元格为 1 行（准确），
+    需要换行的按 总宽度 / (行宽 - WRAP_SLACK_EM) 向上取整。不扣行尾留空时的结果只是下限
+    （英文窄列实际行数多 15%～30%），扣除后与实际行数的总和基本一致，但个别单元格仍可能多出一行，
+    因此多于一行的行再按 WRAP_MARGIN 多留高度
+    """
+    padding = cell_padding(font_size)
+    scale = font_size / 1000
+    wrapped = []
+    for column, column_max, col_width in zip(measurement.columns, measurement.column_max, col_widths):
+        inner = max(1.0, col_width - 2 * padding - PARAGRAPH_INDENT)
+        if column_max * scale <= inner:
+            continue
+        limit = inner / scale
+        k = scale / max(1.0, inner - WRAP_SLACK_EM * font_size)
+        wrapped.append([1 if u <= limit else -(-u * k // 1) for u in column])
+
+    if wrapped:
+        row_lines = list(map(max, repeat(1), *wrapped))
+        total_lines = sum(row_lines)
+        total_lines += WRAP_MARGIN * (total_lines - row_lines.count(1))
+    else:
+        total_lines = measurement.num_rows
+    return total_lines * font_size * LEADING_RATIO + measurement.num_rows * 2 * padding
+
+
+def solve_table_layout(
+    measurement: TableMeasurement,
+    available_width: float,
+    available_height: float,
+    max_font_size: float,
+):
+    """
+    二分查找能放进可用高度的最大字号，返回 (列宽, 平均行高, 缩放比例, 字号)，
+    与 calculate_optimal_table_size 的返回值一致
+    """
+    candidates = []
+    size = MIN_FONT_SIZE
+    while size <= max_font_size:
+        candidates.append(size)
+        size += FONT_SIZE_STEP
+    if not candidates:
+        candidates = [max_font_size]
+
+    def evaluate(font_size):
+        widths = allocate_widths(
+            measurement.natural_widths(font_size), cell_padding(font_size), available_width
+        )
+        return widths, table_height(measurement, widths, font_size)
+
+    # 字号越小表格越矮，找满足高度约束的最大字号
+    low, high = 0, len(candidates) - 1
+    best = None
+    while low <= high:
+        mid = (low + high) // 2
+        widths, height = evaluate(candidates[mid])
+        if height <= available_height:
+            best = (candidates[mid], widths, height)
+            low = mid + 1
+        else:
+            high = mid - 1
+    if best is None:
+        font_size = candidates[0]
+        widths, height = evaluate(font_size)
+        best = (font_size, widths, height)
+
+    font_size, col_widths, height = best
+    natural_total = sum(
+        w + 2 * cell_padding(font_size) + PARAGRAPH_INDENT
+        for w in measurement.natural_widths(font_size)
+    )
+    width_scale = available_width / natural_total if natural_total > 0 else 1.0
+    height_scale = available_height / height if height > 0 else 1.0
+    scale_factor = min(width_scale, height_scale)
+    row_height = height / measurement.num_rows if measurement.num_rows else 0
+
+    return col_widths, row_height, scale_factor, font_size
@@ -0,0 +1,138 @@
+"""
+行级布局备忘：同一个表格反复编辑时，只重新测量、重新创建有变化的行
+
+按 (表头, 字体) 区分表格，每个表格保存上一版本中每一行的单元格宽度、已创建的单元格对象和行高，
+以行内容为键，因此修改、插入、删除行都只影响对应的行。单元格对象还与 (字号, 列宽) 绑定，
+列宽或字号变化时全部重新创建。每个进程独立保存，按表格数量和保存的总行数做 LRU 淘汰，
+行数超过上限的单个表格不做备忘，进程内存不随请求的表格规模无限增长。
+"""
+import os
+from array import array
+from collections import OrderedDict
+from itertools import repeat
+from typing import Any, Callable, List, Optional, Tuple
+
+from .layout import TableMeasurement
+from .metrics import unit_width
+
+
+class TableMemo:
+    """一个表格（按表头和字体区分）最近一个版本的行级结果"""
+
+    def __init__(self, num_cols: int, font_name: str, header_font_name: str):
+        self.num_cols = num_cols
+        self.font_name = font_name
+        self.header_font_name = header_font_name
+        self._widths = {}
+        self._cells = {}
+        self._cells_key = None
+        self.measured = 0
+        self.reused = 0
+        self.built = 0
+        self.cached = 0
+
+    @property
+    def rows(self) -> int:
+        """当前保存的行数（测量结果和单元格对象中较多的一项）"""
+        return max(len(self._widths), len(self._cells))
+
+    def _measure_row(self, row: Tuple[str, ...], font_name: str):
+        row = (row + ("",) * self.num_cols)[:self.num_cols]
+        return array("d", map(unit_width, row, repeat(font_name))), sum(map(len, row))
+
+    def measure(self, data) -> TableMeasurement:
+        """测量表格：内容未变化的行直接复用上一版本的宽度，只测量新增或修改的行"""
+        previous, current = self._widths, {}
+        rows = [tuple(map(str, row)) for row in data]
+        measured_rows = []
+        total_chars = 0
+        for row_idx, row in enumerate(rows):
+            key = (row_idx == 0, row)
+            entry = previous.get(key) or current.get(key)
+            if entry is None:
+                font_name = self.header_font_name if row_idx == 0 else self.font_name
+                entry = self._measure_row(row, font_name)
+                self.measured += 1
+            else:
+                self.reused += 1
+            current[key] = entry
+            measured_rows.append(entry[0])
+            total_chars += entry[1]
+        # 只保留当前版本的行，旧版本中被修改或删除的行随之释放
+        self._widths = current
+        columns = [array("d", column) for column in zip(*measured_rows)]
+        return TableMeasurement(columns, len(rows), self.num_cols, total_chars)
+
+    def build_rows(self, data, layout_key, create_row: Callable[[int, list], Any]) -> List[Any]:
+        """
+        创建全部行的排版结果（单元格对象和行高）：内容未变化的行复用上一版本的结果，
+        其余行调用 create_row。layout_key 为 (字号, 列宽)，与上一版本不同时全部重新创建
+        """
+        previous = self._cells if layout_key == self._cells_key else {}
+        current = {}
+        rows = []
+        for row_idx, row in enumerate(data):
+            key = (row_idx == 0, tuple(map(str, row)))
+            entry = previous.get(key) or current.get(key)
+            if entry is None:
+                entry = create_row(row_idx, row)
+                self.built += 1
+            else:
+                self.cached += 1
+            current[key] = entry
+            rows.append(entry)
+        self._cells, self._cells_key = current, layout_key
+        return rows
+
+
+class LayoutMemo:
+    """按 (表头, 字体) 索引的 TableMemo 集合，按表格数量和总行数做 LRU 淘汰"""
+
+    def __init__(self, max_tables: int = 16, max_rows: int = 20000):
+        self.max_tables = max_tables
+        self.max_rows = max_rows
+        self._tables: "OrderedDict[tuple, TableMemo]" = OrderedDict()
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建，MDT2PDF_LAYOUT_MEMO_TABLES=0 或 MDT2PDF_LAYOUT_MEMO_ROWS=0 时关闭"""
+        return cls(
+            max_tables=int(os.getenv("MDT2PDF_LAYOUT_MEMO_TABLES", "16")),
+            max_rows=int(os.getenv("MDT2PDF_LAYOUT_MEMO_ROWS", "20000")),
+        )
+
+    def for_table(self, data, font_name: str, header_font_name: str) -> Optional[TableMemo]:
+        """获取表格的备忘；关闭或表格行数超过 max_rows 时返回 None"""
+        if self.max_tables <= 0 or self.max_rows <= 0 or not data:
+            return None
+        header = tuple(map(str, data[0]))
+        key = (header, font_name, header_font_name)
+        if len(data) > self.max_rows:
+            # 单个表格就超过上限：不做备忘，同时释放这个表格之前版本的结果
+            self._tables.pop(key, None)
+            self.skipped += 1
+            return None
+        memo = self._tables.pop(key, None)
+        if memo is None:
+            memo = TableMemo(len(header), font_name, header_font_name)
+        # 为本次请求的行预留空间：淘汰最久未使用的表格，直到其余表格的行数加上本表格不超过上限
+        rows = sum(other.rows for other in self._tables.values())
+        while self._tables and (len(self._tables) >= self.max_tables or rows + len(data) > self.max_rows):
+            _, evicted = self._tables.popitem(last=False)
+            rows -= evicted.rows
+        self._tables[key] = memo
+        return memo
+
+    def stats(self):
+        """各表格备忘的复用统计之和"""
+        memos = list(self._tables.values())
+        return {
+            "tables": len(memos),
+            "rows": sum(m.rows for m in memos),
+            "skipped": self.skipped,
+            "rows_measured": sum(m.measured for m in memos),
+            "rows_reused": sum(m.reused for m in memos),
+            "rows_built": sum(m.built for m in memos),
+            "rows_cached": sum(m.cached for m in memos),
+        }
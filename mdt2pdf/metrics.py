@@ -0,0 +1,68 @@
+"""
+基于字体真实度量的文本宽度测量
+
+TTF 字体使用 hmtx 中的字形宽度（ReportLab 已解析到 face.charWidths），
+预先展开为 BMP 码位→宽度 的数组；其他字体（内置 Type1 / CID 字体）退回
+pdfmetrics.stringWidth。单元格文本的宽度按 (文本, 字体) 缓存，宽度与字号成正比，
+不同字号共享同一条缓存。
+"""
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# 基本多文种平面大小，超出部分（如 emoji）走字典查询
+_BMP_SIZE = 0x10000
+
+_width_tables = {}
+
+
+class GlyphWidthTable:
+    """单个 TTF 字体的码位→宽度表（单位：1/1000 em）"""
+
+    def __init__(self, font: TTFont):
+        face = font.face
+        self.default_width = face.defaultWidth
+        self.char_widths = face.charWidths
+        self.widths = [self.default_width] * _BMP_SIZE
+        for codepoint, width in face.charWidths.items():
+            if codepoint < _BMP_SIZE:
+                self.widths[codepoint] = width
+
+    def unit_width(self, text: str) -> float:
+        """字号为 1000 时的文本宽度"""
+        try:
+            return sum(map(self.widths.__getitem__, map(ord, text)))
+        except IndexError:
+            get = self.char_widths.get
+            default = self.default_width
+            return sum(get(ord(char), default) for char in text)
+
+
+def get_width_table(font_name: str):
+    """获取字体的宽度表；非 TTF 字体返回 None"""
+    if font_name not in _width_tables:
+        font = pdfmetrics.getFont(font_name)
+        _width_tables[font_name] = GlyphWidthTable(font) if isinstance(font, TTFont) else None
+    return _width_tables[font_name]
+
+
+@lru_cache(maxsize=1 << 18)
+def unit_width(text: str, font_name: str) -> float:
+    """字号为 1000 时的文本宽度，按 (文本, 字体) 缓存；乘以 字号/1000 即实际宽度"""
+    table = get_width_table(font_name)
+    if table is not None:
+        return table.unit_width(text)
+    return pdfmetrics.stringWidth(text, font_name, 1000)
+
+
+def text_width(text: str, font_name: str, font_size: float) -> float:
+    """文本在指定字体和字号下的实际宽度（pt）"""
+    if not text:
+        return 0
+    return unit_width(text, font_name) * font_size / 1000
+
+
+def cache_info():
+    """单元格宽度缓存的命中统计"""
+    return unit_width.cache_info()
@@ -0,0 +1,134 @@
+"""
+体积优化输出（optimize=size）：面向移动端下载和归档，在不改变版面的前提下减小PDF字节数
+
+- 页面内容流中的坐标、线宽和颜色分量保留两位小数（小于 1 的数保留三位），ReportLab 默认保留六位
+  有效数字，0.01pt 的差别在任何缩放下都看不出来，数字变短后压缩效果也更好
+- 表格网格由一条条 "n x y m x y l S" 单线段路径组成，连续的线段合并为一条路径并去掉重复线段
+- 嵌入的字体子集去掉 name 表（族名、版权等字符串，PDF 阅读器不使用），ReportLab 会把它完整复制到
+  每个不超过 256 字的子集里，中文字体的子集数量多，这部分重复占用很大
+- 内容流、字体和 ToUnicode 映射始终使用 Flate 压缩
+
+字形只嵌入用到的字符由 ReportLab 的子集化保证；粗体与常规体是同一字体文件时共用一个字体
+（见 fonts.FontManager.select），两者的字形合并在同一组子集中。
+"""
+import inspect
+import logging
+import re
+import struct
+
+from reportlab import Version as REPORTLAB_VERSION
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.pdfbase.ttfonts import TTFont, TTFontMaker
+
+logger = logging.getLogger(__name__)
+
+
+def _reportlab_internals_supported() -> bool:
+    """
+    体积优化依赖 ReportLab 的内部接口：TTFont.State(asciiReadable, ttf)，以及在写出时检查的
+    Canvas 逐页内容流 _code 和 PDFDocument.idToObject。pyproject 限定了 ReportLab 的主版本；
+    接口变化时 optimize=size 退回默认输出（PDF 仍然正确，只是不再减小体积），不会生成损坏的文件
+    """
+    try:
+        parameters = inspect.signature(TTFont.State.__init__).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return "asciiReadable" in parameters and "ttf" in parameters
+
+
+# 当前 ReportLab 是否提供上述接口
+REPORTLAB_INTERNALS_SUPPORTED = _reportlab_internals_supported()
+if not REPORTLAB_INTERNALS_SUPPORTED:
+    logger.warning(f"ReportLab {REPORTLAB_VERSION} 的内部接口与体积优化不兼容，optimize=size 将输出默认PDF")
+
+# 嵌入字体子集中去掉的表
+STRIP_FONT_TABLES = frozenset(["name"])
+
+# 内容流中的字符串（跳过其中的数字）或至少三位小数的数字
+_OPERAND = re.compile(r"\((?:[^()\\]|\\.)*\)|(?<![\w.])(-?\d*\.\d{3,})", re.S)
+
+# 单线段描边路径，ReportLab 绘制表格网格和边框时每条线输出一行
+_STROKE_LINE = re.compile(r"n (\S+ \S+ m \S+ \S+ l) S")
+
+
+def _round_number(match) -> str:
+    number = match.group(1)
+    if number is None:
+        return match.group(0)
+    value = float(number)
+    text = ("%.2f" if abs(value) >= 1 else "%.3f") % value
+    text = text.rstrip("0").rstrip(".")
+    if text in ("", "-", "-0"):
+        return "0"
+    if text.startswith("0."):
+        text = text[1:]
+    elif text.startswith("-0."):
+        text = "-" + text[2:]
+    return text
+
+
+def round_operands(content: str) -> str:
+    """内容流中的数字保留两位小数（小于 1 的保留三位），文本字符串原样保留"""
+    return _OPERAND.sub(_round_number, content)
+
+
+def merge_strokes(content: str) -> str:
+    """把连续的单线段描边路径合并为一条路径，去掉其中完全相同的线段"""
+    lines = content.split("\n")
+    merged = []
+    run = []
+    for line in lines:
+        match = _STROKE_LINE.fullmatch(line)
+        if match is not None:
+            run.append(match.group(1))
+            continue
+        if run:
+            merged.append("n " + " ".join(dict.fromkeys(run)) + " S")
+            run = []
+        merged.append(line)
+    if run:
+        merged.append("n " + " ".join(dict.fromkeys(run)) + " S")
+    return "\n".join(merged)
+
+
+def optimize_content(content: str) -> str:
+    return merge_strokes(round_operands(content))
+
+
+def strip_font_tables(font_file: bytes, tags=STRIP_FONT_TABLES) -> bytes:
+    """从 TrueType 字体文件中去掉指定的表，重新生成表目录和校验和"""
+    num_tables = struct.unpack(">H", font_file[4:6])[0]
+    maker = TTFontMaker()
+    found = False
+    for index in range(num_tables):
+        entry = font_file[12 + 16 * index:28 + 16 * index]
+        tag, _, offset, length = struct.unpack(">4sLLL", entry)
+        tag = tag.decode("latin-1")
+        if tag in tags:
+            found = True
+            continue
+        data = font_file[offset:offset + length]
+        if tag == "head":
+            # checkSumAdjustment 由 makeStream 重新计算
+            data = data[:8] + b"\0\0\0\0" + data[12:]
+        maker.add(tag, data)
+    return maker.makeStream() if found else font_file
+
+
+class CompactCanvas(Canvas):
+    """
+    体积优化输出使用的 Canvas：每页的内容流在写入文档前压缩数字并合并网格线，
+    并标记文档，嵌入字体时去掉子集中的 name 表（见 fonts.SubsetTTFont）
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs["pageCompression"] = 1
+        Canvas.__init__(self, *args, **kwargs)
+        if REPORTLAB_INTERNALS_SUPPORTED:
+            self._doc.mdt2pdf_strip_font_tables = STRIP_FONT_TABLES
+            self._doc.mdt2pdf_stripped = set()
+
+    def showPage(self):
+        if REPORTLAB_INTERNALS_SUPPORTED and isinstance(getattr(self, "_code", None), list):
+            self._code[:] = [optimize_content("\n".join(self._code))]
+        Canvas.showPage(self)
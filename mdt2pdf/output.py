@@ -0,0 +1,57 @@
+"""
+PDF 输出：直接接收 ReportLab 写出的字节，超过阈值时落盘为临时文件
+"""
+import os
+import tempfile
+
+
+class PdfSink:
+    """
+    ReportLab 在 canvas.save() 时一次性 write 整个 PDF，
+    这里只保存对该 bytes 对象的引用，不再复制到 BytesIO
+    """
+
+    name = "table.pdf"
+
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data = self.data + data if self.data else data
+        return len(data)
+
+
+class SpooledPdf:
+    """渲染进程写到磁盘的大 PDF，只在进程间传递文件路径"""
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def __getstate__(self):
+        return (self.path, self.size)
+
+    def __setstate__(self, state):
+        self.path, self.size = state
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def spool_if_large(data: bytes, threshold: int, directory=None):
+    """小于阈值时原样返回字节，否则写入临时文件并返回 SpooledPdf"""
+    if threshold <= 0 or len(data) < threshold:
+        return data
+    fd, path = tempfile.mkstemp(prefix="mdt2pdf-", suffix=".pdf", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return SpooledPdf(path, len(data))
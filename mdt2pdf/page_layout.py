@@ -0,0 +1,155 @@
+"""
+自动版面（layout=auto）：只测量一次单元格，在多个候选版面中按代价函数选出最好的一个
+
+候选版面由纸张（A4 / Letter / A3）、方向、页边距和排版方式组合而成：
+- 整页排版（fit）：二分查找能放进一页的最大字号，放不下时在最小字号下跨页
+- 分页排版（paginated）：使用标准字号，按页切分并重复表头
+
+每个候选都只用同一份测量结果（layout.TableMeasurement）求解列宽、字号和表高，不生成PDF。
+代价由页数、字号（低于易读字号时代价迅速增加）、页面空白比例和对纸张、页边距、方向的偏好组成，
+取代价最小的候选。页面方向由搜索决定，请求中指定了方向时只在该方向的候选中选择。
+"""
+import os
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from reportlab.lib.pagesizes import A3, A4, LETTER, landscape
+from reportlab.lib.units import cm
+
+from .layout import (
+    PARAGRAPH_INDENT, TableMeasurement, allocate_widths, base_font_size, cell_padding, solve_table_layout, table_height,
+)
+
+# 纸张及其每页的代价：按纸张面积计，A3 一页相当于两页 A4；Letter 与 A4 尺寸相近，略贵一点使同等条件下选 A4
+PAGE_SIZES = {"A4": (A4, 1.0), "LETTER": (LETTER, 1.05), "A3": (A3, 2.0)}
+
+# 页边距 (左右, 上下) 及其偏好代价；normal 与 fit / paginated 布局的页边距相同
+MARGINS = {"normal": ((1.0 * cm, 1.2 * cm), 0.0), "narrow": ((0.6 * cm, 0.8 * cm), 0.15)}
+
+# SimpleDocTemplate 的默认 Frame 上下各有 6pt 内边距，单表格PDF的可用高度要扣除
+FRAME_PADDING = 6
+
+# 横版的偏好代价：其他条件相同时使用竖版
+LANDSCAPE_COST = 0.1
+# 低于易读字号时每 pt、每页的代价：小字号要在每一页上阅读，页数越多代价越大
+READABLE_FONT_SIZE = 8
+SMALL_FONT_COST = 1.5
+# 低于标准字号（见 layout.base_font_size）时每 pt、每页的代价
+FONT_COST = 0.2
+# 页面空白比例（0~1）的代价
+WASTE_COST = 1.0
+
+
+@dataclass
+class PageLayout:
+    """一个候选版面及其求解结果"""
+
+    paper: str
+    orientation: str
+    margin_name: str
+    pagesize: Tuple[float, float]
+    margins: Tuple[float, float]  # (左右, 上下)
+    layout: str  # fit / paginated
+    font_size: float
+    col_widths: List[float]
+    row_height: float
+    scale_factor: float
+    pages: int
+    cost: float = 0.0
+
+    @property
+    def available_width(self) -> float:
+        return self.pagesize[0] - 2 * self.margins[0]
+
+    @property
+    def available_height(self) -> float:
+        return self.pagesize[1] - 2 * self.margins[1]
+
+    def describe(self) -> str:
+        return (
+            f"{self.paper} {self.orientation} {self.margin_name} {self.layout}, "
+            f"字号 {self.font_size}, {self.pages} 页, 代价 {self.cost:.2f}"
+        )
+
+
+def page_sizes_from_env() -> List[str]:
+    """MDT2PDF_AUTO_PAGE_SIZES：参与自动版面的纸张，逗号分隔 (默认: A4,LETTER,A3)"""
+    names = [name.strip().upper() for name in os.getenv("MDT2PDF_AUTO_PAGE_SIZES", "A4,LETTER,A3").split(",")]
+    return [name for name in names if name in PAGE_SIZES] or ["A4"]
+
+
+def _cost(candidate: PageLayout, table_area: float, base_size: float, page_cost: float, preference: float) -> float:
+    page_area = candidate.available_width * candidate.available_height
+    waste = max(0.0, 1 - table_area / (page_area * candidate.pages)) if page_area > 0 else 1.0
+    font_cost = (
+        SMALL_FONT_COST * max(0.0, READABLE_FONT_SIZE - candidate.font_size)
+        + FONT_COST * max(0.0, base_size - candidate.font_size)
+    )
+    return (page_cost + font_cost) * candidate.pages + WASTE_COST * waste + preference
+
+
+def search_page_layouts(
+    measurement: TableMeasurement,
+    orientation: str = "auto",
+    page_sizes: Optional[List[str]] = None,
+    reserved_height: float = 0.0,
+    total_rows: Optional[int] = None,
+) -> List[PageLayout]:
+    """
+    评估全部候选版面，按代价从小到大返回。
+    measurement 可以只包含抽样行（total_rows 为实际行数），表高按行数比例放大；
+    reserved_height 为页面上表格以外占用的高度（表格标题、Frame 内边距）
+    """
+    orientations = ["portrait", "landscape"] if orientation not in ("portrait", "landscape") else [orientation]
+    base_size = base_font_size(measurement)
+    row_scale = total_rows / measurement.num_rows if total_rows and measurement.num_rows else 1.0
+    candidates = []
+    for paper in page_sizes or page_sizes_from_env():
+        size, page_cost = PAGE_SIZES[paper]
+        for page_orientation in orientations:
+            pagesize = landscape(size) if page_orientation == "landscape" else size
+            for margin_name, (margins, margin_cost) in MARGINS.items():
+                available_width = pagesize[0] - 2 * margins[0]
+                available_height = pagesize[1] - 2 * margins[1] - reserved_height
+                preference = margin_cost + (LANDSCAPE_COST if page_orientation == "landscape" else 0)
+
+                # 整页排版：按抽样放大后的表高求解字号
+                col_widths, row_height, scale_factor, font_size = solve_table_layout(
+                    measurement, available_width, available_height / row_scale, base_size
+                )
+                height = row_height * measurement.num_rows * row_scale
+                fit = PageLayout(
+                    paper, page_orientation, margin_name, pagesize, margins, "fit", font_size,
+                    col_widths, row_height, scale_factor, max(1, math.ceil(height / available_height - 1e-9)),
+                )
+                candidates.append((fit, sum(col_widths) * height, page_cost, preference))
+
+                # 分页排版：标准字号，每页重复表头
+                if font_size < base_size:
+                    padding = cell_padding(base_size)
+                    widths = allocate_widths(measurement.natural_widths(base_size), padding, available_width)
+                    height = table_height(measurement, widths, base_size) * row_scale
+                    per_row = height / (measurement.num_rows * row_scale)
+                    pages = max(1, math.ceil((height - per_row) / max(per_row, available_height - per_row)))
+                    natural = sum(w + 2 * padding + PARAGRAPH_INDENT for w in measurement.natural_widths(base_size))
+                    paginated = PageLayout(
+                        paper, page_orientation, margin_name, pagesize, margins, "paginated", base_size,
+                        widths, per_row, available_width / natural if natural else 1.0, pages,
+                    )
+                    candidates.append((paginated, sum(widths) * height, page_cost, preference))
+
+    for candidate, table_area, page_cost, preference in candidates:
+        candidate.cost = _cost(candidate, table_area, base_size, page_cost, preference)
+    return sorted((candidate for candidate, _, _, _ in candidates), key=lambda c: c.cost)
+
+
+def choose_page_layout(
+    measurement: TableMeasurement,
+    orientation: str = "auto",
+    page_sizes: Optional[List[str]] = None,
+    reserved_height: float = 0.0,
+    total_rows: Optional[int] = None,
+) -> PageLayout:
+    """代价最小的候选版面"""
+    return search_page_layouts(measurement, orientation, page_sizes, reserved_height, total_rows)[0]
@@ -0,0 +1,108 @@
+"""
+HTML 预览：用与 PDF 相同的布局结果（页面方向、列宽、字号）生成轻量 HTML 页面
+
+预览不经过 ReportLab 排版，只生成按 pt 定位的页面和表格，浏览器按页面宽度缩放显示。
+每个表格最多显示前若干行，其余行只给出数量提示。
+"""
+import html
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .layout import LEADING_RATIO, cell_padding
+
+
+@dataclass
+class PreviewPage:
+    """一个表格的预览参数，与 create_pdf / create_document_pdf 的布局结果一致"""
+
+    header: List[str]
+    rows: List[List[str]]
+    total_rows: int
+    orientation: str
+    page_width: float
+    page_height: float
+    margins: tuple  # (左, 右, 上, 下)
+    col_widths: List[float]
+    font_size: float
+    layout: str = "fit"
+    caption: Optional[str] = None
+    notes: List[str] = field(default_factory=list)
+    alignments: List[str] = field(default_factory=list)  # 各列对齐方式，未给出的列居中
+
+
+_STYLE = """
+body { margin: 0; padding: 12px; background: #e9ecef; font-family: sans-serif; }
+.page { background: white; margin: 0 auto 12px; box-shadow: 0 1px 4px rgba(0,0,0,.25);
+        box-sizing: border-box; display: flex; flex-direction: column; overflow: hidden; }
+.page.fit { justify-content: center; }
+.caption { font-weight: bold; font-size: 12pt; line-height: 16pt; text-align: center; margin-bottom: 0.3cm; }
+table { border-collapse: collapse; table-layout: fixed; margin: 0 auto; }
+th, td { border: 0.5pt solid black; text-align: center; vertical-align: middle;
+         word-break: break-all; overflow-wrap: anywhere; }
+th { background: lightgrey; border-bottom-width: 1pt; }
+.more { text-align: center; color: #6c757d; font-size: 9pt; padding: 6pt; }
+.meta { text-align: center; color: #6c757d; font-size: 11px; margin-bottom: 8px; }
+"""
+
+# 按页面宽度缩放，保证整页在预览框内可见
+_SCRIPT = """
+function fit() {
+  var page = document.querySelector('.page');
+  if (!page) return;
+  var zoom = Math.min(1, (window.innerWidth - 24) / page.offsetWidth);
+  document.body.style.zoom = zoom;
+}
+window.addEventListener('resize', fit);
+fit();
+"""
+
+
+def _row_html(cells, tag):
+    return "<tr>" + "".join(f"<{tag}>{html.escape(str(cell))}</{tag}>" for cell in cells) + "</tr>"
+
+
+def render_page(page: PreviewPage, index: int = 0) -> str:
+    """一个表格的预览页：页面尺寸和边距按 pt 设置，列宽和字号取自布局结果"""
+    left, right, top, bottom = page.margins
+    padding = cell_padding(page.font_size)
+    cell_style = (
+        f"font-size: {page.font_size}pt; line-height: {page.font_size * LEADING_RATIO:.2f}pt; "
+        f"padding: {padding}pt {padding + 2}pt;"
+    )
+    column_styles = "".join(
+        f".t{index} tr > :nth-child({col_idx + 1}) {{ text-align: {alignment}; }}"
+        for col_idx, alignment in enumerate(page.alignments)
+        if alignment != "center"
+    )
+    parts = [
+        f"<style>.t{index} th, .t{index} td {{ {cell_style} }}{column_styles}</style>",
+        f'<div class="meta">{"横版" if page.orientation == "landscape" else "竖版"} · '
+        f'字号 {page.font_size}pt · {page.total_rows} 行'
+        + "".join(f" · {html.escape(note)}" for note in page.notes)
+        + "</div>",
+        f'<div class="page {page.layout}" style="width:{page.page_width:.1f}pt;'
+        f'min-height:{page.page_height:.1f}pt;padding:{top:.1f}pt {right:.1f}pt {bottom:.1f}pt {left:.1f}pt">',
+    ]
+    if page.caption:
+        parts.append(f'<div class="caption">{html.escape(page.caption)}</div>')
+    parts.append(f'<table class="t{index}" style="width:{sum(page.col_widths):.1f}pt">')
+    parts.append(
+        "<colgroup>" + "".join(f'<col style="width:{w:.1f}pt">' for w in page.col_widths) + "</colgroup>"
+    )
+    parts.append("<thead>" + _row_html(page.header, "th") + "</thead><tbody>")
+    parts.extend(_row_html(row, "td") for row in page.rows)
+    parts.append("</tbody></table>")
+    hidden = page.total_rows - len(page.rows)
+    if hidden > 0:
+        parts.append(f'<div class="more">还有 {hidden} 行未在预览中显示，下载PDF查看完整内容</div>')
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def render_preview_html(pages: List[PreviewPage]) -> str:
+    """生成完整的预览 HTML 文档"""
+    body = "".join(render_page(page, index) for index, page in enumerate(pages))
+    return (
+        '<!DOCTYPE html><html lang="zh-CN"><head><meta charset="UTF-8">'
+        f"<style>{_STYLE}</style></head><body>{body}<script>{_SCRIPT}</script></body></html>"
+    )
@@ -0,0 +1,237 @@
+"""
+多进程共享的结果缓存：一个内存映射文件，同一台机器上的全部服务进程共用一份缓存内容
+
+uvicorn 以多个工作进程运行时，各进程的内存缓存各存一份相同的PDF，进程数越多占用越大。
+共享缓存放在 tmpfs（例如 /dev/shm）上的一个定长文件中，各进程映射同一个文件，
+物理内存只占一份，总大小固定，不随进程数增长。
+
+文件布局：
+- 文件头：魔数、数据区容量、索引组数和写入位置（单调递增的逻辑偏移）
+- 索引：组相联的哈希表，每组 8 个槽位，槽位保存键的 SHA-256、条目的逻辑偏移和长度
+- 数据区：环形缓冲，新条目写在写入位置之后，写满后从头覆盖最早写入的条目（按写入顺序淘汰）
+
+写入时持有文件锁（fcntl.flock）；读取不加锁：先更新写入位置再覆盖数据，读取方复制数据后
+检查条目是否仍在最近一圈写入的范围内，并核对条目头中的键，被覆盖或读到半更新的槽位都按未命中处理。
+"""
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MDT2SHC1"
+
+# 文件头：魔数、数据区容量、索引组数、每组槽位数、写入位置
+_HEADER = struct.Struct("<8sQII")
+_HEAD = struct.Struct("<Q")
+_HEAD_OFFSET = 64
+_HEADER_SIZE = 4096
+
+# 索引槽位：键的 SHA-256、逻辑偏移、长度
+_SLOT = struct.Struct("<32sQI4x")
+WAYS = 8
+
+# 数据区条目头：键的 SHA-256、长度
+_ENTRY = struct.Struct("<32sQ")
+
+# 平均每个条目按这么多字节估算索引槽位数
+_SLOT_BYTES = 8 * 1024
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+class SharedCache:
+    """
+    映射到共享文件的字节缓存，接口与 RenderCache 的内存层相同（get/put/stats）。
+    同一个文件可以被任意多个进程同时打开；文件由第一个打开的进程初始化，
+    容量或格式与已有文件不一致时抛出 OSError（from_env 中记录警告并不使用共享缓存）
+    """
+
+    def __init__(self, path: str, max_bytes: int = 128 * 1024 * 1024):
+        if fcntl is None:
+            raise OSError("共享缓存需要 fcntl（当前平台不支持）")
+        self.path = path
+        self.capacity = max_bytes
+        self.num_sets = max(64, max_bytes // _SLOT_BYTES // WAYS)
+        self._index_offset = _HEADER_SIZE
+        self._index_end = _HEADER_SIZE + self.num_sets * WAYS * _SLOT.size
+        self._data_offset = self._index_end + -self._index_end % mmap.PAGESIZE
+        size = self._data_offset + self.capacity
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(self._fd, _HEADER.size, 0)
+                expected = _HEADER.pack(MAGIC, self.capacity, self.num_sets, WAYS)
+                if header.startswith(MAGIC[:-1]):
+                    # 已初始化的文件可能正被其他进程映射，改变大小会让它们访问映射时收到 SIGBUS，
+                    # 因此格式或容量不一致时不使用这个文件，而不是原地重建
+                    if header != expected or os.fstat(self._fd).st_size != size:
+                        raise OSError(
+                            f"共享缓存文件的格式或容量与当前配置（{self.capacity} 字节）不一致，"
+                            f"请删除该文件或使用其他路径"
+                        )
+                else:
+                    # 新文件（或初始化中途退出、没有写入文件头的文件）：没有进程映射，可以设置大小后写入文件头
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    if hasattr(os, "posix_fallocate"):
+                        # 预先分配空间：tmpfs 容量不足时在这里报错，而不是之后写入映射时进程收到 SIGBUS
+                        os.posix_fallocate(self._fd, 0, size)
+                    os.pwrite(self._fd, expected, 0)
+                    logger.info(f"共享缓存已初始化: {path}, {self.capacity} 字节")
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._mm = mmap.mmap(self._fd, size, mmap.MAP_SHARED)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._pid = os.getpid()
+
+    def _lock_fd(self) -> int:
+        """
+        写锁使用的文件描述符。flock 锁属于打开的文件，fork 出的子进程继承的描述符与父进程共用同一把锁，
+        互相不排斥，因此子进程第一次写入时重新打开文件
+        """
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR)
+            self._pid = os.getpid()
+        return self._fd
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedCache"]:
+        """MDT2PDF_SHARED_CACHE 指定共享文件路径（建议放在 /dev/shm），不设置或无法创建时返回 None"""
+        path = os.getenv("MDT2PDF_SHARED_CACHE")
+        if not path:
+            return None
+        max_bytes = int(os.getenv("MDT2PDF_SHARED_CACHE_BYTES", str(128 * 1024 * 1024)))
+        try:
+            return cls(path, max_bytes)
+        except OSError as e:
+            logger.warning(f"共享缓存不可用 {path}: {e}")
+            return None
+
+    def _head(self) -> int:
+        return _HEAD.unpack_from(self._mm, _HEAD_OFFSET)[0]
+
+    def _set_base(self, digest: bytes) -> int:
+        set_index = int.from_bytes(digest[:8], "little") % self.num_sets
+        return self._index_offset + set_index * WAYS * _SLOT.size
+
+    def _read_entry(self, digest: bytes, offset: int, length: int) -> Optional[bytes]:
+        """读取逻辑偏移处的条目，条目已被覆盖或与键不符时返回 None"""
+        if offset < self._head() - self.capacity:
+            return None
+        start = self._data_offset + offset % self.capacity
+        entry_digest, entry_length = _ENTRY.unpack_from(self._mm, start)
+        if entry_digest != digest or entry_length != length:
+            return None
+        data = self._mm[start + _ENTRY.size:start + _ENTRY.size + length]
+        # 复制期间写入位置推进了一圈以上时，复制到的内容可能已被新条目覆盖
+        if offset < self._head() - self.capacity:
+            return None
+        return data
+
+    def _lookup(self, digest: bytes) -> Optional[bytes]:
+        base = self._set_base(digest)
+        for way in range(WAYS):
+            slot_digest, offset, length = _SLOT.unpack_from(self._mm, base + way * _SLOT.size)
+            if slot_digest == digest and length:
+                return self._read_entry(digest, offset, length)
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._lookup(_digest(key))
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        """写入条目；超过容量四分之一的结果不放入共享缓存，避免一次冲掉大部分条目"""
+        total = _ENTRY.size + len(data)
+        total += -total % 8
+        if not data or total > self.capacity // 4:
+            return
+        digest = _digest(key)
+        with self._lock:
+            fd = self._lock_fd()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if self._lookup(digest) is not None:
+                    return
+                head = self._head()
+                offset = head
+                if offset % self.capacity + total > self.capacity:
+                    # 条目不跨越数据区末尾，剩余空间跳过
+                    offset += self.capacity - offset % self.capacity
+                # 先推进写入位置，读取方据此判断将被覆盖的条目已失效，再写入数据
+                _HEAD.pack_into(self._mm, _HEAD_OFFSET, offset + total)
+                start = self._data_offset + offset % self.capacity
+                _ENTRY.pack_into(self._mm, start, digest, len(data))
+                self._mm[start + _ENTRY.size:start + _ENTRY.size + len(data)] = data
+                self._store_slot(digest, offset, len(data), offset + total)
+                self.writes += 1
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _store_slot(self, digest: bytes, offset: int, length: int, head: int):
+        """选择组内的槽位：同一个键、空槽位或已被覆盖的条目，都没有时替换最早写入的条目"""
+        base = self._set_base(digest)
+        choice, oldest = None, None
+        for way in range(WAYS):
+            position = base + way * _SLOT.size
+            slot_digest, slot_offset, slot_length = _SLOT.unpack_from(self._mm, position)
+            if slot_digest == digest or not slot_length or slot_offset < head - self.capacity:
+                choice = position
+                break
+            if oldest is None or slot_offset < oldest[0]:
+                oldest = (slot_offset, position)
+        if choice is None:
+            choice = oldest[1]
+        _SLOT.pack_into(self._mm, choice, digest, offset, length)
+
+    def stats(self):
+        """容量、当前有效条目数（扫描索引）和本进程的命中统计"""
+        head = self._head()
+        entries = used = 0
+        for _, offset, length in _SLOT.iter_unpack(self._mm[self._index_offset:self._index_end]):
+            if length and offset >= head - self.capacity:
+                entries += 1
+                used += length
+        with self._lock:
+            return {
+                "path": self.path,
+                "max_bytes": self.capacity,
+                "entries": entries,
+                "bytes": used,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
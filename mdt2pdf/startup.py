@@ -0,0 +1,211 @@
+"""
+渲染进程的冷启动：预加载启动方式和启动耗时分析
+
+每个新渲染进程都要导入 ReportLab、解析器等模块并注册字体，第一次渲染还要填充 ReportLab 和本项目的各种缓存
+（字宽、样式池、布局求解），新进程处理前几个请求时明显变慢。
+MDT2PDF_RENDER_START_METHOD=preload 时，渲染进程由 forkserver 创建：forkserver 启动时导入 mdt2pdf.warmup，
+完成全部导入、字体注册和一次预热渲染，之后每个渲染进程都从这个已预热的进程 fork 出来，
+不再重复这些工作（写时复制，未修改的内存页也由各进程共用）。
+
+python main.py --startup-profile 输出启动耗时分析：各模块的导入耗时、服务进程内各初始化步骤的耗时，
+以及不同启动方式下渲染进程从启动到完成第一次渲染的耗时。
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import subprocess
+import multiprocessing
+from typing import Dict, List, Optional
+
+PRELOAD = "preload"
+
+# forkserver 预加载的模块：导入时完成预热（见 warmup.py）
+PRELOAD_MODULES = ["mdt2pdf.warmup"]
+
+# 预热渲染使用的表格：中英文、数字列、需要换行的长文本，覆盖字符串单元格、CellText 和 Paragraph 三种单元格
+WARMUP_MARKDOWN = """| 项目 | 负责人 | 金额 | 日期 | 说明 |
+|:---|---|---:|---|---|
+| 预热 | 张三 | 1,200.50 | 2024-01-01 | 渲染进程启动时生成的表格，用于填充字宽和样式缓存，mixed text with ASCII |
+| warm-up | 李四 | 36 | 2024-02-15 | 短文本 |
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def mp_context(start_method: str):
+    """
+    渲染进程池使用的 multiprocessing 上下文。preload 为预加载了 PRELOAD_MODULES 的 forkserver；
+    同一进程中的 forkserver 只有一个，第一次创建渲染进程时启动
+    """
+    if start_method == PRELOAD:
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(PRELOAD_MODULES)
+        return ctx
+    return multiprocessing.get_context(start_method)
+
+
+def warm_up() -> Dict[str, float]:
+    """导入渲染模块、注册字体并各渲染一次 fit / paginated / optimize=size 的PDF，返回各步骤耗时（秒）"""
+    timings = {}
+    started = time.perf_counter()
+    from . import converter
+
+    timings["import"] = time.perf_counter() - started
+    step = time.perf_counter()
+    converter.register_chinese_fonts()
+    timings["fonts"] = time.perf_counter() - step
+    step = time.perf_counter()
+    table_data = converter.parse_markdown_table(WARMUP_MARKDOWN)
+    converter.create_pdf(table_data, "portrait")
+    converter.create_pdf(table_data, "landscape", "paginated", "size")
+    timings["render"] = time.perf_counter() - step
+    return timings
+
+
+def _render_job():
+    """启动耗时分析中渲染进程执行的任务：与服务处理一个小表格请求相同"""
+    from . import converter
+
+    return converter.render_table_to_pdf(converter.parse_markdown_table(WARMUP_MARKDOWN), "portrait")
+
+
+async def _measure_workers(start_method: str, workers: int) -> Dict[str, float]:
+    from .converter import init_render_worker
+    from .executor import RenderExecutor
+
+    executor = RenderExecutor(workers=workers, initializer=init_render_worker, start_method=start_method)
+    started = time.perf_counter()
+    executor.start()
+    try:
+        # 每个渲染进程各完成一次渲染的耗时，即新进程全部可用的时间
+        await asyncio.gather(*(executor.submit(_render_job) for _ in range(workers)))
+        ready = time.perf_counter() - started
+        step = time.perf_counter()
+        await executor.submit(_render_job)
+        warm = time.perf_counter() - step
+    finally:
+        executor.shutdown()
+
+    # 再创建一个渲染进程（扩容或替换超时进程），forkserver 此时已经启动
+    replacement = RenderExecutor(workers=1, initializer=init_render_worker, start_method=start_method)
+    step = time.perf_counter()
+    replacement.start()
+    try:
+        await replacement.submit(_render_job)
+        extra = time.perf_counter() - step
+    finally:
+        replacement.shutdown()
+    return {"ready": ready, "warm_render": warm, "new_worker_first_render": extra}
+
+
+def measure_worker_startup(start_method: str, workers: int) -> Dict[str, float]:
+    """在一个新的 Python 进程中测量某种启动方式（forkserver 是进程级的，各方式必须分开测量）"""
+    output = subprocess.run(
+        [sys.executable, "-m", "mdt2pdf.startup", "--measure-workers", start_method, str(workers)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_times(module: str = "main") -> List[dict]:
+    """
+    用 python -X importtime 在新进程中导入 module，返回每个模块的自身和累计导入耗时（秒），按累计耗时降序排列
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self": int(self_us) / 1e6,
+            "cumulative": int(cumulative_us) / 1e6,
+        })
+    return sorted(modules, key=lambda m: m["cumulative"], reverse=True)
+
+
+def _package_totals(modules: List[dict]) -> List[tuple]:
+    """按顶层包汇总自身导入耗时"""
+    totals: Dict[str, float] = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        totals[package] = totals.get(package, 0.0) + module["self"]
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def startup_profile(workers: int = 2, start_methods=("spawn", "forkserver", PRELOAD)) -> dict:
+    """启动耗时分析：导入耗时、服务进程内的初始化步骤和各启动方式下渲染进程的就绪耗时"""
+    modules = import_times("main")
+    total = max((m["cumulative"] for m in modules if m["module"] == "main"), default=0.0)
+    # 本进程的初始化步骤：main 已经导入，这里的导入只是查表
+    init = warm_up()
+    from . import converter
+
+    step = time.perf_counter()
+    converter.create_pdf(converter.parse_markdown_table(WARMUP_MARKDOWN), "portrait")
+    init["render_again"] = time.perf_counter() - step
+    return {
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "import_main": total,
+        "packages": [{"package": name, "self": seconds} for name, seconds in _package_totals(modules)],
+        "modules": modules,
+        "init": init,
+        "workers": {method: measure_worker_startup(method, workers) for method in start_methods},
+        "worker_count": workers,
+    }
+
+
+def print_startup_profile(profile: dict, top: int = 15):
+    ms = 1000
+    print(f"导入 main 共 {profile['import_main'] * ms:.0f}ms（python -X importtime，新进程）\n")
+    print(f"{'顶层包':<28} {'自身导入(ms)':>12}")
+    for item in profile["packages"][:top]:
+        print(f"{item['package']:<28} {item['self'] * ms:>12.1f}")
+    print(f"\n{'模块':<40} {'累计(ms)':>10} {'自身(ms)':>10}")
+    for module in profile["modules"][:top]:
+        print(f"{module['module']:<40} {module['cumulative'] * ms:>10.1f} {module['self'] * ms:>10.1f}")
+
+    init = profile["init"]
+    print("\n服务进程内的初始化步骤:")
+    print(f"  注册字体        {init['fonts'] * ms:>8.1f}ms")
+    print(f"  第一次渲染      {init['render'] * ms:>8.1f}ms（fit + paginated/size 各一次）")
+    print(f"  再次渲染        {init['render_again'] * ms:>8.1f}ms（fit，缓存已预热）")
+
+    print(f"\n渲染进程启动（{profile['worker_count']} 个进程，耗时从启动进程池开始计算）:")
+    print(f"{'启动方式':<12} {'全部就绪(ms)':>12} {'预热后渲染(ms)':>14} {'新增进程首次渲染(ms)':>20}")
+    for method, result in profile["workers"].items():
+        print(
+            f"{method:<12} {result['ready'] * ms:>12.0f} {result['warm_render'] * ms:>14.1f} "
+            f"{result['new_worker_first_render'] * ms:>20.0f}"
+        )
+
+
+def run_startup_profile(json_path: Optional[str] = None, workers: int = 2) -> int:
+    """main.py --startup-profile 的入口"""
+    profile = startup_profile(workers)
+    print_startup_profile(profile)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=1)
+        print(f"\n结果已写入 {json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    # 由 measure_worker_startup 在新进程中调用：python -m mdt2pdf.startup --measure-workers <方式> <进程数>
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure-workers":
+        import logging
+
+        logging.disable(logging.INFO)
+        # 通过包名导入，渲染任务按 mdt2pdf.startup._render_job 传给渲染进程，而不是 __main__ 中的同名函数
+        from mdt2pdf import startup
+
+        print(json.dumps(asyncio.run(startup._measure_workers(sys.argv[2], int(sys.argv[3])))))
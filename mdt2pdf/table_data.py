@@ -0,0 +1,284 @@
+"""
+按列存储的表格数据
+
+解析器直接产出 TableData：每列一个字符串列表（第 0 行为表头），同一列中重复出现的单元格文本
+只保留一个字符串对象（状态列、日期列等大量重复值只占一份内存，pickle 传给渲染进程时也只序列化一次；
+重复很少的列不做去重，省去去重字典的开销）。同时按列保存每个单元格的字符数（array），
+是否含中日韩文字（bytearray）在第一次读取时按列计算，方向判断和布局测量不必再逐个单元格做 str()
+转换和字符串扫描。各行列数统一为最长一行的列数，不足的补空字符串。
+
+每列还带有 Markdown 对齐行给出的对齐方式，以及第一次读取时按抽样判断的列类型
+（数值、日期、短文本、长文本）：未指定对齐方式的数值列右对齐，只有长文本列需要按单元格换行。
+"""
+import re
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# 中日韩文字：部首与汉字、假名、谚文、兼容汉字、全角符号
+_CJK = re.compile(r"[\u2e80-\u9fff\ua960-\ua97f\uac00-\ud7ff\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef]")
+
+# 追加的行先暂存，每累计这么多行按列批量转换一次（去重、长度和文字检测都在 C 层完成），
+# 暂存的行对象占用的内存有上限
+_FLUSH_ROWS = 256
+
+# 一列累计的不同取值超过行数的这个比例时，认为该列基本不重复，之后不再去重
+_DEDUPE_MAX_RATIO = 0.5
+
+# 列类型
+NUMERIC = "numeric"
+DATE = "date"
+SHORT = "short"
+LONG = "long"
+
+# 判断列类型时每列最多检查的数据行数（均匀抽样）
+KIND_SAMPLE_ROWS = 200
+# 短文本列：最长单元格不超过这么多个半角字符宽（含中日韩文字的列按每字两个半角计）
+SHORT_MAX_CHARS = 24
+
+# 数值：可带正负号、货币符号、千分位、小数、百分号或中文单位，会计格式的括号表示负数
+_NUMBER = re.compile(
+    r"[(（]?[-+−]?[¥￥$€£]?\s?[-+−]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?"
+    r"(?:[eE][-+]?\d+)?\s?(?:%|‰|[万亿]?元?|[kKmMbB])?[)）]?"
+)
+# 日期与时间：2024-01-31、2024/1/31、2024年1月31日、2024-01、12:30:00 等，日期后可带时间
+_DATE = re.compile(
+    r"(?:\d{4}[-/.年]\d{1,2}(?:[-/.月]\d{1,2}日?|月)?(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?"
+    r"|\d{1,2}:\d{2}(?::\d{2})?)"
+)
+# 数值列和日期列中表示缺失的占位符
+_PLACEHOLDERS = frozenset(["-", "--", "—", "–", "/", "N/A", "n/a", "NA", "null"])
+
+
+class TableData:
+    """
+    按列存储的表格，第 0 行为表头。按行读取时每行是字符串元组：
+    len(table)、table[i]、table[a:b]（行元组列表）和 for row in table 与原来的 list[list[str]] 用法一致
+    """
+
+    __slots__ = ("num_cols", "alignments", "_columns", "_lengths", "_cjk", "_kinds", "_size", "_pending", "_pools")
+
+    def __init__(self, num_cols: int = 0, alignments: Optional[Sequence[Optional[str]]] = None):
+        self.num_cols = num_cols
+        # 各列的对齐方式（left/center/right），None 表示对齐行中未指定
+        self.alignments: List[Optional[str]] = list(alignments) if alignments else [None] * num_cols
+        self._kinds: Optional[List[str]] = None
+        self._columns: List[List[str]] = [[] for _ in range(num_cols)]
+        self._lengths: List[array] = [array("I") for _ in range(num_cols)]
+        self._cjk: Optional[List[bytearray]] = None
+        self._size = 0
+        self._pending: List[Sequence[str]] = []
+        # 各列的去重字典，None 表示该列不去重
+        self._pools: List[Optional[dict]] = [{} for _ in range(num_cols)]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence]) -> "TableData":
+        """由逐行数据创建（单元格按 str 转换），列数取最长一行"""
+        table = cls()
+        table.extend(rows)
+        table.finish()
+        return table
+
+    def append(self, row: Sequence[str]):
+        """追加一行；比当前列数长时为之前的行补空列，短时补空字符串"""
+        if len(row) != self.num_cols:
+            if len(row) > self.num_cols:
+                self._widen(len(row))
+            else:
+                row = list(row) + [""] * (self.num_cols - len(row))
+        self._pending.append(row)
+        if len(self._pending) >= _FLUSH_ROWS:
+            self._flush()
+
+    def extend(self, rows: Iterable[Sequence[str]]):
+        pending = self._pending
+        for row in rows:
+            if len(row) != self.num_cols or len(pending) >= _FLUSH_ROWS:
+                self.append(row)
+                pending = self._pending
+            else:
+                pending.append(row)
+
+    def finish(self):
+        """追加结束：转换暂存的行，并释放去重用的字典（已去重的字符串继续共享）"""
+        self._flush()
+        self._pools = [None] * self.num_cols
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        size = self._size + len(pending)
+        for col_idx, values in enumerate(zip(*pending)):
+            values = list(map(str, values))
+            pool = self._pools[col_idx]
+            if pool is not None:
+                values = list(map(pool.setdefault, values, values))
+                if len(pool) > size * _DEDUPE_MAX_RATIO:
+                    self._pools[col_idx] = None
+            self._columns[col_idx].extend(values)
+            self._lengths[col_idx].extend(map(len, values))
+        self._size = size
+        self._cjk = None
+        self._kinds = None
+
+    def _widen(self, num_cols: int):
+        self._flush()
+        extra = num_cols - self.num_cols
+        self._columns.extend([""] * self._size for _ in range(extra))
+        self._lengths.extend(array("I", bytes(4 * self._size)) for _ in range(extra))
+        self._pools.extend({} for _ in range(extra))
+        self.alignments.extend([None] * (num_cols - len(self.alignments)))
+        self._cjk = None
+        self._kinds = None
+        self.num_cols = num_cols
+
+    @property
+    def columns(self) -> List[List[str]]:
+        """各列的单元格文本（含表头）"""
+        self._flush()
+        return self._columns
+
+    @property
+    def lengths(self) -> List[array]:
+        """各列每个单元格的字符数"""
+        self._flush()
+        return self._lengths
+
+    @property
+    def cjk(self) -> List[bytearray]:
+        """各列每个单元格是否含中日韩文字（1/0），第一次读取时计算"""
+        self._flush()
+        if self._cjk is None:
+            self._cjk = [
+                bytearray(not text.isascii() and _CJK.search(text) is not None for text in column)
+                for column in self._columns
+            ]
+        return self._cjk
+
+    @property
+    def kinds(self) -> List[str]:
+        """各列的类型（NUMERIC / DATE / SHORT / LONG），第一次读取时按抽样判断"""
+        self._flush()
+        if self._kinds is None:
+            self._kinds = [
+                self._column_kind(index) for index in range(self.num_cols)
+            ]
+        return self._kinds
+
+    def _column_kind(self, index: int) -> str:
+        """
+        按数据行判断列类型（表头不参与）：抽样的非空单元格全部是数值（或缺失占位符）时为数值列，
+        全部是日期时为日期列；否则按整列最长单元格的字符数区分短文本和长文本
+        """
+        column = self._columns[index]
+        body = len(column) - 1
+        if body > KIND_SAMPLE_ROWS:
+            step = body / KIND_SAMPLE_ROWS
+            sample = [column[1 + int(i * step)] for i in range(KIND_SAMPLE_ROWS)]
+        else:
+            sample = column[1:]
+        values = [text for text in sample if text and text not in _PLACEHOLDERS]
+        if values:
+            if all(map(_NUMBER.fullmatch, values)):
+                return NUMERIC
+            if all(map(_DATE.fullmatch, values)):
+                return DATE
+        longest = max(self.lengths[index][1:], default=0)
+        if longest > SHORT_MAX_CHARS:
+            return LONG
+        if longest * 2 > SHORT_MAX_CHARS and 1 in self.cjk[index][1:]:
+            return LONG
+        return SHORT
+
+    @property
+    def column_alignments(self) -> List[str]:
+        """各列实际使用的对齐方式：对齐行指定的优先，未指定时数值列右对齐，其余列居中"""
+        return [
+            alignment or ("right" if kind == NUMERIC else "center")
+            for alignment, kind in zip(self.alignments, self.kinds)
+        ]
+
+    @property
+    def header(self) -> Tuple[str, ...]:
+        return self.row(0) if len(self) else ()
+
+    @property
+    def total_chars(self) -> int:
+        """全部单元格的字符数之和"""
+        return sum(sum(lengths) for lengths in self.lengths)
+
+    def row(self, index: int) -> Tuple[str, ...]:
+        self._flush()
+        return tuple(column[index] for column in self._columns)
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[str, ...]]:
+        """按行遍历 [start, stop) 范围内的行"""
+        self._flush()
+        if not self._columns:
+            return iter([()] * len(range(self._size)[start:stop]))
+        return zip(*(column[start:stop] for column in self._columns))
+
+    def select(self, indices: Sequence[int]) -> "TableData":
+        """按行号抽取部分行组成新表格，单元格字符串与原表格共享，已判断的列类型一并带上"""
+        self._flush()
+        table = TableData(self.num_cols, self.alignments)
+        table._columns = [[column[i] for i in indices] for column in self._columns]
+        table._lengths = [array("I", [lengths[i] for i in indices]) for lengths in self._lengths]
+        if self._cjk is not None:
+            table._cjk = [bytearray([flags[i] for i in indices]) for flags in self._cjk]
+        if self._kinds is not None:
+            # 列类型沿用整个表格的判断结果，不按抽取的行重新判断
+            table._kinds = list(self._kinds)
+        table._size = len(indices)
+        table._pools = [None] * self.num_cols
+        return table
+
+    def __len__(self) -> int:
+        return self._size + len(self._pending)
+
+    def __iter__(self) -> Iterator[Tuple[str, ...]]:
+        return self.iter_rows()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(self.iter_rows(start, stop))
+            return [self.row(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("表格行号超出范围")
+        return self.row(index)
+
+    def __eq__(self, other) -> bool:
+        """与另一个 TableData 或行列表按单元格比较"""
+        if not isinstance(other, (TableData, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            tuple(a) == tuple(b) for a, b in zip(self, other)
+        )
+
+    # 与它取代的行列表一样可以追加修改、按内容比较，因此不可哈希（定义 __eq__ 后显式声明）
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"TableData(rows={len(self)}, cols={self.num_cols})"
+
+    def __getstate__(self):
+        self._flush()
+        return self.num_cols, self.alignments, self._columns, self._lengths, self._size
+
+    def __setstate__(self, state):
+        self.num_cols, self.alignments, self._columns, self._lengths, self._size = state
+        self._cjk = None
+        self._kinds = None
+        self._pending = []
+        self._pools = [None] * self.num_cols
+
+
+def as_table_data(data) -> TableData:
+    """把 list[list[str]] 等逐行数据转换为 TableData，已经是 TableData 时原样返回"""
+    if isinstance(data, TableData):
+        return data
+    return TableData.from_rows(data)
@@ -0,0 +1,387 @@
+"""
+单遍流式 GFM 表格解析器
+
+逐行读取输入（字符串、文件对象或异步字节流），识别“表头行 + 对齐行”开始的表格，
+边读边产出数据行，不再经过 markdown→HTML→BeautifulSoup 的往返转换。
+"""
+import re
+import codecs
+import html
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Iterator, List, Optional, Tuple
+
+from .table_data import TableData
+
+# 对齐行单元格：可选冒号 + 至少一个短横线 + 可选冒号
+_DELIMITER_CELL = re.compile(r"^\s*:?-+:?\s*$")
+# 与旧的手动解析器一致的分隔行判断
+_LOOSE_DELIMITER = re.compile(r"^\|[\s\-\|:]*\|?$")
+# 行内 Markdown 标记
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_STRONG = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EM_STAR = re.compile(r"\*(?=\S)(.+?)(?<=\S)\*")
+_EM_UNDERSCORE = re.compile(r"(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)")
+_HTML_TAG = re.compile(r"</?[A-Za-z][^>]*>")
+_ATX_HEADING = re.compile(r"^#{1,6}(\s|$)")
+_SPECIAL = re.compile(r"\\.|`+|\|")
+_INLINE_MARK = re.compile(r"[\\`*_\[<&!]")
+_ESCAPABLE = "\\`*_{}[]()#+-.!|"
+_PLACEHOLDER = "\x00{}\x00"
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+
+
+def parse_alignment(cell: str) -> Optional[str]:
+    """对齐行单元格转换为 left/center/right，未指定时返回 None"""
+    cell = cell.strip()
+    if cell.startswith(":") and cell.endswith(":"):
+        return "center"
+    if cell.endswith(":"):
+        return "right"
+    if cell.startswith(":"):
+        return "left"
+    return None
+
+
+def split_row(line: str) -> List[str]:
+    """
+    按未转义、且不在行内代码中的竖线拆分表格行。
+    返回原始单元格文本（保留反斜杠转义，交给 inline_text 处理）。
+    """
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not _is_escaped(line, len(line) - 1):
+        line = line[:-1]
+    if "\\" not in line and "`" not in line:
+        return line.split("|")
+
+    cells = []
+    cell_start = 0
+    code_fence = 0  # 当前行内代码的反引号长度，0 表示不在代码中
+    # 只在特殊字符处跳转：反斜杠转义、反引号串、竖线
+    for match in _SPECIAL.finditer(line):
+        token = match.group()
+        if token[0] == "\\":
+            continue
+        if token[0] == "`":
+            run = len(token)
+            if not code_fence:
+                # 只有存在匹配的结束反引号时才进入行内代码
+                if line.find(token, match.end()) != -1:
+                    code_fence = run
+            elif run == code_fence:
+                code_fence = 0
+            continue
+        if not code_fence:
+            cells.append(line[cell_start:match.start()])
+            cell_start = match.end()
+    cells.append(line[cell_start:])
+    return cells
+
+
+def _is_escaped(text: str, index: int) -> bool:
+    backslashes = 0
+    index -= 1
+    while index >= 0 and text[index] == "\\":
+        backslashes += 1
+        index -= 1
+    return backslashes % 2 == 1
+
+
+def inline_text(cell: str) -> str:
+    """去除单元格中的行内 Markdown 标记，得到纯文本"""
+    cell = cell.strip()
+    if not cell:
+        return ""
+    if not _INLINE_MARK.search(cell):
+        return cell
+
+    protected = []
+
+    def protect(text):
+        protected.append(text)
+        return _PLACEHOLDER.format(len(protected) - 1)
+
+    # 行内代码：内容原样保留
+    if "`" in cell:
+        cell = re.sub(
+            r"(`+)(.+?)\1",
+            lambda m: protect(m.group(2).strip()),
+            cell,
+        )
+    # 反斜杠转义
+    if "\\" in cell:
+        cell = re.sub(
+            r"\\(.)",
+            lambda m: protect(m.group(1)) if m.group(1) in _ESCAPABLE else m.group(0),
+            cell,
+        )
+    if "[" in cell:
+        cell = _IMAGE.sub(r"\1", cell)
+        cell = _LINK.sub(r"\1", cell)
+    if "*" in cell or "_" in cell:
+        cell = _STRONG.sub(r"\2", cell)
+        cell = _EM_STAR.sub(r"\1", cell)
+        cell = _EM_UNDERSCORE.sub(r"\1", cell)
+    if "<" in cell:
+        cell = _HTML_TAG.sub("", cell)
+    if "&" in cell:
+        cell = html.unescape(cell)
+    if protected:
+        cell = _PLACEHOLDER_RE.sub(lambda m: protected[int(m.group(1))], cell)
+    return cell.strip()
+
+
+@dataclass
+class MarkdownTable:
+    """
+    文档中的一个表格：按列存储的表格数据（第 0 行为表头，与 parse_markdown_table 的结果格式一致）、
+    各列对齐方式和标题（取自表格前最近的标题行）
+    """
+    data: TableData
+    alignments: List[Optional[str]] = field(default_factory=list)
+    caption: Optional[str] = None
+
+    @property
+    def header(self) -> Tuple[str, ...]:
+        return self.data.header
+
+
+def _loose_cells(line: str) -> List[str]:
+    """与 parse_markdown_table_manual 相同的宽松拆分，用于没有标准表格时的回退"""
+    if line.startswith("|") and line.endswith("|"):
+        return [cell.strip() for cell in line[1:-1].split("|")]
+    return [cell.strip() for cell in line.split("|")]
+
+
+class TableTokenizer:
+    """
+    推式（push）表格分词器：每次 feed 一行，返回这一行确认的完整数据行。
+
+    - 表头行只有在紧跟一行列数相同的对齐行时才确认为表格
+    - 数据行按表头列数补齐或截断
+    - 空行或标题行结束当前表格；表格前最近的标题行记为 table_caption
+    - lenient=True 时，在尚未发现标准表格前按旧手动解析器的规则暂存含竖线的行，
+      整个输入都没有标准表格时在 close() 中返回它们（单遍完成回退）
+    """
+
+    def __init__(self, lenient: bool = True):
+        self.lenient = lenient
+        self.tables_found = 0
+        self.alignments: List[Optional[str]] = []
+        self.in_table = False
+        self.table_caption: Optional[str] = None
+        self._heading: Optional[str] = None
+        self._pending_header: Optional[List[str]] = None
+        self._columns = 0
+        self._fallback_rows: Optional[List[List[str]]] = [] if lenient else None
+        self._fallback_columns = 0
+        # 第一个表格的对齐方式
+        self.first_alignments: List[Optional[str]] = []
+
+    def feed(self, line: str) -> List[List[str]]:
+        """处理一行输入，返回已确认的数据行"""
+        stripped = line.strip()
+        if self._fallback_rows is not None and stripped:
+            if not _LOOSE_DELIMITER.match(stripped) and "|" in stripped:
+                cells = _loose_cells(stripped)
+                self._fallback_rows.append(cells)
+                self._fallback_columns = max(self._fallback_columns, len(cells))
+
+        if not stripped:
+            self.in_table = False
+            self._pending_header = None
+            return []
+
+        if _ATX_HEADING.match(stripped):
+            # 标题行属于新的块级结构，结束当前表格，并作为下一个表格的标题
+            self.in_table = False
+            self._pending_header = None
+            self._heading = inline_text(stripped.lstrip("#").rstrip("#")) or None
+            return []
+
+        if self.in_table:
+            cells = split_row(stripped)
+            return [self._normalize(cells)]
+
+        if "|" not in stripped:
+            self._pending_header = None
+            return []
+
+        cells = split_row(stripped)
+        header = self._pending_header
+        if header is not None and len(cells) == len(header) and all(
+            _DELIMITER_CELL.match(cell) for cell in cells
+        ):
+            # 表头 + 对齐行：表格开始
+            self.in_table = True
+            self.tables_found += 1
+            self._fallback_rows = None
+            self._columns = len(header)
+            self.alignments = [parse_alignment(cell) for cell in cells]
+            if self.tables_found == 1:
+                self.first_alignments = self.alignments
+            self.table_caption, self._heading = self._heading, None
+            self._pending_header = None
+            return [[inline_text(cell) for cell in header]]
+
+        self._pending_header = cells
+        return []
+
+    @property
+    def fallback_row_count(self) -> int:
+        """尚未发现标准表格时暂存的宽松解析行数"""
+        return len(self._fallback_rows) if self._fallback_rows else 0
+
+    @property
+    def fallback_column_count(self) -> int:
+        """尚未发现标准表格时暂存的宽松解析行的最大列数"""
+        return self._fallback_columns if self._fallback_rows else 0
+
+    def close(self) -> List[List[str]]:
+        """输入结束；没有发现标准表格时返回宽松解析的结果"""
+        self.in_table = False
+        self._pending_header = None
+        if self._fallback_rows:
+            rows, self._fallback_rows = self._fallback_rows, None
+            return rows
+        return []
+
+    def _normalize(self, cells: List[str]) -> List[str]:
+        row = [inline_text(cell) for cell in cells[:self._columns]]
+        if len(row) < self._columns:
+            row.extend([""] * (self._columns - len(row)))
+        return row
+
+
+def iter_lines(source) -> Iterator[str]:
+    """从字符串、bytes、文件对象或行迭代器中逐行读取"""
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    if isinstance(source, str):
+        start = 0
+        while True:
+            end = source.find("\n", start)
+            if end == -1:
+                if start < len(source):
+                    yield source[start:]
+                return
+            yield source[start:end]
+            start = end + 1
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        yield line.rstrip("\r\n")
+
+
+def _tokenize(tokenizer: "TableTokenizer", source) -> Iterator[List[str]]:
+    for line in iter_lines(source):
+        yield from tokenizer.feed(line)
+    yield from tokenizer.close()
+
+
+def iter_table_rows(source, lenient: bool = True) -> Iterator[List[str]]:
+    """流式解析输入中的所有表格，逐行产出（多个表格的行依次产出）"""
+    return _tokenize(TableTokenizer(lenient=lenient), source)
+
+
+def read_table_data(source, lenient: bool = True) -> TableData:
+    """
+    流式解析输入中的所有表格，数据行依次合并为一个 TableData（与 iter_table_rows 相同），
+    各列对齐方式取第一个表格的对齐行
+    """
+    tokenizer = TableTokenizer(lenient=lenient)
+    # 数据行整体交给 TableData.extend，逐行循环中不做额外判断
+    table = TableData.from_rows(_tokenize(tokenizer, source))
+    if tokenizer.first_alignments:
+        alignments = tokenizer.first_alignments[:table.num_cols]
+        table.alignments = alignments + [None] * (table.num_cols - len(alignments))
+    return table
+
+
+class TableAssembler:
+    """推式表格组装器：每次 feed 一行，返回这一行结束的 MarkdownTable（通常为空列表）"""
+
+    def __init__(self, lenient: bool = True):
+        self.tokenizer = TableTokenizer(lenient=lenient)
+        self.current: Optional[MarkdownTable] = None
+
+    def feed(self, line: str) -> List[MarkdownTable]:
+        tokenizer = self.tokenizer
+        started = tokenizer.tables_found
+        rows = tokenizer.feed(line)
+        finished = []
+        if tokenizer.tables_found != started:
+            if self.current is not None:
+                finished.append(self._finish())
+            data = TableData(len(rows[0]), tokenizer.alignments)
+            data.append(rows[0])
+            self.current = MarkdownTable(
+                data=data,
+                alignments=data.alignments,
+                caption=tokenizer.table_caption,
+            )
+        elif rows:
+            self.current.data.extend(rows)
+        elif self.current is not None and not tokenizer.in_table:
+            finished.append(self._finish())
+        return finished
+
+    def _finish(self) -> MarkdownTable:
+        table, self.current = self.current, None
+        table.data.finish()
+        return table
+
+    def close(self) -> List[MarkdownTable]:
+        """输入结束：返回最后一个表格；没有标准表格时返回宽松解析的结果"""
+        fallback_rows = self.tokenizer.close()
+        if self.current is not None:
+            return [self._finish()]
+        if fallback_rows:
+            data = TableData.from_rows(fallback_rows)
+            return [MarkdownTable(data=data, alignments=data.alignments)]
+        return []
+
+
+def iter_tables(source, lenient: bool = True) -> Iterator[MarkdownTable]:
+    """流式解析输入中的表格，每个表格结束时产出一个 MarkdownTable"""
+    assembler = TableAssembler(lenient=lenient)
+    for line in iter_lines(source):
+        yield from assembler.feed(line)
+    yield from assembler.close()
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes], encoding: str = "utf-8"):
+    """从异步字节流中增量解码并逐行产出"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ""
+    async for chunk in chunks:
+        text = tail + decoder.decode(chunk)
+        lines = text.split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def aiter_table_rows(chunks: AsyncIterable[bytes], lenient: bool = True, encoding: str = "utf-8"):
+    """异步版本的 iter_table_rows，适用于请求体字节流"""
+    tokenizer = TableTokenizer(lenient=lenient)
+    async for line in aiter_lines(chunks, encoding):
+        for row in tokenizer.feed(line):
+            yield row
+    for row in tokenizer.close():
+        yield row
+
+
+async def aiter_tables(chunks: AsyncIterable[bytes], lenient: bool = True, encoding: str = "utf-8"):
+    """异步版本的 iter_tables，适用于请求体字节流"""
+    assembler = TableAssembler(lenient=lenient)
+    async for line in aiter_lines(chunks, encoding):
+        for table in assembler.feed(line):
+            yield table
+    for table in assembler.close():
+        yield table
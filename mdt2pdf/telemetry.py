@@ -0,0 +1,396 @@
+"""
+耗时与规模指标：按阶段计时的 span、Prometheus 文本格式的计数器/直方图，以及 Server-Timing 响应头
+
+每个 HTTP 请求对应一个 Trace，保存在 contextvar 中；span("layout") 等阶段计时写入当前 Trace，
+没有 Trace 时（基准脚本、直接调用渲染函数）不记录。渲染进程中的阶段耗时随结果一起传回父进程，
+合并到发起请求的 Trace 中。请求结束时各阶段耗时写入直方图，由 /metrics 以 Prometheus 文本格式输出。
+
+LoopLagMonitor 定期测量事件循环的调度延迟：处理函数中的同步计算会推迟循环上的其他任务，延迟越大影响越大。
+"""
+import os
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+COLUMNS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class Trace:
+    """一个请求内各阶段的耗时（秒），同一阶段可以出现多次"""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def extend(self, spans: Iterable[Tuple[str, float]]):
+        with self._lock:
+            self.spans.extend(spans)
+
+    def totals(self) -> Dict[str, float]:
+        """按阶段累计耗时，保持阶段首次出现的顺序"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("mdt2pdf_trace", default=None)
+
+
+@contextmanager
+def collect():
+    """开始一个新的 Trace（渲染进程中每个任务一个），退出时恢复之前的 Trace"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """记录一个阶段的耗时；也可以作为装饰器使用"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - started)
+
+
+def record(spans: Iterable[Tuple[str, float]]):
+    """把其他进程传回的阶段耗时合并到当前 Trace"""
+    trace = _current_trace.get()
+    if trace is not None and spans:
+        trace.extend(spans)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增的计数器"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """累计分桶的直方图，输出 _bucket / _sum / _count"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        # 每个标签组合保存 [各桶计数..., +Inf 计数, 总和]
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """抓取时通过回调读取当前值的仪表（队列深度、缓存字节数等）"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def samples(self):
+        value = self.func()
+        if value is not None:
+            yield f"{self.name} {_format_value(value)}"
+
+
+class Registry:
+    """指标集合，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, buckets, labelnames))
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], float]) -> Gauge:
+        return self._add(Gauge(name, documentation, func))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class Telemetry:
+    """服务使用的全部指标，以及把 Trace 写入直方图的方法"""
+
+    def __init__(self, server_timing: bool = False):
+        self.server_timing = server_timing
+        self.registry = Registry()
+        self.requests = self.registry.counter(
+            "mdt2pdf_requests", "HTTP 请求数", ("endpoint", "status")
+        )
+        self.request_seconds = self.registry.histogram(
+            "mdt2pdf_request_seconds", "HTTP 请求总耗时（秒）", SECONDS_BUCKETS, ("endpoint",)
+        )
+        self.stage_seconds = self.registry.histogram(
+            "mdt2pdf_stage_seconds", "各处理阶段的耗时（秒），每个请求内同一阶段累计", SECONDS_BUCKETS,
+            ("endpoint", "stage"),
+        )
+        self.request_bytes = self.registry.counter(
+            "mdt2pdf_request_bytes", "接收的请求体字节数", ("endpoint",)
+        )
+        self.response_bytes = self.registry.histogram(
+            "mdt2pdf_response_bytes", "响应体字节数", BYTES_BUCKETS, ("endpoint",)
+        )
+        self.table_rows = self.registry.histogram(
+            "mdt2pdf_table_rows", "每个表格的行数（含表头）", ROWS_BUCKETS
+        )
+        self.table_columns = self.registry.histogram(
+            "mdt2pdf_table_columns", "每个表格的列数", COLUMNS_BUCKETS
+        )
+        self.rows = self.registry.counter("mdt2pdf_rows", "处理的表格行数（含表头）")
+        self.pdf_bytes = self.registry.histogram(
+            "mdt2pdf_pdf_bytes", "生成的PDF字节数（不含缓存命中）", BYTES_BUCKETS, ("optimize",)
+        )
+        self.loop_lag = self.registry.histogram(
+            "mdt2pdf_event_loop_lag_seconds", "事件循环调度延迟（秒）：定时任务实际唤醒比预定时间晚的时长", LAG_BUCKETS
+        )
+
+    @classmethod
+    def from_env(cls):
+        """MDT2PDF_SERVER_TIMING=1 时在响应中附带 Server-Timing 头"""
+        return cls(server_timing=os.getenv("MDT2PDF_SERVER_TIMING", "0") == "1")
+
+    def observe_tables(self, tables):
+        """记录表格规模；tables 为 MarkdownTable 列表"""
+        self.observe_shapes((len(table.data), len(table.header)) for table in tables)
+
+    def observe_shapes(self, shapes):
+        """记录表格规模；shapes 为 (行数, 列数) 列表，由在渲染进程中解析的任务回传"""
+        for rows, columns in shapes:
+            self.table_rows.observe(rows)
+            self.table_columns.observe(columns)
+            self.rows.inc(rows)
+
+    def observe_pdf(self, size: int, optimize: str):
+        """记录新生成的PDF大小，按输出优化方式区分"""
+        self.pdf_bytes.observe(size, optimize=optimize)
+
+    def finish(self, endpoint: str, status: int, trace: Trace, elapsed: float, received: int, sent: int):
+        self.requests.inc(endpoint=endpoint, status=status)
+        self.request_seconds.observe(elapsed, endpoint=endpoint)
+        for stage, seconds in trace.totals().items():
+            self.stage_seconds.observe(seconds, endpoint=endpoint, stage=stage)
+        if received:
+            self.request_bytes.inc(received, endpoint=endpoint)
+        self.response_bytes.observe(sent, endpoint=endpoint)
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监测：每隔 interval 秒休眠一次，实际唤醒时间比预定时间晚的部分即为调度延迟，
+    写入直方图并保留最近 window 个样本，供 /health 报告最近的最大延迟
+    """
+
+    def __init__(self, histogram: Optional[Histogram] = None, interval: float = 0.1, window: int = 50):
+        self.histogram = histogram
+        self.interval = interval
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, histogram: Optional[Histogram] = None):
+        """MDT2PDF_LOOP_LAG_INTERVAL 为采样间隔秒数，0 表示关闭 (默认: 0.1)"""
+        return cls(histogram, float(os.getenv("MDT2PDF_LOOP_LAG_INTERVAL", "0.1")))
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+        self.recent.append(lag)
+        if self.histogram is not None:
+            self.histogram.observe(lag)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+
+    def start(self):
+        """在当前事件循环中启动监测任务；interval 为 0 时不启动"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        """累计样本数、平均和最大延迟，以及最近样本中的最大延迟（秒）"""
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "mean_seconds": self.total / self.samples if self.samples else 0.0,
+            "max_seconds": self.max,
+            "recent_max_seconds": max(self.recent, default=0.0),
+        }
+
+
+def server_timing_header(trace: Trace, elapsed: float) -> str:
+    """Server-Timing 头：响应头发出前已完成的各阶段耗时（毫秒）和总耗时"""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in trace.totals().items()]
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class TelemetryMiddleware:
+    """
+    ASGI 中间件：为每个 HTTP 请求建立 Trace，统计请求/响应字节数，
+    记录响应体发送耗时（write 阶段），可选地添加 Server-Timing 头
+    """
+
+    def __init__(self, app, telemetry: Telemetry, exclude: Sequence[str] = ()):
+        self.app = app
+        self.telemetry = telemetry
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        state = {"status": 500, "received": 0, "sent": 0, "write_started": None}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+            return message
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if self.telemetry.server_timing:
+                    header = server_timing_header(trace, time.perf_counter() - started)
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+                state["write_started"] = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                if state["write_started"] is not None:
+                    trace.add("write", time.perf_counter() - state["write_started"])
+
+        try:
+            await self.app(scope, counting_receive, timed_send)
+        finally:
+            _current_trace.reset(token)
+            # 以匹配到的路由模板为标签（静态文件归为 /static），未匹配的路径归为 other，
+            # 避免标签基数随请求路径增长
+            endpoint = getattr(scope.get("route"), "path", None) or "other"
+            self.telemetry.finish(
+                endpoint, state["status"], trace, time.perf_counter() - started,
+                state["received"], state["sent"],
+            )
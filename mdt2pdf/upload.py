@@ -0,0 +1,188 @@
+"""
+流式上传：边接收请求体边解码、解析表格，并在接收过程中检查大小限制
+
+请求体字节数、总行数和列数超过上限时立即抛出 UploadTooLarge（对应 413），
+不必等整个请求体接收完或解析完；内存中只保留解析后的表格，不保留原始文本。
+"""
+import os
+from typing import AsyncIterable, List, Optional
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+from .table_parser import MarkdownTable, TableAssembler, aiter_lines
+
+
+class UploadTooLarge(Exception):
+    """请求体或表格规模超过上限"""
+
+
+class InvalidMultipart(ValueError):
+    """multipart 请求体格式错误或缺少文件字段"""
+
+
+class UploadLimits:
+    """流式上传的大小限制，0 表示不限制"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_rows: int = 100000, max_columns: int = 100):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.max_columns = max_columns
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建限制"""
+        return cls(
+            max_bytes=int(os.getenv("MDT2PDF_MAX_BODY_BYTES", str(32 * 1024 * 1024))),
+            max_rows=int(os.getenv("MDT2PDF_MAX_ROWS", "100000")),
+            max_columns=int(os.getenv("MDT2PDF_MAX_COLUMNS", "100")),
+        )
+
+    def check_content_length(self, content_length: Optional[str]):
+        """请求头声明的长度已超限时，在读取请求体之前拒绝"""
+        if self.max_bytes and content_length and content_length.isdigit():
+            if int(content_length) > self.max_bytes:
+                raise UploadTooLarge(f"请求体超过上限 {self.max_bytes} 字节")
+
+    async def limit_bytes(self, chunks: AsyncIterable[bytes]):
+        """逐块转发请求体，累计字节数超限时中止"""
+        received = 0
+        async for chunk in chunks:
+            received += len(chunk)
+            if self.max_bytes and received > self.max_bytes:
+                raise UploadTooLarge(f"请求体超过上限 {self.max_bytes} 字节")
+            yield chunk
+
+    def check_table(self, table: MarkdownTable, rows_before: int):
+        # 每读入一行都会检查：列数取 TableData 已记录的值，不读取表头（读取会把列缓冲写入各列）
+        columns = table.data.num_cols
+        if self.max_columns and columns > self.max_columns:
+            raise UploadTooLarge(f"表格列数 {columns} 超过上限 {self.max_columns}")
+        if self.max_rows and rows_before + len(table.data) > self.max_rows:
+            raise UploadTooLarge(f"表格总行数超过上限 {self.max_rows}")
+
+    def check_fallback(self, tokenizer):
+        columns = tokenizer.fallback_column_count
+        if self.max_columns and columns > self.max_columns:
+            raise UploadTooLarge(f"表格列数 {columns} 超过上限 {self.max_columns}")
+        if self.max_rows and tokenizer.fallback_row_count > self.max_rows:
+            raise UploadTooLarge(f"表格总行数超过上限 {self.max_rows}")
+
+
+def _write_multipart(parser, chunk: Optional[bytes]):
+    """向 multipart 解析器写入一块请求体（None 表示结束），格式错误统一转换为 InvalidMultipart"""
+    try:
+        if chunk is None:
+            parser.finalize()
+        else:
+            parser.write(chunk)
+    except InvalidMultipart:
+        raise
+    except ValueError as e:
+        raise InvalidMultipart(str(e))
+
+
+async def multipart_file_chunks(
+    content_type: str, chunks: AsyncIterable[bytes], field: str = "file", max_parts: int = 8
+):
+    """
+    从 multipart 请求体中逐块取出文件字段 field 的内容：每收到一块请求体就解析并转发其中的文件数据，
+    不写入临时文件，后续的行数和列数检查随接收进度进行；其他字段忽略
+    """
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise InvalidMultipart("缺少 boundary")
+    state = {
+        "parts": 0, "header": b"", "value": b"", "name": None, "filename": None, "reading": False, "found": False,
+    }
+    pending: List[bytes] = []
+
+    def on_part_begin():
+        state["parts"] += 1
+        state["name"] = state["filename"] = None
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        if state["header"].lower() == b"content-disposition":
+            _, options = parse_options_header(state["value"])
+            state["name"] = options.get(b"name", b"").decode("latin-1")
+            state["filename"] = options.get(b"filename")
+        state["header"] = state["value"] = b""
+
+    def on_headers_finished():
+        state["reading"] = state["name"] == field and state["filename"] is not None
+        if state["reading"]:
+            if state["found"]:
+                raise InvalidMultipart(f"只能上传一个文件字段 {field}")
+            state["found"] = True
+
+    def on_part_data(data, start, end):
+        if state["reading"]:
+            pending.append(data[start:end])
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    async for chunk in chunks:
+        _write_multipart(parser, chunk)
+        if state["parts"] > max_parts:
+            raise InvalidMultipart(f"字段数量超过上限 {max_parts}")
+        if pending:
+            yield b"".join(pending)
+            pending.clear()
+    _write_multipart(parser, None)
+    if not state["found"]:
+        raise InvalidMultipart(f"缺少上传文件字段 {field}")
+
+
+async def digest_chunks(chunks: AsyncIterable[bytes], digest):
+    """逐块转发请求体，同时更新 digest（hashlib 对象），用于按原始内容计算缓存键"""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+async def read_tables(
+    chunks: AsyncIterable[bytes], limits: UploadLimits, encoding: str = "utf-8", digest=None
+) -> List[MarkdownTable]:
+    """
+    增量解析请求体中的全部表格；每读入一行就检查当前表格的行数和列数。
+    传入 digest（hashlib 对象）时，接收到的原始字节同时写入 digest
+    """
+    assembler = TableAssembler()
+    tables: List[MarkdownTable] = []
+    rows_done = 0
+    chunks = limits.limit_bytes(chunks)
+    if digest is not None:
+        chunks = digest_chunks(chunks, digest)
+    async for line in aiter_lines(chunks, encoding):
+        for table in assembler.feed(line):
+            rows_done += len(table.data)
+            if table.header:
+                tables.append(table)
+        if assembler.current is not None:
+            limits.check_table(assembler.current, rows_done)
+        else:
+            # 尚未发现标准表格时，宽松解析暂存的行同样检查行数和列数
+            limits.check_fallback(assembler.tokenizer)
+    for table in assembler.close():
+        limits.check_table(table, rows_done)
+        rows_done += len(table.data)
+        if table.header:
+            tables.append(table)
+    return tables
@@ -0,0 +1,12 @@
+"""
+forkserver 的预加载模块（MDT2PDF_RENDER_START_METHOD=preload，见 startup.py）：导入时完成全部导入、字体注册和一次预热渲染，
+之后从 forkserver fork 出的渲染进程直接继承这些状态。不要在其他地方导入
+"""
+import logging
+
+from .startup import warm_up
+
+logger = logging.getLogger(__name__)
+
+timings = warm_up()
+logger.info("forkserver 预热完成: " + ", ".join(f"{step} {seconds * 1000:.0f}ms" for step, seconds in timings.items()))
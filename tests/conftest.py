@@ -0,0 +1,44 @@
+"""
+测试环境：在导入 main 之前设置环境变量，服务只启动一个渲染进程，字体索引和任务目录都在临时目录，不使用共享缓存和磁盘缓存
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+os.environ["MDT2PDF_RENDER_WORKERS"] = "1"
+os.environ["MDT2PDF_FONT_INDEX"] = os.path.join(tempfile.mkdtemp(prefix="mdt2pdf-test-fonts-"), "font-index.json")
+os.environ["MDT2PDF_JOB_DIR"] = tempfile.mkdtemp(prefix="mdt2pdf-test-jobs-")
+for _name in ("MDT2PDF_SHARED_CACHE", "MDT2PDF_CACHE_DIR", "MDT2PDF_RENDER_START_METHOD"):
+    os.environ.pop(_name, None)
+
+SIMPLE_TABLE = """| 名称 | 数量 |
+|:---|---:|
+| 苹果 | 3 |
+| banana | 12 |
+"""
+
+
+def unique_table():
+    """每次内容不同的表格，避免命中之前测试写入的缓存或任务"""
+    return f"| 编号 | 说明 |\n|---|---|\n| 1 | {uuid.uuid4().hex} |\n"
+
+
+@pytest.fixture(scope="session")
+def fonts():
+    """在测试进程中注册选中的字体（导入 main 时只选择字体，不注册）"""
+    import main
+
+    return main.register_chinese_fonts()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """启动完整服务（渲染进程池、任务进程池）的 TestClient，整个测试会话共用"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
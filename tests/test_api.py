@@ -0,0 +1,150 @@
+"""HTTP 接口：PDF 生成、ETag/304 和错误码（400/503/504）"""
+import io
+
+import pytest
+from pypdf import PdfReader
+
+import main
+from mdt2pdf.executor import ExecutorOverloaded, RenderTimeout
+
+from conftest import SIMPLE_TABLE, unique_table
+
+
+def test_convert_returns_pdf_with_etag(client):
+    response = client.post("/convert", data={"markdown_content": SIMPLE_TABLE})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    # 相同内容再次请求：ETag 和 PDF 字节都相同
+    again = client.post("/convert", data={"markdown_content": SIMPLE_TABLE})
+    assert again.headers["etag"] == etag
+    assert again.content == response.content
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_convert_if_none_match_returns_304(client, if_none_match):
+    etag = client.post("/convert", data={"markdown_content": SIMPLE_TABLE}).headers["etag"]
+    response = client.post(
+        "/convert",
+        data={"markdown_content": SIMPLE_TABLE},
+        headers={"If-None-Match": if_none_match.format(etag=etag)},
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_etag_depends_on_options(client):
+    portrait = client.post("/convert", data={"markdown_content": SIMPLE_TABLE, "orientation": "portrait"})
+    landscape = client.post("/convert", data={"markdown_content": SIMPLE_TABLE, "orientation": "landscape"})
+    stale = client.post(
+        "/convert",
+        data={"markdown_content": SIMPLE_TABLE, "orientation": "landscape"},
+        headers={"If-None-Match": portrait.headers["etag"]},
+    )
+    assert portrait.headers["etag"] != landscape.headers["etag"]
+    assert stale.status_code == 200
+
+
+def test_multi_table_document_puts_each_table_on_its_own_page(client):
+    document = (
+        "# Sales\n\n| item | qty |\n|---|---|\n| apple | 3 |\n\n"
+        "## Stock\n\n| depot | units |\n|---|---|\n| north | 7 |\n"
+    )
+    response = client.post("/convert", data={"markdown_content": document})
+    assert response.status_code == 200
+    pages = PdfReader(io.BytesIO(response.content)).pages
+    assert len(pages) == 2
+    first, second = (page.extract_text() for page in pages)
+    assert "Sales" in first and "apple" in first and "depot" not in first
+    assert "Stock" in second and "north" in second
+
+
+def test_convert_does_not_parse_in_the_api_process(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("服务进程不应解析表格")
+
+    monkeypatch.setattr(main, "parse_markdown_document", fail)
+    assert client.post("/convert", data={"markdown_content": unique_table()}).status_code == 200
+    assert client.post("/preview", data={"markdown_content": unique_table()}).status_code == 200
+
+
+def test_convert_without_table_is_400(client):
+    response = client.post("/convert", data={"markdown_content": "没有表格的普通文本"})
+    assert response.status_code == 400
+
+
+def test_stream_matches_convert(client):
+    convert = client.post("/convert", data={"markdown_content": SIMPLE_TABLE})
+    raw = client.post(
+        "/convert/stream", content=SIMPLE_TABLE.encode("utf-8"), headers={"content-type": "text/markdown"}
+    )
+    upload = client.post("/convert/stream", files={"file": ("table.md", SIMPLE_TABLE.encode("utf-8"))})
+    assert raw.status_code == upload.status_code == 200
+    assert raw.headers["etag"] == upload.headers["etag"] == convert.headers["etag"]
+    assert raw.content == convert.content
+
+
+def test_stream_row_limit_is_413(client, monkeypatch):
+    monkeypatch.setattr(main.upload_limits, "max_rows", 5)
+    body = "| a |\n|---|\n" + "".join(f"| {i} |\n" for i in range(50))
+    raw = client.post("/convert/stream", content=body.encode(), headers={"content-type": "text/markdown"})
+    upload = client.post("/convert/stream", files={"file": ("table.md", body.encode())})
+    assert raw.status_code == upload.status_code == 413
+
+
+def test_stream_multipart_without_file_is_400(client):
+    response = client.post("/convert/stream", files={"other": ("table.md", SIMPLE_TABLE.encode())})
+    assert response.status_code == 400
+
+
+def test_overloaded_executor_is_503_with_retry_after(client, monkeypatch):
+    async def overloaded(*args, **kwargs):
+        raise ExecutorOverloaded(7)
+
+    monkeypatch.setattr(main.render_executor, "submit", overloaded)
+    response = client.post("/convert", data={"markdown_content": unique_table()})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+
+
+def test_render_error_is_500_and_logged(client, monkeypatch, caplog, capsys):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main.render_executor, "submit", broken)
+    response = client.post("/convert", data={"markdown_content": unique_table()})
+    assert response.status_code == 500
+    (record,) = [r for r in caplog.records if r.name == "main" and "PDF生成错误" in r.getMessage()]
+    assert record.exc_info[0] is RuntimeError
+    # 请求内容和错误都不再写到标准输出
+    assert capsys.readouterr().out == ""
+
+
+def test_render_timeout_is_504(client, monkeypatch):
+    async def timed_out(*args, **kwargs):
+        raise RenderTimeout("渲染超过 1 秒")
+
+    monkeypatch.setattr(main.render_executor, "submit", timed_out)
+    response = client.post("/convert", data={"markdown_content": unique_table()})
+    assert response.status_code == 504
+
+
+def test_preview_returns_html_with_etag(client):
+    response = client.post("/preview", data={"markdown_content": SIMPLE_TABLE})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert "苹果" in response.text
+    cached = client.post(
+        "/preview", data={"markdown_content": SIMPLE_TABLE}, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert cached.status_code == 304
+
+
+def test_health(client):
+    health = client.get("/health").json()
+    assert health["status"] == "healthy"
+    assert health["executor"]["workers"] == 1
@@ -0,0 +1,187 @@
+"""批量转换：任务解析、并发调度、ZIP 流和合并 PDF"""
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+from pypdf import PdfReader
+
+from mdt2pdf.batch import (
+    MANIFEST_NAME,
+    BatchError,
+    BatchItem,
+    BatchResult,
+    BatchRunner,
+    aiter_ndjson_items,
+    item_name,
+    merge_pdfs,
+    stream_zip,
+)
+
+from conftest import SIMPLE_TABLE
+
+
+def item(index, name="t", markdown="", orientation="auto", layout="fit"):
+    return BatchItem(index, name, markdown, orientation, layout)
+
+
+async def chunked(data, size=7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def collect_items(body, max_items=10):
+    async def run():
+        return [i async for i in aiter_ndjson_items(chunked(body), "auto", "fit", max_items)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("name, expected", [
+    (None, "table-3"),
+    ("", "table-3"),
+    ("docs/报表.md", "报表"),
+    ("C:\\data\\a.markdown", "a"),
+    ('bad:name?.txt', "bad_name_"),
+])
+def test_item_name(name, expected):
+    assert item_name(name, 2) == expected
+
+
+def test_ndjson_items_use_defaults():
+    body = (
+        json.dumps({"name": "a.md", "markdown": "x"}) + "\n\n"
+        + json.dumps({"markdown": "y", "orientation": "landscape", "layout": "paginated"}) + "\n"
+    ).encode()
+    first, second = collect_items(body)
+    assert (first.index, first.name, first.orientation, first.layout) == (0, "a", "auto", "fit")
+    assert (second.index, second.name, second.orientation, second.layout) == (1, "table-2", "landscape", "paginated")
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"not json\n", "JSON"),
+    (b'{"name": "a"}\n', "markdown"),
+    (b'{"markdown": 1}\n', "markdown"),
+    (b'{"markdown": "a"}\n' * 3, "上限"),
+])
+def test_invalid_ndjson(body, message):
+    with pytest.raises(BatchError, match=message):
+        collect_items(body, max_items=2)
+
+
+def test_runner_limits_concurrency_and_keeps_order():
+    running = 0
+    peak = 0
+
+    async def render(batch_item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - batch_item.index))
+        running -= 1
+        if batch_item.index == 3:
+            raise ValueError("未找到有效的表格数据")
+        return f"pdf{batch_item.index}".encode()
+
+    async def run():
+        runner = BatchRunner(render, concurrency=2)
+        for i in range(5):
+            runner.add(item(i))
+        return await runner.in_order()
+
+    results = asyncio.run(run())
+    assert peak == 2
+    assert [r.item.index for r in results] == [0, 1, 2, 3, 4]
+    assert [r.ok for r in results] == [True, True, True, False, True]
+    assert results[3].error == "未找到有效的表格数据"
+
+
+def test_stream_zip_writes_results_and_manifest():
+    async def render(batch_item):
+        await asyncio.sleep(0.01 * batch_item.index)
+        if batch_item.index == 2:
+            raise ValueError("失败")
+        return b"%PDF-" + str(batch_item.index).encode()
+
+    async def run():
+        runner = BatchRunner(render, concurrency=3)
+        for i, name in enumerate(["a", "a", "b"]):
+            runner.add(item(i, name))
+        return b"".join([chunk async for chunk in stream_zip(runner)])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(run())))
+    # 同名条目按序号区分，失败的条目只出现在 manifest 中
+    assert sorted(archive.namelist()) == sorted(["a.pdf", "a-2.pdf", MANIFEST_NAME])
+    manifest = json.loads(archive.read(MANIFEST_NAME))
+    assert [entry["index"] for entry in manifest] == [0, 1, 2]
+    assert [entry["ok"] for entry in manifest] == [True, True, False]
+    for entry in manifest[:2]:
+        assert archive.read(entry["file"]) == b"%PDF-" + str(entry["index"]).encode()
+
+
+def test_merge_pdfs_adds_bookmarks_and_manifest(fonts):
+    import main
+
+    first = main.create_pdf([["a"], ["1"]], "portrait").getvalue()
+    second = main.create_pdf([["b"], ["2"]], "landscape").getvalue()
+    results = [
+        BatchResult(item(0, "first"), pdf=first),
+        BatchResult(item(1, "broken"), error="失败"),
+        BatchResult(item(2, "second"), pdf=second),
+    ]
+    merged, manifest = merge_pdfs(results)
+    reader = PdfReader(io.BytesIO(merged))
+    assert len(reader.pages) == 2
+    assert [outline.title for outline in reader.outline] == ["first", "second"]
+    assert [entry.get("page") for entry in manifest] == [1, None, 2]
+    attached = json.loads(reader.attachments[MANIFEST_NAME][0])
+    assert attached == manifest
+
+
+def test_batch_api_zip_from_ndjson(client):
+    body = "\n".join(json.dumps(job) for job in [
+        {"name": "one.md", "markdown": SIMPLE_TABLE},
+        {"name": "none.md", "markdown": "没有表格"},
+    ]).encode()
+    response = client.post("/convert/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    manifest = json.loads(archive.read(MANIFEST_NAME))
+    assert [entry["ok"] for entry in manifest] == [True, False]
+    assert archive.read("one.pdf").startswith(b"%PDF")
+
+
+def test_batch_api_merged_pdf_from_multipart(client):
+    files = [("files", ("a.md", SIMPLE_TABLE.encode())), ("files", ("b.md", SIMPLE_TABLE.encode()))]
+    response = client.post("/convert/batch?output=pdf", files=files)
+    assert response.status_code == 200
+    assert response.headers["x-batch-items"] == "2"
+    assert response.headers["x-batch-failed"] == "0"
+    assert len(PdfReader(io.BytesIO(response.content)).pages) == 2
+
+
+def test_batch_item_renders_like_convert(client):
+    document = (
+        "# Sales\n\n| item | qty |\n|---|---|\n| apple | 3 |\n\n"
+        "## Stock\n\n| depot | units | note |\n|---|---|---|\n| north | 7 | ok |\n"
+    )
+    single = client.post("/convert", data={"markdown_content": document})
+    body = json.dumps({"name": "doc.md", "markdown": document}).encode()
+    batch = client.post("/convert/batch", content=body, headers={"content-type": "application/x-ndjson"})
+    pdf = zipfile.ZipFile(io.BytesIO(batch.content)).read("doc.pdf")
+    pages = PdfReader(io.BytesIO(pdf)).pages
+    assert len(pages) == len(PdfReader(io.BytesIO(single.content)).pages) == 2
+    assert "Stock" in pages[1].extract_text()
+    assert pdf == single.content
+
+
+def test_batch_api_rejects_bad_requests(client):
+    assert client.post("/convert/batch", content=b"x", headers={"content-type": "text/plain"}).status_code == 415
+    bad = json.dumps({"markdown": SIMPLE_TABLE, "orientation": "sideways"}).encode()
+    assert client.post(
+        "/convert/batch", content=bad, headers={"content-type": "application/x-ndjson"}
+    ).status_code == 400
+    assert client.post(
+        "/convert/batch", content=b"", headers={"content-type": "application/x-ndjson"}
+    ).status_code == 400
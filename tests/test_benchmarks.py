@@ -0,0 +1,67 @@
+"""基准脚本：语料可重现，回退判断同时要求相对和绝对增幅，压测的分位数统计"""
+import importlib
+import os
+
+import pytest
+
+import main  # noqa: F401  先按测试环境导入服务，suite 中的环境变量默认值不再影响它
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+
+@pytest.fixture(scope="module")
+def suite():
+    # suite 导入时会设置关闭缓存等环境变量，导入后恢复，避免影响之后启动的渲染进程
+    saved = dict(os.environ)
+    mp = pytest.MonkeyPatch()
+    mp.syspath_prepend(BENCHMARKS)
+    try:
+        yield importlib.import_module("suite")
+    finally:
+        mp.undo()
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def test_corpus_is_deterministic(suite):
+    from corpus import Case, cases
+
+    case = Case("wide", "mixed", "long", 20)
+    assert case.markdown() == Case("wide", "mixed", "long", 20).markdown()
+    assert case.markdown() != Case("wide", "ascii", "long", 20).markdown()
+    lines = case.markdown().splitlines()
+    assert len(lines) == 22 and lines[0].count("|") == 13
+    assert len(cases((10, 500))) == 2 * 3 * 2 * 2
+
+
+def test_select_skips_stages_above_their_row_limit(suite):
+    keys = [key for key, _, _ in suite.select((10, 100000), ("parse", "create_pdf"), "narrow-ascii-short")]
+    assert keys == [
+        "narrow-ascii-short-10/parse", "narrow-ascii-short-10/create_pdf", "narrow-ascii-short-100000/parse",
+    ]
+
+
+@pytest.mark.parametrize("before, seconds, peak, expected", [
+    (0.0100, 0.0120, 1_000_000, []),          # 相对增幅不足 25%
+    (0.0010, 0.0019, 1_000_000, []),          # 超过 25% 但绝对增幅不到 1ms
+    (0.0100, 0.0200, 1_000_000, ["耗时"]),
+    (0.0100, 0.0100, 1_200_000, ["峰值内存"]),
+    (0.0100, 0.0100, 1_050_000, []),          # 内存增幅不足 10%
+])
+def test_find_regressions(suite, before, seconds, peak, expected):
+    baseline = {"results": {"t/parse": {"seconds": before, "peak_bytes": 1_000_000}}}
+    results = {"t/parse": {"seconds": seconds, "peak_bytes": peak}, "new/parse": {"seconds": 1.0}}
+    found = suite.find_regressions(results, baseline, 0.25, 0.10).get("t/parse", [])
+    assert [message.split(" ")[0] for message in found] == expected
+
+
+def test_loadtest_percentiles_and_mix(suite):
+    loadtest = importlib.import_module("loadtest")
+    values = [i / 1000 for i in range(1, 101)]
+    assert loadtest.percentile(values, 50) == 0.05
+    assert loadtest.percentile(values, 99) == 0.099
+    assert loadtest.percentile([], 50) == 0.0
+    summary = loadtest.summarize(reversed(values))
+    assert (summary["count"], summary["p95_ms"], summary["max_ms"]) == (100, 95.0, 100.0)
+    (case, weight), (other, default) = loadtest.parse_mix(["wide-cjk-long-500=3", "narrow-ascii-short-10"])
+    assert (case.name, weight, other.rows, default) == ("wide-cjk-long-500", 3.0, 10, 1.0)
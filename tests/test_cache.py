@@ -0,0 +1,89 @@
+"""渲染结果缓存：缓存键、ETag 匹配、内存层 LRU 和磁盘层"""
+import hashlib
+
+import pytest
+
+from mdt2pdf.cache import RenderCache, etag_matches, hash_source, make_etag, make_source_cache_key
+
+FONTS = ("ChineseFont", "ChineseFont-Bold")
+
+
+def test_hash_source_matches_streamed_bytes():
+    text = "| 名称 |\n|---|\n| 值 |\n"
+    assert hash_source(text) == hash_source(text.encode("utf-8")) == hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def test_source_cache_key_covers_all_options():
+    digest = hash_source("| a |\n|---|\n| 1 |\n")
+    base = make_source_cache_key(digest, "auto", FONTS)
+    assert base == make_source_cache_key(digest, "auto", FONTS, "fit", "none")
+    variants = [
+        make_source_cache_key(hash_source("| a |\n|---|\n| 2 |\n"), "auto", FONTS),
+        make_source_cache_key(digest, "portrait", FONTS),
+        make_source_cache_key(digest, "auto", FONTS + ("/fonts/b.ttf#0",)),
+        make_source_cache_key(digest, "auto", FONTS, "paginated"),
+        make_source_cache_key(digest, "auto", FONTS, "fit", "size"),
+    ]
+    assert len({base, *variants}) == len(variants) + 1
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, make_etag("abc")) is expected
+
+
+def test_memory_lru_evicts_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # a 成为最近使用
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.get("c") == b"12345"
+    stats = cache.stats()
+    assert stats["bytes"] == 10
+    assert stats["evictions"] == 1
+
+
+def test_oversized_entry_is_not_kept_in_memory():
+    cache = RenderCache(max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path))
+    cache.put("k" * 64, b"%PDF-disk")
+    restarted = RenderCache(max_bytes=0, disk_dir=str(tmp_path))
+    assert restarted.get("k" * 64) == b"%PDF-disk"
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_repeated_disk_put_counts_bytes_once(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path))
+    # 两个并发请求都判断为未写入磁盘，先后写入同一个键
+    cache._put_disk("a" * 64, b"x" * 100)
+    cache._put_disk("a" * 64, b"x" * 100)
+    cache.put("a" * 64, b"x" * 100)
+    stats = cache.stats()
+    assert stats["disk_entries"] == 1
+    assert stats["disk_bytes"] == 100
+
+
+def test_disk_tier_evicts_oldest(tmp_path):
+    cache = RenderCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.put(name * 64, name.encode() * 100)
+    assert cache.get("a" * 64) is None
+    assert cache.get("c" * 64) == b"c" * 100
+    assert cache.stats()["disk_bytes"] == 200
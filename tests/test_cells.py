@@ -0,0 +1,73 @@
+"""表格单元格：共享样式、单行单元格和整列使用字符串的列"""
+import pytest
+from reportlab.platypus import Paragraph
+
+import main
+from mdt2pdf.cells import (
+    CellText,
+    make_cell,
+    make_row_cells,
+    measure_row_height,
+    paragraph_style,
+    plain_columns,
+    table_style,
+)
+from mdt2pdf.table_data import TableData
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def test_styles_are_shared():
+    assert paragraph_style(main.FONT_NAME, 9) is paragraph_style(main.FONT_NAME, 9)
+    assert paragraph_style(main.FONT_NAME, 9) is not paragraph_style(main.FONT_NAME, 9.5)
+    assert table_style(main.FONT_NAME, main.BOLD_FONT_NAME, 9) is table_style(main.FONT_NAME, main.BOLD_FONT_NAME, 9)
+
+
+def test_short_plain_text_is_drawn_directly():
+    cell = make_cell("  苹果   apple ", 200, main.FONT_NAME, 10)
+    assert isinstance(cell, CellText)
+    assert cell.text == "苹果 apple"  # 与 Paragraph 一样合并连续空白
+    assert cell.wrap(200, 100) == (cell.width, 12)
+
+
+def test_empty_cell_has_no_height():
+    cell = make_cell("", 100, main.FONT_NAME, 10)
+    assert isinstance(cell, CellText) and cell.height == 0
+
+
+def test_wrapping_or_markup_uses_paragraph():
+    assert isinstance(make_cell("很长的文本" * 20, 100, main.FONT_NAME, 10), Paragraph)
+    assert isinstance(make_cell("a &amp; b", 500, main.FONT_NAME, 10), Paragraph)
+    assert isinstance(make_cell("<b>x</b>", 500, main.FONT_NAME, 10), Paragraph)
+
+
+def test_single_line_cell_matches_paragraph_height():
+    text = "short"
+    paragraph = Paragraph(text, paragraph_style(main.FONT_NAME, 10))
+    cell = make_cell(text, 200, main.FONT_NAME, 10)
+    assert cell.wrap(200, 100)[1] == paragraph.wrap(200, 100)[1]
+
+
+def test_table_style_aligns_columns():
+    style = table_style(main.FONT_NAME, main.BOLD_FONT_NAME, 9, ("left", "center", "right"))
+    aligns = [command for command in style.getCommands() if command[0] == "ALIGN"]
+    assert aligns[1:] == [("ALIGN", (0, 0), (0, -1), "LEFT"), ("ALIGN", (2, 0), (2, -1), "RIGHT")]
+
+
+def test_only_short_columns_that_fit_become_strings():
+    data = TableData.from_rows(
+        [["编号", "状态", "说明"]] + [[str(i), "进行中", "很长的说明文字，需要换行显示 " * 3] for i in range(20)]
+    )
+    assert plain_columns(data, [60, 60, 200], main.FONT_NAME, main.BOLD_FONT_NAME, 9) == [True, True, False]
+    # 列太窄放不下最宽的单元格时按单元格处理
+    assert plain_columns(data, [60, 12, 200], main.FONT_NAME, main.BOLD_FONT_NAME, 9) == [True, False, False]
+
+
+def test_row_cells_mix_strings_and_flowables():
+    cells = make_row_cells(
+        ("1", "a  b", "很长的说明文字 " * 10), [60, 60, 100], [True, True, False],
+        ["right", "center", "left"], main.FONT_NAME, 9,
+    )
+    assert cells[:2] == ["1", "a b"]
+    assert isinstance(cells[2], Paragraph)
+    assert measure_row_height(["1", ""], [60, 60], 9) == measure_row_height([make_cell("1", 60, main.FONT_NAME, 9)], [60], 9)
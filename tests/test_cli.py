@@ -0,0 +1,77 @@
+"""命令行批量转换：目录层级、清单跳过未变化的文件、失败时的退出码"""
+import os
+import re
+
+import pytest
+
+from mdt2pdf import cli
+
+from conftest import SIMPLE_TABLE
+
+
+@pytest.fixture
+def docs(tmp_path):
+    source_dir = tmp_path / "docs"
+    (source_dir / "sub").mkdir(parents=True)
+    (source_dir / "a.md").write_text(SIMPLE_TABLE, encoding="utf-8")
+    (source_dir / "sub" / "b.md").write_text(SIMPLE_TABLE.replace("苹果", "梨"), encoding="utf-8")
+    return source_dir
+
+
+def run_cli(capsys, *argv):
+    """运行命令行，返回 (退出码, 转换数, 跳过数, 失败数)"""
+    code = cli.main([str(arg) for arg in argv])
+    summary = re.search(r"转换 (\d+) 个，跳过 (\d+) 个，失败 (\d+) 个", capsys.readouterr().out)
+    return (code,) + tuple(int(n) for n in summary.groups())
+
+
+def test_converts_tree_and_skips_unchanged(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (0, 2, 0, 0)
+    assert (out / "a.pdf").read_bytes().startswith(b"%PDF")
+    assert (out / "sub" / "b.pdf").exists()
+    assert (out / cli.MANIFEST_NAME).exists()
+
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (0, 0, 2, 0)
+
+
+def test_touched_file_with_same_content_is_skipped(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    run_cli(capsys, docs, "-o", out, "-j", "1")
+    source = docs / "a.md"
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (0, 0, 2, 0)
+
+
+def test_changed_content_is_converted_again(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    run_cli(capsys, docs, "-o", out, "-j", "1")
+    (docs / "a.md").write_text(SIMPLE_TABLE.replace("3", "4"), encoding="utf-8")
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (0, 1, 1, 0)
+
+
+def test_missing_output_is_converted_again(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    run_cli(capsys, docs, "-o", out, "-j", "1")
+    (out / "sub" / "b.pdf").unlink()
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (0, 1, 1, 0)
+
+
+def test_force_and_changed_options_convert_again(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    run_cli(capsys, docs, "-o", out, "-j", "1")
+    assert run_cli(capsys, docs, "-o", out, "-j", "1", "--force") == (0, 2, 0, 0)
+    assert run_cli(capsys, docs, "-o", out, "-j", "1", "--layout", "paginated") == (0, 2, 0, 0)
+    assert run_cli(capsys, docs, "-o", out, "-j", "1", "--layout", "paginated") == (0, 0, 2, 0)
+
+
+def test_failed_file_sets_exit_code_and_is_retried(docs, tmp_path, capsys):
+    out = tmp_path / "out"
+    (docs / "bad.md").write_bytes(b"| \xff |\n|---|\n| 1 |\n")
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (1, 2, 0, 1)
+    assert run_cli(capsys, docs, "-o", out, "-j", "1") == (1, 0, 2, 1)
+
+
+def test_missing_input_is_usage_error(tmp_path, capsys):
+    assert cli.main([str(tmp_path / "missing.md")]) == 2
@@ -0,0 +1,43 @@
+"""渲染核心作为库使用：与 /convert 接口生成相同的PDF"""
+import pytest
+
+from mdt2pdf import converter
+
+from conftest import SIMPLE_TABLE
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+DOCUMENT = (
+    "# Sales\n\n| item | qty |\n|---|---|\n| apple | 3 |\n\n"
+    "## Stock\n\n| depot | units |\n|---|---|\n| north | 7 |\n"
+)
+
+
+@pytest.mark.parametrize("markdown", [SIMPLE_TABLE, DOCUMENT])
+def test_convert_markdown_matches_convert_endpoint(client, markdown):
+    response = client.post("/convert", data={"markdown_content": markdown, "orientation": "landscape"})
+    assert converter.convert_markdown(markdown, "landscape") == response.content
+
+
+def test_convert_markdown_without_table_raises():
+    with pytest.raises(ValueError, match="未找到有效的表格数据"):
+        converter.convert_markdown("没有表格")
+
+
+@pytest.mark.parametrize("markdown", [SIMPLE_TABLE, DOCUMENT])
+def test_render_markdown_to_pdf_parses_in_the_worker(markdown):
+    shapes, pdf = converter.render_markdown_to_pdf(markdown, "landscape")
+    tables = converter.parse_markdown_document(markdown)
+    assert shapes == [(len(table.data), len(table.header)) for table in tables]
+    assert pdf == converter.convert_markdown(markdown, "landscape")
+
+
+def test_render_markdown_preview_returns_shapes_and_html():
+    shapes, html = converter.render_markdown_preview(DOCUMENT, "auto")
+    assert shapes == [(2, 2), (2, 2)]
+    assert b"apple" in html and b"north" in html
+
+
+@pytest.mark.parametrize("task", [converter.render_markdown_to_pdf, converter.render_markdown_preview])
+def test_worker_tasks_without_table_return_none(task):
+    assert task("没有表格", "auto") == ([], None)
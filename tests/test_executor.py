@@ -0,0 +1,91 @@
+"""渲染执行器：结果回传、异常、超时后替换进程和队列满时拒绝"""
+import time
+import asyncio
+
+import pytest
+
+from mdt2pdf.executor import ExecutorOverloaded, RenderExecutor, RenderFailed, RenderTimeout
+
+
+def run_with_executor(coro_factory, **options):
+    """启动执行器，运行 coro_factory(executor)，结束后停止全部进程"""
+    async def runner():
+        executor = RenderExecutor(**options)
+        executor.start()
+        try:
+            return await coro_factory(executor)
+        finally:
+            executor.shutdown()
+
+    return asyncio.run(runner())
+
+
+def test_bytes_and_objects_are_returned():
+    async def scenario(executor):
+        return await executor.submit(bytes, 3), await executor.submit(divmod, 7, 2)
+
+    assert run_with_executor(scenario, workers=1) == (b"\x00\x00\x00", (3, 1))
+
+
+def test_worker_exception_becomes_render_failed():
+    async def scenario(executor):
+        with pytest.raises(RenderFailed, match="ValueError"):
+            await executor.submit(int, "not a number")
+        # 出错的任务不影响进程继续使用
+        return await executor.submit(int, "42"), executor.stats()
+
+    result, stats = run_with_executor(scenario, workers=1)
+    assert result == 42
+    assert stats["failed"] == 1
+    assert stats["restarts"] == 0
+
+
+def test_timeout_kills_and_replaces_worker():
+    async def scenario(executor):
+        started = time.monotonic()
+        with pytest.raises(RenderTimeout):
+            await executor.submit(time.sleep, 30, timeout=0.5)
+        elapsed = time.monotonic() - started
+        # 替换后的进程可以继续处理任务
+        return elapsed, await executor.submit(divmod, 9, 4), executor.stats()
+
+    elapsed, result, stats = run_with_executor(scenario, workers=1)
+    assert elapsed < 10
+    assert result == (2, 1)
+    assert stats["timeouts"] == 1
+    assert stats["restarts"] == 1
+
+
+def test_full_queue_raises_overloaded_with_retry_after():
+    async def scenario(executor):
+        running = asyncio.ensure_future(executor.submit(time.sleep, 1))
+        await asyncio.sleep(0.2)
+        queued = asyncio.ensure_future(executor.submit(time.sleep, 0))
+        await asyncio.sleep(0.2)
+        try:
+            with pytest.raises(ExecutorOverloaded) as excinfo:
+                await executor.submit(time.sleep, 0)
+        finally:
+            await asyncio.gather(running, queued)
+        return excinfo.value, executor.stats()
+
+    error, stats = run_with_executor(scenario, workers=1, max_queue=1)
+    assert error.retry_after >= 1
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_submit_before_start_is_an_error():
+    executor = RenderExecutor(workers=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.submit(divmod, 1, 1))
+
+
+def test_large_bytes_result_round_trips():
+    payload = 5 * 1024 * 1024
+
+    async def scenario(executor):
+        return await executor.submit(bytes, payload)
+
+    result = run_with_executor(scenario, workers=1)
+    assert isinstance(result, bytes) and len(result) == payload
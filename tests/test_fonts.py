@@ -0,0 +1,123 @@
+"""字体发现、索引和选择"""
+import os
+import shutil
+
+import pytest
+import reportlab
+from reportlab.pdfbase import cidfonts
+
+from mdt2pdf.fonts import BOLD_FONT_NAME, CID_FALLBACK, FONT_NAME, STANDARD_FALLBACK, FontManager, scan_font_file
+
+REPORTLAB_FONTS = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+
+
+@pytest.fixture
+def font_dir(tmp_path):
+    """ReportLab 自带的 Bitstream Vera 字体（常规、粗体、斜体）"""
+    directory = tmp_path / "fonts"
+    directory.mkdir()
+    for name in ("Vera.ttf", "VeraBd.ttf", "VeraIt.ttf", "VeraBI.ttf"):
+        shutil.copy(os.path.join(REPORTLAB_FONTS, name), directory / name)
+    return directory
+
+
+def manager(font_dir, tmp_path, **options):
+    return FontManager(search_path=[str(font_dir)], index_path=str(tmp_path / "index.json"), **options)
+
+
+def test_scan_reads_family_weight_and_style(font_dir):
+    (face,) = scan_font_file(str(font_dir / "VeraBd.ttf"))
+    assert face.family == "Bitstream Vera Sans"
+    assert face.weight == 700
+    assert not face.italic
+    assert not face.cjk
+    assert scan_font_file(str(font_dir / "VeraIt.ttf"))[0].italic
+
+
+def test_select_picks_upright_regular_and_bold(font_dir, tmp_path):
+    fonts = manager(font_dir, tmp_path)
+    assert fonts.select() == (FONT_NAME, BOLD_FONT_NAME)
+    assert os.path.basename(fonts.regular.path) == "Vera.ttf"
+    assert os.path.basename(fonts.bold.path) == "VeraBd.ttf"
+    # 选择字体不解析字体文件
+    assert not fonts.registered
+
+
+def test_family_without_bold_uses_regular_for_both(font_dir, tmp_path):
+    (font_dir / "VeraBd.ttf").unlink()
+    fonts = manager(font_dir, tmp_path)
+    fonts.select()
+    assert fonts.bold == fonts.regular
+
+
+def test_index_is_reused_until_a_file_changes(font_dir, tmp_path):
+    first = manager(font_dir, tmp_path)
+    first.discover()
+    assert not first.index_hit
+    second = manager(font_dir, tmp_path)
+    second.discover()
+    assert second.index_hit
+    assert second.faces == first.faces
+
+    os.utime(font_dir / "Vera.ttf", (0, 0))
+    third = manager(font_dir, tmp_path)
+    third.discover()
+    assert not third.index_hit
+
+
+def test_unreadable_and_cff_files_are_skipped(font_dir, tmp_path):
+    (font_dir / "broken.ttf").write_bytes(b"\x00\x01\x00\x00 not a font")
+    (font_dir / "cff.otf").write_bytes(b"OTTO" + b"\x00" * 8)
+    faces = manager(font_dir, tmp_path).discover()
+    assert {os.path.basename(face.path) for face in faces} == {"Vera.ttf", "VeraBd.ttf", "VeraIt.ttf", "VeraBI.ttf"}
+
+
+def test_no_fonts_selects_builtin_cid_font(tmp_path):
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    fonts = manager(empty, tmp_path)
+    assert fonts.select() == (CID_FALLBACK, CID_FALLBACK)
+    assert fonts.describe()["regular"]["builtin"]
+
+
+def test_fingerprint_names_the_selected_files(font_dir, tmp_path):
+    fonts = manager(font_dir, tmp_path)
+    fonts.select()
+    fingerprint = fonts.fingerprint()
+    assert fingerprint[:2] == [FONT_NAME, BOLD_FONT_NAME]
+    assert fingerprint[2].endswith("Vera.ttf#0") and fingerprint[3].endswith("VeraBd.ttf#0")
+    # 计算标识不注册字体，注册成功后标识不变
+    assert not fonts.registered
+    fonts.ensure_registered()
+    assert fonts.fingerprint() == fingerprint
+
+
+def break_fonts(font_dir):
+    """选择字体之后把字体文件改坏，注册时全部失败"""
+    for path in font_dir.iterdir():
+        path.write_bytes(b"\x00\x01\x00\x00 broken")
+
+
+def test_failed_registration_falls_back_to_cid_font(font_dir, tmp_path):
+    fonts = manager(font_dir, tmp_path)
+    fonts.select()
+    selected = fonts.fingerprint()
+    break_fonts(font_dir)
+    fonts.ensure_registered()
+    assert (fonts.font_name, fonts.bold_font_name) == (CID_FALLBACK, CID_FALLBACK)
+    # 回退作为单独一项追加在选中的字体之后
+    assert fonts.fingerprint() == selected + [f"fallback:{CID_FALLBACK},{CID_FALLBACK}"]
+    assert fonts.describe()["cjk"]
+
+
+def test_failed_cid_font_falls_back_to_helvetica(font_dir, tmp_path, monkeypatch):
+    def broken(name):
+        raise ValueError(name)
+
+    monkeypatch.setattr(cidfonts, "UnicodeCIDFont", broken)
+    fonts = manager(font_dir, tmp_path)
+    fonts.select()
+    break_fonts(font_dir)
+    fonts.ensure_registered()
+    assert (fonts.font_name, fonts.bold_font_name) == STANDARD_FALLBACK
+    assert not fonts.describe()["cjk"]
@@ -0,0 +1,176 @@
+"""异步任务：任务表状态变更、去重、过期，以及 /jobs 接口的完整流程"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from mdt2pdf.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobManager, JobStore, ProgressReporter
+from mdt2pdf.converter import RenderCancelled
+
+from conftest import unique_table
+
+
+@pytest.fixture
+def store(tmp_path):
+    job_store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield job_store
+    job_store.close()
+
+
+def test_create_and_get(store):
+    job = store.create("k1", "auto", "fit", tables=2, rows=30)
+    assert job["status"] == QUEUED
+    assert store.get(job["id"]) == job
+    assert store.get("missing") is None
+
+
+def test_status_transitions(store):
+    job_id = store.create("k1", "auto", "fit", 1, 10)["id"]
+    assert store.progress(job_id, "cells", 0.2) is False  # 未开始运行的任务不更新进度
+    assert store.start(job_id) is True
+    assert store.start(job_id) is False
+    assert store.progress(job_id, "cells", 0.2) is True
+    assert store.finish(job_id, DONE, ttl=60, result_bytes=123) is True
+    job = store.get(job_id)
+    assert job["status"] == DONE
+    assert job["progress"] == 1.0
+    assert job["result_bytes"] == 123
+    assert store.finish(job_id, FAILED, ttl=60) is False
+
+
+def test_cancel_wins_over_late_finish(store):
+    job_id = store.create("k1", "auto", "fit", 1, 10)["id"]
+    store.start(job_id)
+    assert store.finish(job_id, CANCELLED, ttl=60, error="任务已取消") is True
+    assert store.finish(job_id, DONE, ttl=60, result_bytes=1) is False
+    assert store.progress(job_id, "build", 0.5) is False
+    assert store.get(job_id)["status"] == CANCELLED
+
+
+def test_cancelled_job_stops_progress_reporter(store):
+    job_id = store.create("k1", "auto", "fit", 1, 10)["id"]
+    store.start(job_id)
+    reporter = ProgressReporter(store, job_id, interval=0)
+    reporter("cells", 5, 10)
+    assert store.get(job_id)["progress"] == pytest.approx(0.2)
+    store.finish(job_id, CANCELLED, ttl=60)
+    with pytest.raises(RenderCancelled):
+        reporter("build", 1, 10)
+
+
+def test_find_reusable(store):
+    queued = store.create("k1", "auto", "fit", 1, 10)
+    assert store.find_reusable("k1")["id"] == queued["id"]
+    assert store.find_reusable("k2") is None
+    store.finish(queued["id"], FAILED, ttl=60, error="失败")
+    assert store.find_reusable("k1") is None  # 失败的任务不复用
+    done = store.create("k1", "auto", "fit", 1, 10)
+    store.finish(done["id"], DONE, ttl=60, result_bytes=1)
+    assert store.find_reusable("k1")["id"] == done["id"]
+
+
+def test_expired_jobs_disappear(store):
+    job_id = store.create("k1", "auto", "fit", 1, 10)["id"]
+    store.finish(job_id, DONE, ttl=0.01, result_bytes=1)
+    time.sleep(0.05)
+    assert store.get(job_id) is None
+    assert store.find_reusable("k1") is None
+    assert store.expire() == [job_id]
+    assert store.ids() == set()
+
+
+def test_interrupt_orphans(store):
+    own = store.create("k1", "auto", "fit", 1, 10)["id"]
+    other = store.create("k2", "auto", "fit", 1, 10)["id"]
+    store.start(other)
+    # 另一个仍在运行的服务进程的任务不受影响
+    store._execute("UPDATE jobs SET owner = ? WHERE id = ?", (os.getppid(), other))
+    assert store.interrupt_orphans(ttl=60) == 1
+    assert store.get(own)["status"] == FAILED
+    assert store.get(own)["error"]
+    assert store.get(other)["status"] == RUNNING
+
+
+def test_manager_store_calls_do_not_block_the_loop(tmp_path, store, monkeypatch):
+    manager = JobManager(str(tmp_path))
+    manager.store = store
+    job_id = store.create("k1", "auto", "fit", tables=1, rows=2)["id"]
+    get = store.get
+
+    def locked_get(job_id):
+        # 渲染进程写入进度时数据库被锁住
+        time.sleep(0.3)
+        return get(job_id)
+
+    monkeypatch.setattr(store, "get", locked_get)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        job = await manager.get(job_id)
+        task.cancel()
+        return job, ticks
+
+    job, ticks = asyncio.run(main())
+    assert job["id"] == job_id
+    assert ticks >= 10
+
+
+def test_concurrent_submits_create_one_job(tmp_path, store, monkeypatch):
+    manager = JobManager(str(tmp_path))
+    manager.store = store
+
+    async def run(*args):
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(manager, "_run", run)
+
+    async def main():
+        return await asyncio.gather(*(manager.submit("k1", [], "auto", "fit") for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len({job["id"] for job, _ in results}) == 1
+    assert [created for _, created in results].count(True) == 1
+
+
+def wait_for_job(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get(f"/jobs/{job_id}").json()
+        if info["status"] not in (QUEUED, RUNNING):
+            return info
+        time.sleep(0.1)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout} 秒内结束")
+
+
+def test_job_api_flow(client):
+    body = unique_table().encode("utf-8")
+    headers = {"content-type": "text/markdown"}
+    created = client.post("/jobs", content=body, headers=headers)
+    assert created.status_code == 202
+    job_id = created.json()["id"]
+    assert created.headers["location"] == f"/jobs/{job_id}"
+    assert created.json()["deduplicated"] is False
+
+    info = wait_for_job(client, job_id)
+    assert info["status"] == DONE
+    result = client.get(info["result_url"])
+    assert result.status_code == 200
+    assert result.content.startswith(b"%PDF")
+    assert len(result.content) == info["result_bytes"]
+
+    again = client.post("/jobs", content=body, headers=headers).json()
+    assert again["id"] == job_id
+    assert again["deduplicated"] is True
+
+    # 已完成的任务不能取消
+    assert client.delete(f"/jobs/{job_id}").json()["status"] == DONE
+    assert client.get("/jobs/missing").status_code == 404
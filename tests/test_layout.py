@@ -0,0 +1,107 @@
+"""表格布局求解：列宽分配和字号查找"""
+import random
+
+import pytest
+from reportlab.platypus import Table
+
+import main
+from mdt2pdf import converter
+from mdt2pdf.cells import make_cell
+from mdt2pdf.layout import (
+    MIN_FONT_SIZE,
+    SQUEEZE_RATIO,
+    allocate_widths,
+    measure_table,
+    solve_table_layout,
+    table_height,
+)
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def measure(data):
+    return measure_table(data, main.FONT_NAME, main.BOLD_FONT_NAME)
+
+
+def sample_table(rows=30, long_text="长文本单元格需要换行显示" * 4):
+    return [["编号", "名称", "说明"]] + [[str(i), f"item {i}", long_text] for i in range(rows)]
+
+
+def test_measure_table_pads_short_rows():
+    measurement = measure([["a", "b"], ["1"], ["1", "2", "3"]])
+    # 列数取最长一行，缺失的单元格宽度为 0
+    assert measurement.num_cols == 3 and measurement.num_rows == 3
+    assert [len(column) for column in measurement.columns] == [3, 3, 3]
+    assert measurement.columns[1][1] == 0 and measurement.columns[2][0] == 0
+
+
+def test_allocate_widths_spreads_spare_space():
+    widths = allocate_widths([10, 20, 30], padding=3, available_width=500)
+    assert sum(widths) == pytest.approx(500)
+    assert widths[0] < widths[1] < widths[2]
+
+
+def test_allocate_widths_keeps_narrow_columns_when_squeezed():
+    widths = allocate_widths([10, 400, 800], padding=3, available_width=500)
+    assert sum(widths) == pytest.approx(500 * SQUEEZE_RATIO)
+    assert widths[0] == pytest.approx(10 + 2 * 3 + 4)
+    assert widths[1] < widths[2]
+
+
+def reportlab_height(data, widths, font_size):
+    """用 ReportLab 实际排版得到的整表高度"""
+    cells = [
+        [make_cell(text, width, main.BOLD_FONT_NAME if r == 0 else main.FONT_NAME, font_size)
+         for text, width in zip(row, widths)]
+        for r, row in enumerate(data)
+    ]
+    table = Table(cells, colWidths=widths, style=converter.create_table_styles(font_size))
+    table.wrap(1000, 100000)
+    return sum(table._rowHeights)
+
+
+def test_table_height_is_exact_without_wrapping():
+    data = [["a", "b"], ["1", "2"], ["3", "4"]]
+    assert table_height(measure(data), [100.0, 100.0], 9) == pytest.approx(reportlab_height(data, [100.0, 100.0], 9))
+
+
+def test_table_height_does_not_underestimate_word_wrapping():
+    # 英文窄列按词断行，行尾留空；估算应不小于实际高度，且不过分偏大
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+    data = [["id", "text", "note"]] + [
+        [str(i), " ".join(rng.choices(words, k=rng.randint(3, 30))), " ".join(rng.choices(words, k=rng.randint(1, 12)))]
+        for i in range(40)
+    ]
+    widths = [40.0, 150.0, 90.0]
+    actual = reportlab_height(data, widths, 9)
+    assert actual <= table_height(measure(data), widths, 9) <= actual * 1.2
+
+
+def test_solver_fits_height_with_largest_font():
+    measurement = measure(sample_table())
+    widths, _, _, font_size = solve_table_layout(measurement, 500, 2000, 10)
+    assert font_size == 10
+    assert sum(widths) <= 500 + 1e-6
+
+    # 可用高度变小时字号不增大，且估计高度不超过可用高度
+    sizes = []
+    for height in (1500, 1000, 700, 500):
+        widths, _, _, size = solve_table_layout(measurement, 500, height, 10)
+        assert size == MIN_FONT_SIZE or table_height(measurement, widths, size) <= height
+        sizes.append(size)
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_solver_falls_back_to_minimum_font():
+    measurement = measure(sample_table(rows=400))
+    _, _, scale_factor, font_size = solve_table_layout(measurement, 500, 300, 10)
+    assert font_size == MIN_FONT_SIZE
+    assert scale_factor < 1
+
+
+def test_calculate_optimal_table_size_caps_font_by_content():
+    small = main.calculate_optimal_table_size([["a", "b"], ["1", "2"]], 500, 700)
+    large = main.calculate_optimal_table_size(sample_table(rows=20), 500, 5000)
+    assert small[3] == 10
+    assert large[3] == 8
@@ -0,0 +1,93 @@
+"""行级布局备忘：未变化的行复用测量和排版结果，输出与不使用备忘时一致"""
+import pytest
+from reportlab.platypus import Table
+
+import main
+from mdt2pdf import converter
+from mdt2pdf.cells import make_cell, measure_row_height
+from mdt2pdf.layout import measure_table
+from mdt2pdf.memo import LayoutMemo
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def table(rows=20, edited=None):
+    data = [["编号", "名称", "说明"]]
+    for i in range(rows):
+        data.append([str(i), f"item {i}", "较长的说明文字 " * (i % 3 + 1)])
+    if edited is not None:
+        data[edited][2] = "已修改"
+    return data
+
+
+def test_measure_matches_measure_table_and_reuses_rows():
+    memo = LayoutMemo().for_table(table(), main.FONT_NAME, main.BOLD_FONT_NAME)
+    first = memo.measure(table())
+    expected = measure_table(table(), main.FONT_NAME, main.BOLD_FONT_NAME)
+    assert [list(c) for c in first.columns] == [list(c) for c in expected.columns]
+    assert first.total_chars == expected.total_chars
+    assert memo.measured == 21
+
+    edited = memo.measure(table(edited=5))
+    assert memo.measured == 22  # 只测量修改的那一行
+    assert [list(c) for c in edited.columns] == [
+        list(c) for c in measure_table(table(edited=5), main.FONT_NAME, main.BOLD_FONT_NAME).columns
+    ]
+
+
+def test_build_rows_rebuilds_when_layout_changes():
+    memo = LayoutMemo().for_table(table(), main.FONT_NAME, main.BOLD_FONT_NAME)
+    calls = []
+
+    def create_row(row_idx, row):
+        calls.append(row_idx)
+        return (row_idx,)
+
+    assert memo.build_rows(table(), (9, (100.0,)), create_row) == [(i,) for i in range(21)]
+    memo.build_rows(table(edited=3), (9, (100.0,)), create_row)
+    assert calls[21:] == [3]
+    memo.build_rows(table(edited=3), (8, (100.0,)), create_row)
+    assert calls[22:] == list(range(21))
+
+
+def test_memo_is_keyed_by_header_with_lru_eviction():
+    memos = LayoutMemo(max_tables=2)
+    first = memos.for_table([["a"]], "F", "B")
+    assert memos.for_table([["a"], ["1"]], "F", "B") is first
+    assert memos.for_table([["a"]], "F", "Other") is not first
+    memos.for_table([["b"]], "F", "B")
+    assert memos.for_table([["a"]], "F", "B") is not first
+    assert LayoutMemo(max_tables=0).for_table([["a"]], "F", "B") is None
+
+
+def test_memo_is_bounded_by_total_rows():
+    memos = LayoutMemo(max_tables=8, max_rows=50)
+    first = memos.for_table(table(30), main.FONT_NAME, main.BOLD_FONT_NAME)
+    first.measure(table(30))
+    assert memos.stats()["rows"] == 31
+    # 两个表格合计超过上限：淘汰最久未使用的表格
+    second = memos.for_table([["x", "y"]] + [["1", "2"]] * 30, main.FONT_NAME, main.BOLD_FONT_NAME)
+    assert memos.stats()["tables"] == 1
+    assert memos.for_table(table(30), main.FONT_NAME, main.BOLD_FONT_NAME) is not first
+    assert second is not None
+
+    # 单个表格超过上限：不做备忘，并释放它之前的版本
+    assert memos.for_table(table(60), main.FONT_NAME, main.BOLD_FONT_NAME) is None
+    assert memos.stats()["skipped"] == 1 and memos.stats()["tables"] == 1
+    assert LayoutMemo(max_rows=0).for_table([["a"]], "F", "B") is None
+
+
+def test_row_height_matches_table_calculation():
+    widths = [60.0, 200.0]
+    cells = [make_cell("短", widths[0], main.FONT_NAME, 9), make_cell("很长的文本 " * 30, widths[1], main.FONT_NAME, 9)]
+    reportlab_table = Table([cells], colWidths=widths, style=converter.create_table_styles(9))
+    reportlab_table.wrap(1000, 1000)
+    assert measure_row_height(cells, widths, 9) == pytest.approx(reportlab_table._rowHeights[0])
+
+
+def test_incremental_render_matches_full_render(monkeypatch):
+    main.create_pdf(table(200), "portrait")
+    incremental = main.create_pdf(table(200, edited=50), "portrait").getvalue()
+    monkeypatch.setattr(main.layout_memo, "max_tables", 0)
+    full = main.create_pdf(table(200, edited=50), "portrait").getvalue()
+    assert incremental == full
@@ -0,0 +1,25 @@
+"""文本宽度测量：与 ReportLab 实际绘制的宽度一致"""
+import pytest
+from reportlab.pdfbase import pdfmetrics
+
+import main
+from mdt2pdf import converter
+from mdt2pdf.metrics import text_width
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+SAMPLES = ["", "Hello, World", "1234567890", "中文表格", "全角，标点！", "mixed 中英 text", "emoji 😀 外", "Ω≈ç√"]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+@pytest.mark.parametrize("font_name", [main.FONT_NAME, main.BOLD_FONT_NAME, "Helvetica"])
+def test_width_matches_reportlab(text, font_name):
+    assert text_width(text, font_name, 11) == pytest.approx(pdfmetrics.stringWidth(text, font_name, 11))
+
+
+def test_width_scales_with_font_size():
+    assert text_width("表格 width", main.FONT_NAME, 20) == pytest.approx(2 * text_width("表格 width", main.FONT_NAME, 10))
+
+
+def test_unregistered_font_falls_back_to_estimate():
+    assert converter.calculate_text_width("ab中", "NoSuchFont", 10) == pytest.approx(0.5 * 10 * 2 + 0.9 * 10)
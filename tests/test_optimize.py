@@ -0,0 +1,106 @@
+"""体积优化输出：内容流数字取整、网格线合并、字体子集去掉 name 表，PDF 可解析且文字不变"""
+import io
+import os
+import re
+import struct
+
+import pytest
+import reportlab
+from pypdf import PdfReader
+
+from mdt2pdf import converter, optimize
+from mdt2pdf.optimize import merge_strokes, round_operands, strip_font_tables
+
+from conftest import SIMPLE_TABLE
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+ASCII_TABLE = [["id", "name", "note"]] + [
+    [str(i), f"item {i}", "a somewhat longer note that wraps " * (i % 3 + 1)] for i in range(60)
+]
+
+
+def font_tables(font_file):
+    num_tables = struct.unpack(">H", font_file[4:6])[0]
+    return {font_file[12 + 16 * i:16 + 16 * i].decode("latin-1") for i in range(num_tables)}
+
+
+def words(text):
+    return re.sub(r"\s+", "", text)
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("1 0 0 1 28.34646 33.44567 cm", "1 0 0 1 28.35 33.45 cm"),
+    (".501961 .501961 .501961 rg", ".502 .502 .502 rg"),
+    ("-0.0001 0 m", "0 0 m"),
+    ("-12.3456 Tw", "-12.35 Tw"),
+    ("(3.14159) Tj 2.71828 Tc", "(3.14159) Tj 2.72 Tc"),
+    ("(a\\) 1.23456) Tj", "(a\\) 1.23456) Tj"),
+])
+def test_round_operands_keeps_strings(content, expected):
+    assert round_operands(content) == expected
+
+
+def test_merge_strokes_joins_runs_and_drops_duplicates():
+    content = "q\nn 0 0 m 10 0 l S\nn 0 5 m 10 5 l S\nn 0 0 m 10 0 l S\nQ\nn 1 1 m 2 2 l S"
+    assert merge_strokes(content) == "q\nn 0 0 m 10 0 l 0 5 m 10 5 l S\nQ\nn 1 1 m 2 2 l S"
+
+
+def test_strip_font_tables():
+    with open(os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf"), "rb") as f:
+        font_file = f.read()
+    stripped = strip_font_tables(font_file)
+    assert "name" in font_tables(font_file)
+    assert font_tables(stripped) == font_tables(font_file) - {"name"}
+    assert strip_font_tables(stripped, {"absent"}) is stripped
+
+
+@pytest.mark.parametrize("layout", ["fit", "paginated"])
+def test_size_output_parses_keeps_text_and_is_smaller(layout):
+    default = converter.create_pdf(ASCII_TABLE, "portrait", layout).getvalue()
+    compact = converter.create_pdf(ASCII_TABLE, "portrait", layout, "size").getvalue()
+    assert len(compact) < len(default)
+
+    default_pages = PdfReader(io.BytesIO(default)).pages
+    compact_pages = PdfReader(io.BytesIO(compact), strict=True).pages
+    assert len(compact_pages) == len(default_pages)
+    for before, after in zip(default_pages, compact_pages):
+        assert words(after.extract_text()) == words(before.extract_text())
+        assert after.mediabox == before.mediabox
+    assert "item 59" in compact_pages[-1].extract_text()
+
+    embedded = [
+        font.get_object()["/FontDescriptor"]["/FontFile2"].get_object().get_data()
+        for page in compact_pages
+        for font in page["/Resources"]["/Font"].values()
+        if "/FontFile2" in font.get_object().get("/FontDescriptor", {})
+    ]
+    assert embedded
+    assert not any("name" in font_tables(font_file) for font_file in embedded)
+
+
+def test_installed_reportlab_provides_the_internals():
+    assert optimize.REPORTLAB_INTERNALS_SUPPORTED
+
+
+def test_unsupported_reportlab_falls_back_to_default_output(monkeypatch):
+    monkeypatch.setattr(optimize, "REPORTLAB_INTERNALS_SUPPORTED", False)
+    default = converter.create_pdf(ASCII_TABLE, "portrait", "fit").getvalue()
+    compact = converter.create_pdf(ASCII_TABLE, "portrait", "fit", "size").getvalue()
+
+    default_pages = PdfReader(io.BytesIO(default)).pages
+    compact_pages = PdfReader(io.BytesIO(compact), strict=True).pages
+    assert [words(page.extract_text()) for page in compact_pages] == [
+        words(page.extract_text()) for page in default_pages
+    ]
+    # 只保留页面压缩，不再改写内容流或字体子集
+    assert b"28.34646" in b"".join(page.get_contents().get_data() for page in compact_pages)
+
+
+def test_optimize_changes_etag_and_size(client):
+    default = client.post("/convert", data={"markdown_content": SIMPLE_TABLE})
+    compact = client.post("/convert", data={"markdown_content": SIMPLE_TABLE, "optimize": "size"})
+    assert compact.status_code == 200
+    assert compact.headers["etag"] != default.headers["etag"]
+    assert len(compact.content) < len(default.content)
+    assert 'mdt2pdf_pdf_bytes_count{optimize="size"}' in client.get("/metrics").text
@@ -0,0 +1,53 @@
+"""PDF 输出：免复制写入和大文件落盘"""
+import os
+import pickle
+
+import pytest
+
+from mdt2pdf import converter
+from mdt2pdf.output import PdfSink, SpooledPdf, spool_if_large
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def test_sink_keeps_the_written_bytes_object():
+    sink = PdfSink()
+    data = b"%PDF-1.4 whole document"
+    assert sink.write(data) == len(data)
+    assert sink.data is data
+    sink.write(b" tail")
+    assert sink.data == data + b" tail"
+
+
+def test_small_results_stay_in_memory():
+    data = b"x" * 10
+    assert spool_if_large(data, threshold=100) is data
+    assert spool_if_large(data, threshold=0) is data
+
+
+def test_large_results_are_spooled(tmp_path):
+    data = b"y" * 200
+    spooled = spool_if_large(data, threshold=100, directory=str(tmp_path))
+    assert isinstance(spooled, SpooledPdf)
+    assert spooled.size == 200
+    # 进程间只传递路径和大小
+    copy = pickle.loads(pickle.dumps(spooled))
+    assert copy.path == spooled.path and copy.read() == data
+    copy.remove()
+    assert not os.path.exists(spooled.path)
+    copy.remove()  # 重复删除不报错
+
+
+def test_render_spools_above_threshold(monkeypatch):
+    table = [["a", "b"], ["1", "2"]]
+    in_memory = converter.render_table_to_pdf(table, "portrait")
+    assert isinstance(in_memory, bytes) and in_memory.startswith(b"%PDF")
+
+    monkeypatch.setattr(converter, "SPOOL_THRESHOLD", 1)
+    spooled = converter.render_table_to_pdf(table, "portrait")
+    try:
+        assert isinstance(spooled, SpooledPdf)
+        # 固定文档ID和时间戳：两次生成的字节相同
+        assert spooled.read() == in_memory
+    finally:
+        spooled.remove()
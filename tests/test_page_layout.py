@@ -0,0 +1,75 @@
+"""自动版面：候选版面按代价排序，小表格在 A4 上整页排版，超长表格分页，PDF 使用选中的版面"""
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from mdt2pdf import converter
+from mdt2pdf.layout import measure_table
+from mdt2pdf.page_layout import choose_page_layout, page_sizes_from_env, search_page_layouts
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def table(rows, cols=3, cell="item"):
+    return [[f"col{c}" for c in range(cols)]] + [[f"{cell} {r}" for _ in range(cols)] for r in range(rows)]
+
+
+def measure(data):
+    return measure_table(data, converter.FONT_NAME, converter.BOLD_FONT_NAME)
+
+
+def test_candidates_are_sorted_by_cost():
+    candidates = search_page_layouts(measure(table(10)), page_sizes=["A4", "LETTER", "A3"])
+    costs = [candidate.cost for candidate in candidates]
+    assert costs == sorted(costs)
+    assert {candidate.paper for candidate in candidates} == {"A4", "LETTER", "A3"}
+
+
+def test_small_table_prefers_a4_fit():
+    plan = choose_page_layout(measure(table(10)), page_sizes=["A4", "LETTER", "A3"])
+    assert (plan.paper, plan.margin_name, plan.layout, plan.pages) == ("A4", "normal", "fit", 1)
+
+
+def test_requested_orientation_limits_candidates():
+    data = measure(table(10, cols=14, cell="a longer cell text"))
+    assert {c.orientation for c in search_page_layouts(data, "portrait", ["A4"])} == {"portrait"}
+
+
+def test_long_table_is_paginated_at_standard_size():
+    data = table(400, cell="a moderately long cell")
+    measurement = measure(data[:201])
+    plan = choose_page_layout(measurement, page_sizes=["A4"], total_rows=len(data))
+    assert plan.layout == "paginated"
+    assert plan.pages > 1
+    assert plan.font_size >= 8
+
+
+def test_page_sizes_from_env(monkeypatch):
+    monkeypatch.setenv("MDT2PDF_AUTO_PAGE_SIZES", "a3, letter, b5")
+    assert page_sizes_from_env() == ["A3", "LETTER"]
+    monkeypatch.setenv("MDT2PDF_AUTO_PAGE_SIZES", "B5")
+    assert page_sizes_from_env() == ["A4"]
+
+
+def test_auto_pdf_uses_chosen_page(monkeypatch):
+    monkeypatch.setenv("MDT2PDF_AUTO_PAGE_SIZES", "A4,A3")
+    data = table(10, cols=14, cell="a longer cell text")
+    plan, _ = converter.plan_page_layout(data, reserved_height=2 * converter.FRAME_PADDING)
+    (page,) = PdfReader(io.BytesIO(converter.create_pdf(data, "auto", "auto").getvalue())).pages
+    assert (float(page.mediabox.width), float(page.mediabox.height)) == pytest.approx(plan.pagesize)
+
+    portrait = converter.create_pdf(data, "portrait", "auto").getvalue()
+    (page,) = PdfReader(io.BytesIO(portrait)).pages
+    assert float(page.mediabox.width) < float(page.mediabox.height)
+
+    long_pdf = converter.create_pdf(table(400, cell="a moderately long cell"), "portrait", "auto").getvalue()
+    pages = PdfReader(io.BytesIO(long_pdf)).pages
+    assert len(pages) > 1
+    assert all("col0" in page.extract_text() for page in pages)  # 分页排版每页重复表头
+
+
+def test_auto_layout_endpoint(client):
+    response = client.post("/convert", data={"markdown_content": "| a | b |\n|---|---|\n| 1 | 2 |\n", "layout": "auto"})
+    assert response.status_code == 200
+    assert len(PdfReader(io.BytesIO(response.content)).pages) == 1
@@ -0,0 +1,52 @@
+"""PDF 生成：单页适配布局和分页布局"""
+import io
+
+import pytest
+from pypdf import PdfReader
+
+import main
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+
+def big_table(rows):
+    return [["id", "name", "note"]] + [[str(i), f"row{i}", "x" * (i % 40)] for i in range(rows)]
+
+
+def page_texts(pdf_bytes):
+    return [page.extract_text() for page in PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+
+def test_fit_layout_uses_one_page():
+    pages = page_texts(main.create_pdf(big_table(40), "portrait").getvalue())
+    assert len(pages) == 1
+
+
+def test_paginated_layout_repeats_header_and_keeps_every_row():
+    rows = 300
+    pages = page_texts(main.create_pdf(big_table(rows), "portrait", "paginated").getvalue())
+    assert len(pages) > 1
+    assert all(text.split()[:3] == ["id", "name", "note"] for text in pages)
+    found = [int(word[3:]) for text in pages for word in text.split() if word.startswith("row")]
+    assert found == list(range(rows))
+
+
+def test_paginated_document_layout():
+    tables = main.parse_markdown_document(
+        "# A\n\n| k |\n|---|\n" + "".join(f"| a{i} |\n" for i in range(200))
+        + "\n# B\n\n| k |\n|---|\n| b0 |\n"
+    )
+    pages = page_texts(main.create_document_pdf(tables, "portrait", "paginated").getvalue())
+    assert len(pages) > 2
+    assert "b0" in pages[-1] and "a199" not in pages[-1]
+
+
+@pytest.mark.parametrize("words", [3000, 20000])
+def test_paginated_layout_splits_a_row_taller_than_a_page(words):
+    table = [["id", "text"], ["1", "word " * words], ["2", "tail"]]
+    pages = page_texts(main.create_pdf(table, "portrait", "paginated").getvalue())
+    assert len(pages) > 1
+    # 续行所在的每一页都重复表头，全部文字都在，后面的行接在续行之后
+    assert all(text.split()[:2] == ["id", "text"] for text in pages)
+    assert sum(text.count("word") for text in pages) == words
+    assert "tail" in pages[-1]
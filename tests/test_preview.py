@@ -0,0 +1,53 @@
+"""HTML 预览：布局参数与 PDF 一致，页面内容转义，超出的行只给出数量提示"""
+import pytest
+
+import main
+from mdt2pdf.preview import PreviewPage, render_page, render_preview_html
+
+pytestmark = pytest.mark.usefixtures("fonts")
+
+DOCUMENT = (
+    "# Sales\n\n| item | qty |\n|---|---|\n| apple | 3 |\n\n"
+    "## Stock\n\n| depot | units |\n|---|---|\n| north | 7 |\n"
+)
+
+
+def test_fit_preview_uses_pdf_layout():
+    rows = [["编号", "说明"]] + [[str(i), "较长的说明文字 " * (i % 4 + 1)] for i in range(30)]
+    tables = main.parse_markdown_document(
+        "| 编号 | 说明 |\n|---|---|\n" + "".join(f"| {a} | {b} |\n" for a, b in rows[1:])
+    )
+    (page,) = main.build_preview_pages(tables, "portrait")
+    widths, _, _, font_size = main.calculate_optimal_table_size(
+        tables[0].data, page.page_width - page.margins[0] - page.margins[1],
+        page.page_height - page.margins[2] - page.margins[3],
+    )
+    assert page.orientation == "portrait"
+    assert page.col_widths == widths
+    assert page.font_size == font_size
+    assert page.total_rows == 30
+
+
+def test_captions_only_for_multi_table_documents():
+    pages = main.build_preview_pages(main.parse_markdown_document(DOCUMENT))
+    assert [page.caption for page in pages] == ["Sales", "Stock"]
+    (single,) = main.build_preview_pages(main.parse_markdown_document(DOCUMENT.split("## Stock")[0]))
+    assert single.caption is None
+
+
+def test_paginated_preview_is_marked():
+    (page,) = main.build_preview_pages(main.parse_markdown_document(DOCUMENT.split("## Stock")[0]), layout="paginated")
+    assert page.layout == "paginated"
+    assert "分页" in page.notes
+
+
+def test_render_page_escapes_and_reports_hidden_rows():
+    page = PreviewPage(
+        header=["<b>名称</b>"], rows=[["a & b"]], total_rows=5, orientation="portrait",
+        page_width=595.0, page_height=842.0, margins=(28, 28, 34, 34), col_widths=[100.0], font_size=9,
+    )
+    html = render_page(page)
+    assert "&lt;b&gt;名称&lt;/b&gt;" in html and "a &amp; b" in html
+    assert "还有 4 行未在预览中显示" in html
+    document = render_preview_html([page, page])
+    assert document.startswith("<!DOCTYPE html>") and document.count('class="page') == 2
@@ -0,0 +1,120 @@
+"""多进程共享缓存：环形覆盖淘汰、跨进程并发读写、拒绝容量不同的文件"""
+import multiprocessing
+
+import pytest
+
+from mdt2pdf.cache import RenderCache
+from mdt2pdf.shared_cache import SharedCache
+
+CAPACITY = 64 * 1024
+
+
+def payload(key, size=4000):
+    return (key.encode() * (size // len(key) + 1))[:size]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared.cache")
+
+
+def test_put_get_and_oversized_entries(path):
+    cache = SharedCache(path, CAPACITY)
+    cache.put("a", payload("a"))
+    cache.put("huge", payload("huge", CAPACITY // 4))
+    assert cache.get("a") == payload("a")
+    assert cache.get("huge") is None  # 超过容量四分之一的条目不放入
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 2, 1)
+    cache.close()
+
+
+def test_wrap_around_evicts_oldest_entries(path):
+    cache = SharedCache(path, CAPACITY)
+    keys = [f"key-{i}" for i in range(40)]  # 约 2.5 圈
+    for key in keys:
+        cache.put(key, payload(key))
+    alive = [key for key in keys if cache.get(key) is not None]
+    # 最近写入的条目都还在，最早的已被覆盖；留下的是连续的一段
+    assert alive == keys[-len(alive):]
+    assert 10 <= len(alive) <= CAPACITY // 4040
+    for key in alive:
+        assert cache.get(key) == payload(key)
+    assert cache.stats()["bytes"] == 4000 * len(alive)
+    cache.close()
+
+
+def test_other_process_sees_entries(path):
+    first = SharedCache(path, CAPACITY)
+    second = SharedCache(path, CAPACITY)
+    first.put("k", b"pdf")
+    assert second.get("k") == b"pdf"
+    first.close()
+    second.close()
+
+
+# 索引有 256 组 × 8 个槽位，两个进程共 600 个条目不会因组满而被挤出
+CONCURRENT_CAPACITY = 16 * 1024 * 1024
+
+
+def _writer(path, prefix, count, errors, barrier):
+    cache = SharedCache(path, CONCURRENT_CAPACITY)
+    barrier.wait()  # 两个进程同时开始写入
+    for i in range(count):
+        cache.put(f"{prefix}-{i}", payload(f"{prefix}-{i}", 1000 + i))
+        # 读取另一个进程写入的条目：要么未命中，要么内容完整
+        other = f"{'b' if prefix == 'a' else 'a'}-{i}"
+        data = cache.get(other)
+        if data is not None and data != payload(other, 1000 + i):
+            errors.put(other)
+    cache.close()
+
+
+def test_concurrent_put_get_from_two_processes(path):
+    SharedCache(path, CONCURRENT_CAPACITY).close()
+    context = multiprocessing.get_context("spawn")
+    errors, barrier = context.Queue(), context.Barrier(2)
+    workers = [context.Process(target=_writer, args=(path, prefix, 300, errors, barrier)) for prefix in "ab"]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert errors.empty()
+    cache = SharedCache(path, CONCURRENT_CAPACITY)
+    for prefix in "ab":
+        for i in range(300):
+            assert cache.get(f"{prefix}-{i}") == payload(f"{prefix}-{i}", 1000 + i)
+    cache.close()
+
+
+def test_different_capacity_is_rejected(path, monkeypatch):
+    small = SharedCache(path, CAPACITY)
+    small.put("k", b"pdf")
+    # 其他进程可能仍映射着这个文件，容量不同时拒绝使用而不是调整文件大小
+    with pytest.raises(OSError):
+        SharedCache(path, 2 * CAPACITY)
+    monkeypatch.setenv("MDT2PDF_SHARED_CACHE", path)
+    monkeypatch.setenv("MDT2PDF_SHARED_CACHE_BYTES", str(2 * CAPACITY))
+    assert SharedCache.from_env() is None
+    assert small.get("k") == b"pdf"
+    small.close()
+
+
+def test_file_without_header_is_initialized(path):
+    open(path, "wb").close()
+    cache = SharedCache(path, CAPACITY)
+    cache.put("k", b"pdf")
+    assert cache.get("k") == b"pdf"
+    cache.close()
+
+
+def test_render_cache_promotes_shared_hits(path):
+    writer = RenderCache(max_bytes=0, shared=SharedCache(path, CAPACITY))
+    reader = RenderCache(max_bytes=CAPACITY, shared=SharedCache(path, CAPACITY))
+    writer.put("k", b"pdf")
+    assert reader.get("k") == b"pdf"
+    assert reader.get("k") == b"pdf"
+    stats = reader.stats()
+    assert (stats["shared_hits"], stats["hits"], stats["entries"]) == (1, 1, 1)
@@ -0,0 +1,43 @@
+"""渲染进程冷启动：预加载的 forkserver 启动方式和导入耗时分析"""
+import asyncio
+import sys
+
+import pytest
+
+from mdt2pdf.executor import RenderExecutor
+from mdt2pdf.startup import PRELOAD, PRELOAD_MODULES, _package_totals, import_times, mp_context, warm_up
+
+
+def loaded_modules(names):
+    """在渲染进程中执行：哪些模块已经导入"""
+    return [name in sys.modules for name in names]
+
+
+def test_mp_context():
+    assert mp_context("spawn").get_start_method() == "spawn"
+    assert mp_context(PRELOAD).get_start_method() == "forkserver"
+
+
+@pytest.mark.usefixtures("fonts")
+def test_warm_up_reports_each_step():
+    assert set(warm_up()) == {"import", "fonts", "render"}
+
+
+def test_preload_workers_start_warm():
+    async def scenario():
+        executor = RenderExecutor(workers=1, start_method=PRELOAD)
+        executor.start()
+        try:
+            return await executor.submit(loaded_modules, PRELOAD_MODULES + ["reportlab.platypus"])
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(scenario()) == [True, True]
+
+
+def test_import_times_and_package_totals():
+    modules = import_times("mdt2pdf.table_data")
+    names = {module["module"] for module in modules}
+    assert "mdt2pdf.table_data" in names
+    totals = dict(_package_totals(modules))
+    assert "mdt2pdf" in totals
@@ -0,0 +1,107 @@
+"""按列存储的 TableData：按行读取与行列表一致、重复文本共享、列类型与对齐方式、pickle 往返"""
+import pickle
+
+import pytest
+
+from mdt2pdf.table_data import DATE, LONG, NUMERIC, SHORT, TableData, as_table_data
+
+
+def test_table_data_equals_rows():
+    data = TableData.from_rows([["a", "b"], ["1", "2"]])
+    assert data == [["a", "b"], ["1", "2"]]
+    assert data == [("a", "b"), ("1", "2")]
+    assert data != [["a", "b"]]
+    assert data == TableData.from_rows([("a", "b"), ("1", "2")])
+    assert data[-1] == ("1", "2")
+    assert data[1:] == [("1", "2")]
+    assert list(data) == [("a", "b"), ("1", "2")]
+    with pytest.raises(IndexError):
+        data[2]
+    # 与行列表一样按内容比较、可以修改，因此不可哈希
+    with pytest.raises(TypeError):
+        hash(data)
+
+
+def test_rows_are_widened_to_longest_row():
+    data = TableData.from_rows([["a"], ["1", "2", "3"], [4]])
+    assert data.num_cols == 3
+    assert data == [("a", "", ""), ("1", "2", "3"), ("4", "", "")]
+    assert [list(lengths) for lengths in data.lengths] == [[1, 1, 1], [0, 1, 0], [0, 1, 0]]
+
+
+def test_repeated_cells_share_one_string():
+    rows = [["状态", "编号"]] + [["进行" + "中", str(i)] for i in range(1000)]
+    data = TableData.from_rows(rows)
+    status = data.columns[0]
+    assert len({id(text) for text in status[1:]}) == 1
+    assert data.total_chars == 2 + 2 + sum(3 for _ in range(1000)) + sum(len(str(i)) for i in range(1000))
+
+
+def test_cjk_flags_and_select():
+    data = TableData.from_rows([["名称", "qty"], ["apple", "3"], ["苹果", "4"]])
+    assert [list(flags) for flags in data.cjk] == [[1, 0, 1], [0, 0, 0]]
+    picked = data.select([0, 2])
+    assert picked == [("名称", "qty"), ("苹果", "4")]
+    assert picked.columns[0][1] is data.columns[0][2]
+    assert [list(flags) for flags in picked.cjk] == [[1, 1], [0, 0]]
+
+
+def test_select_keeps_column_kinds():
+    data = TableData.from_rows([["名称", "数量"]] + [["x" * 40, str(i)] for i in range(10)] + [["短", "n/a"]])
+    assert data.kinds == [LONG, NUMERIC]
+    # 只抽取到短文本的行时，列类型仍沿用整个表格的判断
+    picked = data.select([0, 11])
+    assert picked.kinds == [LONG, NUMERIC]
+    assert picked.kinds is not data.kinds
+
+
+def test_pickle_round_trip_keeps_appending():
+    data = TableData()
+    for i in range(600):
+        data.append(["行", str(i)])
+    copy = pickle.loads(pickle.dumps(data))
+    assert copy == data and copy.lengths == data.lengths
+    copy.append(["桃", "5"])
+    assert len(copy) == 601 and copy[-1] == ("桃", "5")
+
+
+@pytest.mark.parametrize("cells, kind", [
+    (["1,234.5", "(12)", "15%", "¥3", "-", "2.5万元", ""], NUMERIC),
+    (["2024-01-31", "2024/1/3 12:30", "2024年1月31日", "N/A"], DATE),
+    (["进行中", "done", "v1.2.3"], SHORT),
+    (["x" * 25], LONG),
+    (["中" * 13], LONG),
+    (["中" * 12], SHORT),
+    (["-", "N/A"], SHORT),
+])
+def test_column_kinds(cells, kind):
+    data = TableData.from_rows([["列"]] + [[cell] for cell in cells])
+    assert data.kinds == [kind]
+
+
+def test_kinds_ignore_header_and_sample_long_columns():
+    rows = [["很长很长很长很长很长很长很长的表头"]] + [[str(i)] for i in range(5000)]
+    assert TableData.from_rows(rows).kinds == [NUMERIC]
+
+
+def test_column_alignments():
+    data = TableData.from_rows([["名称", "数量", "金额"], ["苹果", "3", "1.5"]])
+    assert data.column_alignments == ["center", "right", "right"]
+    data.alignments = ["left", "center", None]
+    assert data.column_alignments == ["left", "center", "right"]
+
+
+def test_pickle_keeps_alignments():
+    data = TableData(2, ["left", None])
+    data.extend([["名称", "数量"], ["苹果", "3"]])
+    data.finish()
+    copy = pickle.loads(pickle.dumps(data))
+    assert copy.alignments == ["left", None]
+    assert copy.kinds == [SHORT, NUMERIC]
+    assert copy.column_alignments == ["left", "right"]
+
+
+def test_as_table_data():
+    data = TableData.from_rows([["a"]])
+    assert as_table_data(data) is data
+    assert as_table_data([["a"], ["b"]]) == [("a",), ("b",)]
@@ -0,0 +1,141 @@
+"""流式表格解析器"""
+import asyncio
+
+import pytest
+
+from mdt2pdf.table_parser import (
+    TableTokenizer,
+    aiter_table_rows,
+    inline_text,
+    iter_table_rows,
+    iter_tables,
+    parse_alignment,
+    read_table_data,
+    split_row,
+)
+
+
+def rows(source, lenient=True):
+    return [list(row) for row in iter_table_rows(source, lenient=lenient)]
+
+
+def test_escaped_pipes_and_code_spans_do_not_split_cells():
+    line = r"| a \| b | `x | y` | c |"
+    assert [inline_text(cell) for cell in split_row(line)] == ["a | b", "x | y", "c"]
+
+
+def test_trailing_escaped_pipe_stays_in_cell():
+    assert [inline_text(cell) for cell in split_row(r"| a | b \|")] == ["a", "b |"]
+
+
+@pytest.mark.parametrize("cell, expected", [
+    (":---", "left"),
+    ("---:", "right"),
+    (":---:", "center"),
+    ("---", None),
+    (" :-: ", "center"),
+])
+def test_parse_alignment(cell, expected):
+    assert parse_alignment(cell) == expected
+
+
+def test_alignment_row_must_match_header_width():
+    source = "| a | b |\n|---|\n| 1 | 2 |\n"
+    assert rows(source, lenient=False) == []
+
+
+def test_rows_are_padded_or_truncated_to_header_width():
+    source = "| a | b |\n|---|---|\n| 1 | 2 | 3 |\n| 4 |\n"
+    assert rows(source) == [["a", "b"], ["1", "2"], ["4", ""]]
+
+
+def test_blank_line_or_heading_ends_table():
+    assert rows("| a |\n|---|\n| 1 |\n\n| 不是表格 |\n") == [["a"], ["1"]]
+    assert rows("| a |\n|---|\n| 1 |\n# 标题\n| 不是表格 |\n") == [["a"], ["1"]]
+
+
+def test_read_table_data_keeps_first_alignment_row():
+    table = read_table_data("| a | b | c | d |\n|:--|--:|:-:|---|\n| 1 | 2 | 3 | 4 |\n\n| e |\n|--:|\n| 5 |\n")
+    assert table.alignments == ["left", "right", "center", None]
+    assert list(table) == [("a", "b", "c", "d"), ("1", "2", "3", "4"), ("e", "", "", ""), ("5", "", "", "")]
+
+
+def test_headings_become_captions():
+    source = "# 销售\n\n| a |\n|---|\n| 1 |\n\n## 库存 ##\n| b |\n|---|\n| 2 |\n| 3 |\n"
+    tables = list(iter_tables(source))
+    assert [table.caption for table in tables] == ["销售", "库存"]
+    assert [len(table.data) for table in tables] == [2, 3]
+    assert tables[1].header == ("b",)
+
+
+def test_lenient_fallback_without_delimiter_row():
+    assert rows("a | b\n1 | 2\n") == [["a", "b"], ["1", "2"]]
+    assert rows("a | b\n1 | 2\n", lenient=False) == []
+
+
+def test_fallback_is_dropped_once_a_real_table_appears():
+    assert rows("x | y\n\n| a |\n|---|\n| 1 |\n") == [["a"], ["1"]]
+
+
+def test_fallback_column_count_tracks_widest_line():
+    tokenizer = TableTokenizer()
+    for line in ["a | b", "1 | 2 | 3 | 4"]:
+        tokenizer.feed(line)
+    assert tokenizer.fallback_row_count == 2
+    assert tokenizer.fallback_column_count == 4
+
+
+@pytest.mark.parametrize("cell, expected", [
+    ("**bold**", "bold"),
+    ("*em* and _em_", "em and em"),
+    ("`**code**`", "**code**"),
+    ("[链接](https://example.com)", "链接"),
+    ("a &amp; b", "a & b"),
+    (r"\*not em\*", "*not em*"),
+    ("a<br>b", "ab"),
+])
+def test_inline_markup_is_stripped(cell, expected):
+    assert inline_text(cell) == expected
+
+
+@pytest.mark.parametrize("cell, expected", [
+    ("**bold**", "bold"),
+    ("*em* and _em_", "em and em"),
+    ("`**code**`", "**code**"),
+    ("[链接](https://example.com)", "链接"),
+    ("a &amp; b", "a & b"),
+    (r"\*not em\*", "*not em*"),
+    ("a<br>b", "ab"),
+])
+def test_inline_markup_is_stripped(cell, expected):
+    assert inline_text(cell) == expected
+
+
+def test_bytes_and_file_sources(tmp_path):
+    source = "| 名称 |\n|---|\n| 苹果 |\n"
+    assert rows(source.encode("utf-8")) == [["名称"], ["苹果"]]
+    path = tmp_path / "t.md"
+    path.write_text(source, encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        assert rows(f) == [["名称"], ["苹果"]]
+
+
+def test_async_rows_from_split_utf8_chunks():
+    data = "| 名称 |\n|---|\n| 苹果 |\n".encode("utf-8")
+
+    async def chunks():
+        # 每块 1 字节，中文字符被拆开
+        for i in range(len(data)):
+            yield data[i:i + 1]
+
+    async def collect():
+        return [row async for row in aiter_table_rows(chunks())]
+
+    assert asyncio.run(collect()) == [["名称"], ["苹果"]]
+
+
+def test_matches_legacy_parser():
+    import main
+
+    source = "| 名称 | 数量 |\n|:---|---:|\n| **苹果** | 3 |\n| `a|b` | 4 |\n| 梨 |\n"
+    assert main.parse_markdown_table(source) == main.parse_markdown_table(source, legacy=True)
@@ -0,0 +1,146 @@
+"""耗时与规模指标：span 记录、Prometheus 文本格式、/metrics、Server-Timing 和事件循环延迟"""
+import asyncio
+import json
+import time
+
+import pytest
+
+import main
+from mdt2pdf.converter import parse_markdown_document
+from mdt2pdf.telemetry import LoopLagMonitor, Registry, Telemetry, Trace, collect, record, server_timing_header, span
+
+from conftest import unique_table
+
+
+def test_span_records_only_inside_a_trace():
+    with span("parse"):
+        pass
+    with collect() as outer:
+        with span("parse"):
+            pass
+        with collect() as inner:
+            with span("layout"):
+                pass
+        record(inner.spans)
+        with span("parse"):
+            pass
+    assert [stage for stage, _ in outer.spans] == ["parse", "layout", "parse"]
+    assert list(outer.totals()) == ["parse", "layout"]
+
+
+def test_span_as_decorator():
+    @span("build")
+    def build():
+        return 42
+
+    with collect() as trace:
+        assert build() == 42
+    assert [stage for stage, _ in trace.spans] == ["build"]
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    counter = registry.counter("demo_requests", "请求数", ("status",))
+    histogram = registry.histogram("demo_seconds", "耗时", (0.1, 1))
+    registry.gauge("demo_depth", "深度", lambda: 3)
+    counter.inc(status=200)
+    counter.inc(2, status=200)
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_requests counter" in lines
+    assert 'demo_requests_total{status="200"} 3' in lines
+    assert 'demo_seconds_bucket{le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{le="1"} 2' in lines
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in lines
+    assert "demo_seconds_sum 5.55" in lines and "demo_seconds_count 3" in lines
+    assert "demo_depth 3" in lines
+
+
+def test_observe_shapes_matches_observe_tables():
+    tables = parse_markdown_document("| a | b |\n|---|---|\n| 1 | 2 |\n\n| c |\n|---|\n| 3 |\n| 4 |\n")
+    from_tables, from_shapes = Telemetry(), Telemetry()
+    from_tables.observe_tables(tables)
+    from_shapes.observe_shapes([(2, 2), (3, 1)])
+    assert from_shapes.registry.render() == from_tables.registry.render()
+    assert "mdt2pdf_rows_total 5" in from_shapes.registry.render().splitlines()
+
+
+def test_server_timing_header():
+    trace = Trace()
+    trace.add("parse", 0.001)
+    trace.add("layout", 0.002)
+    trace.add("parse", 0.001)
+    assert server_timing_header(trace, 0.01) == "parse;dur=2.0, layout;dur=2.0, total;dur=10.0"
+
+
+def test_metrics_record_stages_by_route(client):
+    client.post("/convert", data={"markdown_content": unique_table()})
+    client.get("/no-such-path")
+    text = client.get("/metrics").text
+    assert 'mdt2pdf_requests_total{endpoint="/convert",status="200"}' in text
+    assert 'mdt2pdf_requests_total{endpoint="other",status="404"}' in text
+    for stage in ("parse", "queue", "layout", "build", "write"):
+        assert f'endpoint="/convert",stage="{stage}"' in text
+    assert "mdt2pdf_table_rows_count" in text
+    assert "/metrics" not in text
+
+
+def test_handlers_do_not_write_to_stdout(client, capsys):
+    # 调试输出经由 logger 和耗时 span 记录，请求处理过程中不向标准输出打印
+    markdown = unique_table()
+    client.post("/convert", data={"markdown_content": markdown})
+    client.post("/preview", data={"markdown_content": markdown})
+    client.post("/convert/stream", content=markdown.encode(), headers={"content-type": "text/markdown"})
+    client.post(
+        "/convert/batch", content=json.dumps({"markdown": markdown}).encode(),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    client.post("/convert", data={"markdown_content": "没有表格"})
+    assert capsys.readouterr().out == ""
+
+
+def test_server_timing_is_opt_in(client, monkeypatch):
+    response = client.post("/convert", data={"markdown_content": unique_table()})
+    assert "server-timing" not in response.headers
+    monkeypatch.setattr(main.telemetry, "server_timing", True)
+    response = client.post("/convert", data={"markdown_content": unique_table()})
+    timing = response.headers["server-timing"]
+    assert "layout;dur=" in timing and "total;dur=" in timing
+
+
+def test_loop_lag_monitor_sees_blocking_work():
+    registry = Registry()
+    histogram = registry.histogram("lag_seconds", "延迟", (0.01, 0.1))
+    monitor = LoopLagMonitor(histogram, interval=0.01)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # 阻塞事件循环
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(run())
+    stats = monitor.stats()
+    assert stats["samples"] >= 3
+    assert stats["max_seconds"] >= 0.15
+    assert stats["recent_max_seconds"] == stats["max_seconds"]
+    assert 'lag_seconds_bucket{le="+Inf"} %d' % stats["samples"] in registry.render()
+
+
+def test_loop_lag_monitor_disabled():
+    async def run():
+        monitor = LoopLagMonitor(interval=0)
+        monitor.start()
+        await asyncio.sleep(0.01)
+        return monitor.stats()
+
+    assert asyncio.run(run())["samples"] == 0
+
+
+def test_health_reports_event_loop(client):
+    health = client.get("/health").json()
+    assert health["pid"] > 0
+    assert health["event_loop"]["interval_seconds"] > 0
+    assert "mdt2pdf_event_loop_lag_seconds_count" in client.get("/metrics").text
@@ -0,0 +1,163 @@
+"""流式上传：请求体逐块解析、multipart 文件字段的逐块提取，以及大小、行数和列数限制"""
+import asyncio
+import hashlib
+
+import pytest
+
+from mdt2pdf.table_data import TableData
+from mdt2pdf.upload import InvalidMultipart, UploadLimits, UploadTooLarge, multipart_file_chunks, read_tables
+
+BOUNDARY = "testboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart_body(*parts):
+    """parts 为 (name, filename, content)，filename 为 None 时是普通字段"""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def chunked(data, size=64, consumed=None):
+    """按 size 字节分块产出 data，consumed（列表）记录已经交出的字节数"""
+    for start in range(0, len(data), size):
+        chunk = data[start:start + size]
+        if consumed is not None:
+            consumed.append(len(chunk))
+        yield chunk
+
+
+def run_read_tables(chunks, limits, digest=None):
+    return asyncio.run(read_tables(chunks, limits, digest=digest))
+
+
+def table_source(rows, columns=2):
+    header = "| " + " | ".join(f"c{i}" for i in range(columns)) + " |\n"
+    delimiter = "|" + "---|" * columns + "\n"
+    body = "".join("| " + " | ".join(str(r) for _ in range(columns)) + " |\n" for r in range(rows))
+    return (header + delimiter + body).encode()
+
+
+def test_tables_are_parsed_across_chunk_boundaries():
+    source = table_source(50) + "\n# 第二张\n\n".encode() + table_source(3, columns=3)
+    tables = run_read_tables(chunked(source, size=5), UploadLimits())
+    assert [len(table.data) for table in tables] == [51, 4]
+    assert tables[1].caption == "第二张"
+    assert tables[1].header == ("c0", "c1", "c2")
+
+
+def test_digest_covers_the_raw_body():
+    source = table_source(20) + "\n# 第二张\n\n".encode() + table_source(3)
+    digest = hashlib.sha256()
+    tables = run_read_tables(chunked(source, size=7), UploadLimits(), digest)
+    assert len(tables) == 2
+    assert digest.hexdigest() == hashlib.sha256(source).hexdigest()
+
+
+def test_row_limit_stops_reading_early():
+    source = table_source(10000)
+    consumed = []
+    with pytest.raises(UploadTooLarge, match="行数"):
+        run_read_tables(chunked(source, consumed=consumed), UploadLimits(max_rows=100))
+    assert sum(consumed) < len(source) / 10
+
+
+def test_multipart_file_is_extracted_and_other_fields_ignored():
+    source = table_source(50)
+    body = multipart_body(("note", None, b"| not | a | table |"), ("file", "t.md", source))
+    digest = hashlib.sha256()
+    tables = run_read_tables(multipart_file_chunks(CONTENT_TYPE, chunked(body)), UploadLimits(), digest)
+    assert len(tables) == 1
+    assert len(tables[0].data) == 51
+    # 缓存键只取文件内容，与直接上传原始 Markdown 相同
+    assert digest.hexdigest() == hashlib.sha256(source).hexdigest()
+
+
+def test_row_limit_stops_multipart_upload_early():
+    body = multipart_body(("file", "t.md", table_source(2000)))
+    consumed = []
+    with pytest.raises(UploadTooLarge, match="行数"):
+        run_read_tables(
+            multipart_file_chunks(CONTENT_TYPE, chunked(body, consumed=consumed)), UploadLimits(max_rows=10)
+        )
+    assert sum(consumed) < len(body) // 10
+
+
+def test_row_limit_counts_every_table():
+    source = table_source(60) + b"\n" + table_source(60)
+    with pytest.raises(UploadTooLarge, match="行数"):
+        run_read_tables(chunked(source), UploadLimits(max_rows=100))
+
+
+def test_column_limit():
+    with pytest.raises(UploadTooLarge, match="列数"):
+        run_read_tables(chunked(table_source(2, columns=12)), UploadLimits(max_columns=10))
+
+
+def test_limit_checks_do_not_flush_column_buffers(monkeypatch):
+    flushes = []
+    flush = TableData._flush
+
+    def counting_flush(self):
+        flushes.append(1)
+        return flush(self)
+
+    monkeypatch.setattr(TableData, "_flush", counting_flush)
+    tables = run_read_tables(chunked(table_source(1000), size=4096), UploadLimits())
+    assert len(tables[0].data) == 1001
+    # 每行检查列数时不读取表头，列缓冲只在缓冲满或表格结束时写入
+    assert len(flushes) < 20
+
+
+def test_column_limit_applies_to_lenient_rows():
+    with pytest.raises(UploadTooLarge, match="列数"):
+        run_read_tables(chunked(b"a | b | c | d | e | f\n"), UploadLimits(max_columns=5))
+
+
+def test_lenient_rows_count_against_row_limit():
+    source = "".join(f"a | {i}\n" for i in range(500)).encode()
+    with pytest.raises(UploadTooLarge, match="行数"):
+        run_read_tables(chunked(source), UploadLimits(max_rows=100))
+
+
+def test_byte_limit_and_content_length():
+    limits = UploadLimits(max_bytes=1000)
+    with pytest.raises(UploadTooLarge, match="字节"):
+        run_read_tables(chunked(table_source(500)), limits)
+    with pytest.raises(UploadTooLarge):
+        limits.check_content_length("1001")
+    limits.check_content_length("1000")
+    limits.check_content_length(None)
+    limits.check_content_length("not a number")
+
+
+def test_zero_disables_limits():
+    tables = run_read_tables(chunked(table_source(500, columns=20)), UploadLimits(0, 0, 0))
+    assert len(tables[0].data) == 501
+
+
+def test_missing_file_field_is_invalid():
+    body = multipart_body(("other", "t.md", table_source(1)))
+    with pytest.raises(InvalidMultipart, match="file"):
+        run_read_tables(multipart_file_chunks(CONTENT_TYPE, chunked(body)), UploadLimits())
+
+
+def test_second_file_field_is_invalid():
+    body = multipart_body(("file", "a.md", table_source(1)), ("file", "b.md", table_source(1)))
+    with pytest.raises(InvalidMultipart):
+        run_read_tables(multipart_file_chunks(CONTENT_TYPE, chunked(body)), UploadLimits())
+
+
+def test_too_many_parts_is_invalid():
+    parts = [(f"f{i}", None, b"x") for i in range(10)] + [("file", "t.md", table_source(1))]
+    with pytest.raises(InvalidMultipart, match="上限"):
+        run_read_tables(multipart_file_chunks(CONTENT_TYPE, chunked(multipart_body(*parts))), UploadLimits())
+
+
+def test_missing_boundary_is_invalid():
+    with pytest.raises(InvalidMultipart, match="boundary"):
+        run_read_tables(multipart_file_chunks("multipart/form-data", chunked(b"")), UploadLimits())